@@ -0,0 +1,189 @@
+"""
+admission: bound the turns in flight at the /post gateway.
+
+Every turn costs three or four OpenRouter calls, so a burst of users would
+otherwise become a burst of provider calls and trip its rate limits for
+everyone at once. At most BACKEND_MAX_IN_FLIGHT turns run at a time; the
+next BACKEND_MAX_QUEUE wait in line (first come, first served) for up to
+BACKEND_QUEUE_TIMEOUT seconds, capped by the turn's budget. Anything
+beyond that is shed straight away with 429 and a Retry-After sized from
+how long turns have recently been taking.
+
+A turn holds its slot until its response is complete, streamed replies
+included, and gives it up if the client disconnects or the deadline
+cancels it (the middleware runs inside DeadlineMiddleware).
+BACKEND_MAX_IN_FLIGHT=0 turns admission control off.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable
+
+from . import deadline, metrics
+
+BACKEND_MAX_IN_FLIGHT = int(os.getenv("BACKEND_MAX_IN_FLIGHT", "32"))
+BACKEND_MAX_QUEUE = int(os.getenv("BACKEND_MAX_QUEUE", "64"))
+BACKEND_QUEUE_TIMEOUT = float(os.getenv("BACKEND_QUEUE_TIMEOUT", "5"))
+
+# assumed turn length until the first one has finished
+_INITIAL_TURN_S = 3.0
+# weight of the newest turn in the running average
+_EWMA = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class Rejected(Exception):
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    def __init__(
+        self,
+        max_in_flight: int = BACKEND_MAX_IN_FLIGHT,
+        max_queue: int = BACKEND_MAX_QUEUE,
+        queue_timeout: float = BACKEND_QUEUE_TIMEOUT,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        # waiting turns, oldest first; a released slot is handed to the head
+        self._waiters: "Deque[asyncio.Future[None]]" = deque()
+        self.turn_s = _INITIAL_TURN_S
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained enough to get in."""
+        waves = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(self.turn_s * waves))
+
+    async def acquire(self) -> None:
+        """Take an in-flight slot, waiting in line if all are busy.
+
+        Raises Rejected when the queue is full or the wait runs out.
+        """
+        start = time.monotonic()
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self._admit(start)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject("queue_full", start)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.ADMISSION_QUEUE.inc()
+        try:
+            await asyncio.wait_for(waiter, deadline.timeout(self.queue_timeout))
+        except (asyncio.TimeoutError, deadline.DeadlineExceeded):
+            self._leave(waiter)
+            self._reject("timeout", start)
+        except asyncio.CancelledError:
+            self._leave(waiter)
+            raise
+        finally:
+            metrics.ADMISSION_QUEUE.dec()
+        # release() already counted this slot as in flight
+        self._admit(start, handed_over=True)
+
+    def release(self, held_s: float) -> None:
+        self.turn_s += _EWMA * (held_s - self.turn_s)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # hand the slot straight over so a newcomer can't jump the queue
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        metrics.ADMISSION_IN_FLIGHT.dec()
+
+    def _admit(self, start: float, handed_over: bool = False) -> None:
+        if not handed_over:
+            self.in_flight += 1
+            metrics.ADMISSION_IN_FLIGHT.inc()
+        self.admitted += 1
+        metrics.ADMISSION_WAIT_SECONDS.labels("admitted").observe(time.monotonic() - start)
+
+    def _leave(self, waiter: "asyncio.Future[None]") -> None:
+        """Step out of the queue, passing on a slot handed over meanwhile."""
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(self.turn_s)
+
+    def _reject(self, reason: str, start: float) -> None:
+        self.rejected[reason] += 1
+        metrics.ADMISSION_REJECTED.labels(reason).inc()
+        metrics.ADMISSION_WAIT_SECONDS.labels("rejected").observe(time.monotonic() - start)
+        raise Rejected(reason, self.retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "avg_turn_s": round(self.turn_s, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+gate = AdmissionGate()
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware putting requests to paths through the gate."""
+
+    def __init__(self, app, paths: Iterable[str] = (), gate: AdmissionGate = gate) -> None:
+        self.app = app
+        self.paths = set(paths)
+        self.gate = gate
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.gate.enabled
+            or scope.get("path") not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.gate.acquire()
+        except Rejected as e:
+            logger.info(
+                "turn rejected", extra={"reason": e.reason, "retry_after": e.retry_after}
+            )
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"text/plain; charset=utf-8"),
+                        (b"retry-after", str(e.retry_after).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": b"too many requests, retry later"})
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.release(time.monotonic() - start)
@@ -0,0 +1,166 @@
+"""
+deadline: one latency budget per user turn, carried across every hop.
+
+backend /post starts the clock (REQUEST_BUDGET_MS). Every downstream call
+sends what is left in X-Request-Budget-Ms (via metrics.outbound_headers),
+less DEADLINE_HOP_MARGIN_MS for the way back, so each service gives up
+before its caller does. HTTP hops and LLM calls size their timeouts with
+timeout(), which caps a call's usual timeout by the remaining budget.
+
+DeadlineMiddleware cancels the request handler, and with it every
+in-flight downstream call, when the budget runs out (504 if nothing was
+sent yet) or the client disconnects. In monolith mode in-process calls
+share the caller's deadline through a contextvar.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+BUDGET_HEADER = "X-Request-Budget-Ms"
+REQUEST_BUDGET_MS = float(os.getenv("REQUEST_BUDGET_MS", "25000"))
+HOP_MARGIN_MS = float(os.getenv("DEADLINE_HOP_MARGIN_MS", "100"))
+# a handler's own (budget-sized) timeouts get to fire before it is cancelled
+GRACE = 0.25
+
+logger = logging.getLogger(__name__)
+
+# absolute time.monotonic() deadline of the current request, if it has one
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without one."""
+    d = _deadline.get()
+    return None if d is None else d - time.monotonic()
+
+
+def timeout(default: float) -> float:
+    """default, capped by the remaining budget; raises once it is spent."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("request budget exhausted")
+    return min(default, left)
+
+
+def headers() -> Dict[str, str]:
+    """The budget header for a downstream call (empty without a deadline)."""
+    left = remaining()
+    if left is None:
+        return {}
+    return {BUDGET_HEADER: str(max(0, int(left * 1000.0 - HOP_MARGIN_MS)))}
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware enforcing the budget and cancelling on disconnect.
+
+    A budget comes from the X-Request-Budget-Ms header, or default_ms for
+    requests to one of paths (the turn entrypoints).
+    """
+
+    def __init__(self, app, default_ms: float = 0.0, paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.default_ms = default_ms
+        self.paths = set(paths)
+
+    def _budget_ms(self, scope) -> Optional[float]:
+        for k, v in scope.get("headers") or []:
+            if k == b"x-request-budget-ms":
+                try:
+                    return max(0.0, float(v))
+                except ValueError:
+                    break
+        if self.default_ms > 0 and scope.get("path") in self.paths:
+            return self.default_ms
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # read the body up front so the disconnect watcher can own receive()
+        chunks: List[bytes] = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        disconnected = asyncio.Event()
+        body_sent = False
+        started = False
+
+        async def replay():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"".join(chunks), "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        async def watch():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        budget_ms = self._budget_ms(scope)
+        token = None
+        if budget_ms is not None:
+            token = _deadline.set(time.monotonic() + budget_ms / 1000.0)
+        handler = asyncio.ensure_future(self.app(scope, replay, send_wrapper))
+        watcher = asyncio.ensure_future(watch())
+        try:
+            done, _ = await asyncio.wait(
+                {handler, watcher},
+                timeout=None if budget_ms is None else budget_ms / 1000.0 + GRACE,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if handler in done:
+                handler.result()
+                return
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            if watcher in done:
+                logger.info(
+                    "client disconnected, request cancelled", extra={"path": scope.get("path")}
+                )
+                return
+            logger.warning(
+                "request budget exceeded",
+                extra={"path": scope.get("path"), "budget_ms": budget_ms},
+            )
+            if not started:
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 504,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+                    }
+                )
+                await send({"type": "http.response.body", "body": b"request budget exceeded"})
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
+            if token is not None:
+                _deadline.reset(token)
@@ -1,12 +1,22 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import admission, auth, deadline, log, metrics
+
 # import and include routers
+from .routes import post
 from .routes.post import router as post_router
 
 
+log.setup("backend")
+
 app = FastAPI(title="backend")
 
+# at most BACKEND_MAX_IN_FLIGHT turns at once, a bounded queue, 429 beyond it;
+# inside the deadline so a queued turn is cancelled with its budget or client
+app.add_middleware(admission.AdmissionMiddleware, paths=["/post"])
+
 # Configure CORS to allow every origin (development convenience)
 app.add_middleware(
     CORSMiddleware,
@@ -16,6 +26,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# turn budget starts here; cancels work on expiry or client disconnect
+app.add_middleware(
+    deadline.DeadlineMiddleware, default_ms=deadline.REQUEST_BUDGET_MS, paths=["/post"]
+)
+
+# /admin/* and /usage need ADMIN_TOKEN
+app.add_middleware(auth.AdminTokenMiddleware)
+
+# request latency / in-flight metrics, Server-Timing and X-Request-ID
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -23,6 +44,13 @@ async def startup_event():
     app.include_router(post_router)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await post.aclose()
+    metrics.mark_process_dead()
+    log.shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "Hello from backend"}
@@ -31,3 +59,42 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return metrics.render()
+
+
+@app.get("/admin/admission")
+async def admission_stats():
+    """Turns in flight and queued at /post, average turn time and rejections."""
+    return admission.gate.stats()
+
+
+@app.get("/admin/log")
+async def log_settings():
+    """Log level, sampling, queue drops and conversations in debug mode."""
+    return log.stats()
+
+
+@app.post("/admin/log/debug")
+async def log_debug(request: Request):
+    """Turn debug logging (incl. prompt bodies) on or off for one conversation.
+
+    Body: {"conv_id": "...", "enabled": true, "ttl": 900}
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return PlainTextResponse("invalid json", status_code=400)
+    conv_id = str(data.get("conv_id") or "")
+    if not conv_id:
+        return PlainTextResponse("missing conv_id", status_code=400)
+    active = log.debug_conversations.set(
+        conv_id,
+        bool(data.get("enabled", True)),
+        float(data.get("ttl") or log.LOG_DEBUG_TTL),
+    )
+    return {"debug_conversations": sorted(active)}
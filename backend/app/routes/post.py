@@ -1,27 +1,125 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+import json
+import logging
+from typing import Optional
+
 import httpx
 
+from .. import admission, deadline, transport
+from ..log import bind
+from ..metrics import hop, outbound_headers
+from ..wire import Turn, parse
+
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+EXTRACTION_URL = "http://extraction_agent:8001/post"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """The pooled client to extraction_agent, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        # one connection per admitted turn; more would only queue in the pool
+        size = admission.BACKEND_MAX_IN_FLIGHT if admission.BACKEND_MAX_IN_FLIGHT > 0 else None
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+            timeout=30.0,
+        )
+    return _client
+
+
+async def aclose() -> None:
+    """Close the pooled client (called from the app's shutdown hook)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _sse_error(message: str) -> bytes:
+    return f"event: error\ndata: {json.dumps({'error': message})}\n\n".encode()
+
+
+async def _relay_stream(body: bytes, content_type: str, turn: Optional[Turn]):
+    """Relay the extraction_agent SSE reply stream to the browser."""
+    peer = transport.local("extraction.turn_stream")
+    if peer is not None:
+        if turn is None:
+            yield _sse_error("Missing text in request")
+            return
+        async with hop("extraction"):
+            async for chunk in peer(turn):
+                yield chunk
+        return
+    try:
+        timeout = deadline.timeout(30.0)
+        async with hop("extraction") as h:
+            async with get_client().stream(
+                "POST",
+                EXTRACTION_URL,
+                content=body,
+                headers=outbound_headers(
+                    {"Content-Type": content_type, "Accept": "text/event-stream"}
+                ),
+                timeout=timeout,
+            ) as resp:
+                h.response(resp)
+                logger.debug("streaming from extraction_agent", extra={"status": resp.status_code})
+                if resp.status_code != 200:
+                    detail = (await resp.aread()).decode("utf-8", errors="replace")
+                    yield _sse_error(detail)
+                    return
+                async for chunk in resp.aiter_raw():
+                    yield chunk
+    except Exception as e:
+        logger.warning("failed to stream from extraction_agent: %s", e)
+        yield _sse_error(str(e))
 
 
 @router.post("/post")
 async def receive_post(request: Request):
-    print("RECEIVED POST")
-
     # Read incoming body
     body = await request.body()
     content_type = request.headers.get("content-type", "application/json")
+    # the browser keeps one conv_id per user; every agent keys history and memory on it
+    # over HTTP the body is forwarded as is; it is only decoded here for the conv_id
+    turn = parse(Turn, body, content_type)
+    if turn is not None:
+        bind(turn.conv_id)
+
+    # Streaming mode: the browser asks for SSE so it can start speaking the
+    # first sentence while the rest of the reply is still being generated.
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _relay_stream(body, content_type, turn),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # monolith mode: call extraction_agent in-process
+    peer = transport.local("extraction.turn")
+    if peer is not None:
+        if turn is None:
+            return PlainTextResponse("Missing text in request", status_code=400)
+        async with hop("extraction"):
+            _, reply = await peer(turn)
+        return PlainTextResponse(reply)
 
-    # Forward to extraction_agent (increase timeout to allow slower downstream responses)
-    # You can tune this value or replace with httpx.Timeout for finer control.
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(
-            "http://extraction_agent:8001/post",
+    # Forward to extraction_agent; the wait is capped by the turn's remaining budget
+    timeout = deadline.timeout(30.0)
+    async with hop("extraction") as h:
+        resp = await get_client().post(
+            EXTRACTION_URL,
             content=body,
-            headers={"Content-Type": content_type},
+            headers=outbound_headers({"Content-Type": content_type}),
+            timeout=timeout,
         )
+        h.response(resp)
 
-    print(f"Forwarded to extraction_agent, status={resp.status_code}")
+    logger.info("forwarded to extraction_agent", extra={"status": resp.status_code})
 
     return PlainTextResponse(resp.text)
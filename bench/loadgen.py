@@ -0,0 +1,227 @@
+"""
+loadgen: closed-loop load generator for the agent chain.
+
+Drives backend /post (chat turns) and/or schedule_agent /schedule/* at a
+fixed concurrency and reports requests/sec and p50/p95/p99 latency, end to
+end and per hop. Per-hop numbers come from the Server-Timing header when
+the services emit one; `--scenario hops` measures each hop directly by
+sending the same turn to every agent on its own.
+
+Usage (with docker-compose.bench.yml up, so no API credits are spent):
+    python bench/loadgen.py --scenario chat --concurrency 32 --duration 30
+    python bench/loadgen.py --scenario chat --stream --concurrency 32
+    python bench/loadgen.py --scenario schedule --concurrency 8 --requests 200
+    python bench/loadgen.py --scenario hops --concurrency 16 --duration 20
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import time
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+UTTERANCES = [
+    "Good morning, I slept quite well.",
+    "My back hurts again today.",
+    "I'm fine, thank you.",
+    "I felt a bit dizzy after lunch.",
+    "We baked cookies with my granddaughter.",
+    "My knee is sore when I climb the stairs.",
+    "How are you today?",
+]
+SCHEDULE_REPLIES = ["yes", "the first one", "Tuesday at 10", "what else do you have?", "ok book it"]
+
+_TIMING = re.compile(r"([\w.-]+)(?:;[^,]*?dur=([\d.]+))?")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.count = 0
+        self.wall = 0.0
+
+    def add(self, name: str, seconds: float) -> None:
+        self.samples[name].append(seconds * 1000.0)
+
+    def add_server_timing(self, header: Optional[str]) -> None:
+        if not header:
+            return
+        for m in _TIMING.finditer(header):
+            if m.group(2):
+                self.samples[f"  hop:{m.group(1)}"].append(float(m.group(2)))
+
+    def error(self, name: str) -> None:
+        self.errors[name] += 1
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = min(len(s) - 1, max(0, int(round(p / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+# ---- scenarios: each performs one unit of work and records its timings ----
+async def chat_turn(client: httpx.AsyncClient, args, rec: Recorder) -> None:
+    body = {"text": random.choice(UTTERANCES), "conv_id": f"bench-{random.randint(1, args.conversations)}"}
+    t0 = time.perf_counter()
+    if args.stream:
+        first: Optional[float] = None
+        async with client.stream(
+            "POST", f"{args.backend}/post", json=body, headers={"Accept": "text/event-stream"}
+        ) as r:
+            async for line in r.aiter_lines():
+                if first is None and line.startswith("event: sentence"):
+                    first = time.perf_counter() - t0
+            status = r.status_code
+            rec.add_server_timing(r.headers.get("server-timing"))
+        if first is not None:
+            rec.add("chat first sentence", first)
+    else:
+        r = await client.post(f"{args.backend}/post", json=body)
+        status = r.status_code
+        rec.add_server_timing(r.headers.get("server-timing"))
+    elapsed = time.perf_counter() - t0
+    if status >= 400:
+        rec.error("chat end-to-end")
+    rec.add("chat end-to-end", elapsed)
+
+
+async def schedule_session(client: httpx.AsyncClient, args, rec: Recorder) -> None:
+    t0 = time.perf_counter()
+    r = await client.get(f"{args.schedule}/schedule/start", params={"service": "dentist"})
+    rec.add("schedule start", time.perf_counter() - t0)
+    if r.status_code >= 400:
+        rec.error("schedule start")
+        return
+    sid = r.json().get("session_id")
+    for _ in range(args.schedule_turns):
+        t1 = time.perf_counter()
+        r = await client.post(
+            f"{args.schedule}/schedule/post",
+            json={"session_id": sid, "text": random.choice(SCHEDULE_REPLIES)},
+        )
+        rec.add("schedule turn", time.perf_counter() - t1)
+        if r.status_code >= 400:
+            rec.error("schedule turn")
+            return
+        if r.json().get("status") == "confirmed":
+            break
+
+
+async def hop_probe(client: httpx.AsyncClient, args, rec: Recorder) -> None:
+    text = random.choice(UTTERANCES)
+    probes = [
+        ("backend /post", f"{args.backend}/post", {"text": text}),
+        ("extraction /post", f"{args.extraction}/post", {"text": text}),
+        ("response /post", f"{args.response}/post", {"text": "CONTEXT: bench", "user_message": text}),
+        ("summary /post", f"{args.summary}/post", {"text": "Reply.", "user_message": text}),
+    ]
+    for name, url, body in probes:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(url, json=body)
+            if r.status_code >= 400:
+                rec.error(name)
+        except httpx.HTTPError:
+            rec.error(name)
+        rec.add(name, time.perf_counter() - t0)
+
+
+SCENARIOS: Dict[str, Callable[..., Awaitable[None]]] = {
+    "chat": chat_turn,
+    "schedule": schedule_session,
+    "hops": hop_probe,
+}
+
+
+async def run(args) -> Recorder:
+    rec = Recorder()
+    scenario = SCENARIOS[args.scenario]
+    deadline = time.perf_counter() + args.duration if not args.requests else None
+    remaining = [args.requests]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+
+        async def worker() -> None:
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                if deadline is None:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                try:
+                    await scenario(client, args, rec)
+                except Exception:
+                    rec.error("exceptions")
+                rec.count += 1
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        rec.wall = time.perf_counter() - t0
+    return rec
+
+
+def report(rec: Recorder, args) -> Dict[str, object]:
+    print(f"\nscenario={args.scenario} concurrency={args.concurrency} wall={rec.wall:.1f}s")
+    print(f"units={rec.count}  throughput={rec.count / rec.wall:.2f}/s\n")
+    print(f"{'metric':<28}{'n':>7}{'err':>6}{'rps':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    out: Dict[str, object] = {}
+    for name in sorted(rec.samples, key=lambda n: (n.startswith("  "), n)):
+        v = rec.samples[name]
+        row = {
+            "n": len(v),
+            "errors": rec.errors.get(name, 0),
+            "rps": len(v) / rec.wall,
+            "mean": statistics.fmean(v),
+            "p50": _pct(v, 50),
+            "p95": _pct(v, 95),
+            "p99": _pct(v, 99),
+        }
+        out[name.strip()] = row
+        print(
+            f"{name:<28}{row['n']:>7}{row['errors']:>6}{row['rps']:>8.1f}"
+            f"{row['mean']:>9.1f}{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}"
+        )
+    if rec.errors.get("exceptions"):
+        print(f"\n{rec.errors['exceptions']} units aborted by exceptions (timeouts, refused connections)")
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Load generator for the HygieiAI agent chain")
+    ap.add_argument("--scenario", choices=sorted(SCENARIOS), default="chat")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds (ignored with --requests)")
+    ap.add_argument("--requests", type=int, default=0, help="stop after N units of work")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--stream", action="store_true", help="chat: request SSE and time the first sentence")
+    ap.add_argument("--conversations", type=int, default=100, help="chat: distinct conv_ids to spread over")
+    ap.add_argument("--schedule-turns", type=int, default=3)
+    ap.add_argument("--backend", default="http://localhost:8000")
+    ap.add_argument("--extraction", default="http://localhost:8001")
+    ap.add_argument("--summary", default="http://localhost:8002")
+    ap.add_argument("--response", default="http://localhost:8003")
+    ap.add_argument("--schedule", default="http://localhost:8004")
+    ap.add_argument("--json", help="also write the results to this file")
+    args = ap.parse_args()
+
+    rec = asyncio.run(run(args))
+    out = report(rec, args)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({"args": vars(args), "wall_s": rec.wall, "units": rec.count, "metrics": out}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+cls_cache: LRU + TTL cache in front of the classifier LLM call.
+
+Keys are (model, hash of the classifier prompt, normalised text), so the
+cache invalidates itself when either the model or SYSTEM_CLASSIFIER
+changes. Normalisation folds case, unicode forms, punctuation, whitespace
+and digits, so "I'm fine." and "im   fine" share an entry.
+"""
+
+import copy
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CLS_CACHE_SIZE = int(os.getenv("CLS_CACHE_SIZE", "5000"))
+CLS_CACHE_TTL = float(os.getenv("CLS_CACHE_TTL", "3600"))
+
+_APOSTROPHES = re.compile(r"[‘’ʼ`']")
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_NON_WORD = re.compile(r"[^\w#]+")
+
+
+def normalize(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text).casefold()
+    t = _APOSTROPHES.sub("", t)  # "i'm" -> "im"
+    t = _NUMBER.sub("#", t)  # "pain 7/10" -> "pain # #"
+    t = _NON_WORD.sub(" ", t)
+    return " ".join(t.split())
+
+
+def prompt_hash(system: str) -> str:
+    return hashlib.sha1(system.encode("utf-8")).hexdigest()[:12]
+
+
+Key = Tuple[str, str, str]
+
+
+class ClassifierCache:
+    def __init__(self, size: int = CLS_CACHE_SIZE, ttl: float = CLS_CACHE_TTL) -> None:
+        self._entries: "OrderedDict[Key, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(model: str, system: str, text: str) -> Key:
+        return (model, prompt_hash(system), normalize(text))
+
+    def get(self, key: Key) -> Optional[Dict[str, Any]]:
+        item = self._entries.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # callers mutate the result (red_flags), so hand out a copy
+        return copy.deepcopy(value)
+
+    def put(self, key: Key, value: Dict[str, Any]) -> None:
+        if self.size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def flush(self) -> int:
+        n = len(self._entries)
+        self._entries.clear()
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+cls_cache = ClassifierCache()
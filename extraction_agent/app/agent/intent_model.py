@@ -0,0 +1,283 @@
+"""
+intent_model: in-process intent classifier used as a fast path in front of
+the MODEL_CLS call.
+
+TF-IDF unigram+bigram features over the normalised text feed a multinomial
+logistic regression, all in pure Python (no NumPy needed at runtime). The
+model is trained offline from logged (text, final intent) pairs and stored
+as JSON; when its top probability clears INTENT_FAST_PATH_THRESHOLD the
+LLM classifier is skipped.
+
+Training CLI (run from extraction_agent/):
+    python -m app.agent.intent_model train --log data/intent_log.jsonl --out data/intent_model.json
+    python -m app.agent.intent_model eval --log data/intent_log.jsonl --model data/intent_model.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .cls_cache import normalize
+
+logger = logging.getLogger(__name__)
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "data/intent_model.json")
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH", "")  # empty = don't log pairs
+INTENT_FAST_PATH_THRESHOLD = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.9"))
+
+LABELS = ["smalltalk", "medical", "emergency_candidate", "routine_checkin"]
+
+
+def features(text: str) -> List[str]:
+    toks = normalize(text).split()
+    return toks + [f"{a}_{b}" for a, b in zip(toks, toks[1:])]
+
+
+def _softmax(scores: List[float]) -> List[float]:
+    m = max(scores)
+    exps = [math.exp(s - m) for s in scores]
+    z = sum(exps)
+    return [e / z for e in exps]
+
+
+class IntentModel:
+    def __init__(
+        self,
+        labels: List[str],
+        idf: Dict[str, float],
+        weights: Dict[str, List[float]],
+        bias: List[float],
+    ) -> None:
+        self.labels = labels
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    # ---- features ----
+    def _vector(self, text: str) -> Dict[str, float]:
+        tf = Counter(f for f in features(text) if f in self.idf)
+        vec = {f: (1.0 + math.log(c)) * self.idf[f] for f, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {f: v / norm for f, v in vec.items()}
+
+    # ---- inference ----
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Return (label, probability) for the most likely intent."""
+        scores = list(self.bias)
+        for f, x in self._vector(text).items():
+            w = self.weights.get(f)
+            if w is not None:
+                for k in range(len(scores)):
+                    scores[k] += w[k] * x
+        probs = _softmax(scores)
+        best = max(range(len(probs)), key=probs.__getitem__)
+        return self.labels[best], probs[best]
+
+    # ---- training ----
+    @classmethod
+    def train(
+        cls,
+        pairs: List[Tuple[str, str]],
+        epochs: int = 30,
+        lr: float = 0.5,
+        l2: float = 1e-4,
+        min_df: int = 1,
+        seed: int = 0,
+    ) -> "IntentModel":
+        labels = [l for l in LABELS if any(y == l for _, y in pairs)]
+        labels += sorted({y for _, y in pairs} - set(labels))
+        index = {l: i for i, l in enumerate(labels)}
+
+        df: Counter = Counter()
+        for text, _ in pairs:
+            df.update(set(features(text)))
+        n = len(pairs)
+        idf = {
+            f: math.log((1 + n) / (1 + c)) + 1.0 for f, c in df.items() if c >= min_df
+        }
+
+        model = cls(labels, idf, {}, [0.0] * len(labels))
+        data = [(model._vector(t), index[y]) for t, y in pairs]
+        rng = random.Random(seed)
+        K = len(labels)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            step = lr / (1.0 + epoch)
+            for x, y in data:
+                scores = list(model.bias)
+                for f, v in x.items():
+                    w = model.weights.get(f)
+                    if w is not None:
+                        for k in range(K):
+                            scores[k] += w[k] * v
+                probs = _softmax(scores)
+                for k in range(K):
+                    g = probs[k] - (1.0 if k == y else 0.0)
+                    model.bias[k] -= step * g
+                    for f, v in x.items():
+                        w = model.weights.setdefault(f, [0.0] * K)
+                        w[k] -= step * (g * v + l2 * w[k])
+        return model
+
+    # ---- persistence ----
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(
+                {
+                    "labels": self.labels,
+                    "idf": self.idf,
+                    "weights": {f: [round(v, 6) for v in w] for f, w in self.weights.items()},
+                    "bias": self.bias,
+                    "trained_at": time.time(),
+                },
+                fh,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "IntentModel":
+        with open(path, encoding="utf-8") as fh:
+            d = json.load(fh)
+        return cls(d["labels"], d["idf"], d["weights"], d["bias"])
+
+
+# ---- runtime fast path ----
+class FastPath:
+    """Holds the loaded model plus hit/fallback counters."""
+
+    def __init__(self, path: str = INTENT_MODEL_PATH, threshold: float = INTENT_FAST_PATH_THRESHOLD) -> None:
+        self.path = path
+        self.threshold = threshold
+        self.model: Optional[IntentModel] = None
+        self.hits = 0
+        self.fallbacks = 0
+        self.gated = 0
+        self.reload()
+
+    def reload(self) -> bool:
+        try:
+            self.model = IntentModel.load(self.path)
+        except FileNotFoundError:
+            self.model = None
+        except Exception as e:
+            logger.warning("intent model failed to load: %s", e)
+            self.model = None
+        return self.model is not None
+
+    def classify(self, text: str) -> Optional[Dict[str, object]]:
+        """Return a classifier-shaped result if confident, else None."""
+        if self.model is None:
+            return None
+        label, prob = self.model.predict(text)
+        if prob < self.threshold:
+            self.fallbacks += 1
+            return None
+        self.hits += 1
+        return {"intent": label, "essence": "", "red_flags": [], "confidence": round(prob, 4)}
+
+    def stats(self) -> Dict[str, object]:
+        decided = self.hits + self.fallbacks
+        return {
+            "loaded": self.model is not None,
+            "path": self.path,
+            "threshold": self.threshold,
+            "fast_path_hits": self.hits,
+            "llm_fallbacks": self.fallbacks,
+            "skipped_keyword_gate": self.gated,
+            "hit_rate": round(self.hits / decided, 4) if decided else 0.0,
+        }
+
+
+def _append_pair(line: str) -> None:
+    try:
+        os.makedirs(os.path.dirname(INTENT_LOG_PATH) or ".", exist_ok=True)
+        with open(INTENT_LOG_PATH, "a", encoding="utf-8") as fh:
+            fh.write(line)
+    except OSError as e:
+        logger.warning("intent log write failed: %s", e)
+
+
+def log_pair(text: str, intent: str) -> None:
+    """Append a (text, final intent) training pair if INTENT_LOG_PATH is set.
+
+    The write runs in the default executor; the turn doesn't wait for it.
+    """
+    if not INTENT_LOG_PATH:
+        return
+    line = json.dumps({"text": text, "intent": intent}) + "\n"
+    asyncio.get_running_loop().run_in_executor(None, _append_pair, line)
+
+
+# ---- CLI ----
+def _read_pairs(path: str) -> List[Tuple[str, str]]:
+    pairs = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            d = json.loads(line)
+            if d.get("text") and d.get("intent"):
+                pairs.append((d["text"], d["intent"]))
+    return pairs
+
+
+def _evaluate(model: IntentModel, pairs: Iterable[Tuple[str, str]], threshold: float) -> Dict[str, float]:
+    total = correct = covered = covered_correct = 0
+    for text, y in pairs:
+        label, prob = model.predict(text)
+        total += 1
+        correct += label == y
+        if prob >= threshold:
+            covered += 1
+            covered_correct += label == y
+    return {
+        "examples": total,
+        "accuracy": correct / total if total else 0.0,
+        "fast_path_coverage": covered / total if total else 0.0,
+        "fast_path_accuracy": covered_correct / covered if covered else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.agent.intent_model")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    tr = sub.add_parser("train", help="train a model from logged pairs")
+    tr.add_argument("--log", default=INTENT_LOG_PATH or "data/intent_log.jsonl")
+    tr.add_argument("--out", default=INTENT_MODEL_PATH)
+    tr.add_argument("--epochs", type=int, default=30)
+    tr.add_argument("--min-df", type=int, default=1)
+    tr.add_argument("--holdout", type=float, default=0.2)
+    tr.add_argument("--threshold", type=float, default=INTENT_FAST_PATH_THRESHOLD)
+    ev = sub.add_parser("eval", help="evaluate a saved model")
+    ev.add_argument("--log", default=INTENT_LOG_PATH or "data/intent_log.jsonl")
+    ev.add_argument("--model", default=INTENT_MODEL_PATH)
+    ev.add_argument("--threshold", type=float, default=INTENT_FAST_PATH_THRESHOLD)
+    args = ap.parse_args(argv)
+
+    pairs = _read_pairs(args.log)
+    if args.cmd == "eval":
+        print(json.dumps(_evaluate(IntentModel.load(args.model), pairs, args.threshold), indent=2))
+        return
+
+    random.Random(0).shuffle(pairs)
+    cut = int(len(pairs) * (1 - args.holdout)) if len(pairs) > 10 else len(pairs)
+    train, test = pairs[:cut], pairs[cut:]
+    model = IntentModel.train(train, epochs=args.epochs, min_df=args.min_df)
+    if test:
+        print("holdout:", json.dumps(_evaluate(model, test, args.threshold)))
+        # final model uses every example
+        model = IntentModel.train(pairs, epochs=args.epochs, min_df=args.min_df)
+    model.save(args.out)
+    print(f"saved {args.out}: {len(pairs)} examples, {len(model.weights)} features")
+
+
+if __name__ == "__main__":
+    main()
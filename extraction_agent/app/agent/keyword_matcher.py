@@ -0,0 +1,220 @@
+"""
+keyword_matcher: single-pass multi-pattern matcher for the keyword gates.
+
+All medical keywords, emergency terms and negation cues are compiled once
+into an Aho-Corasick automaton. One scan over the lowercased message finds
+every occurrence regardless of vocabulary size, and applies three rules:
+
+- word boundaries: a term must start at a word boundary and may only be
+  followed by a short inflection ("bleed" -> "bleeding", but "cut" does not
+  match "shortcut" or "cute")
+  A final consonant may be doubled before "-ing"/"-ed" ("cut" -> "cutting").
+- negation: a term preceded within NEGATION_WINDOW words by a cue such as
+  "no" / "not" / "without" is ignored ("no chest pain"); "but" and clause
+  punctuation (, . ; : ! ?) end the scope, so "No, I have chest pain" is
+  not negated
+- emergency rules: a main term fires unless a negation cue directly precedes
+  it ("no chest pain", not "not been well chest pain") and, when it has
+  companions, at least one non-negated companion occurs in the same message.
+  A missed emergency costs far more than a false alarm, so the wider window
+  doesn't apply to main terms.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+NEGATION_CUES = [
+    "no",
+    "not",
+    "without",
+    "never",
+    "denies",
+    "deny",
+    "free of",
+    "no more",
+    "don't have",
+    "dont have",
+    "don’t have",
+]
+# words that close a negation scope: "no fever but chest pain"
+SCOPE_BREAKS = ["but", "however", "although", "though", "except"]
+NEGATION_WINDOW = 3
+
+# suffixes allowed after a term before the word must end
+INFLECTIONS = frozenset(
+    ["", "s", "es", "ed", "d", "ing", "ness", "less", "ful", "y", "ies", "en", "ish"]
+)
+# suffixes that may follow a doubled final consonant ("cutting", "stabbed")
+DOUBLED_INFLECTIONS = frozenset(["ing", "ed"])
+_MAX_INFLECTION = max(len(s) for s in INFLECTIONS | {"x" + s for s in DOUBLED_INFLECTIONS})
+# punctuation that ends a clause, and with it a negation's scope
+CLAUSE_BREAKS = frozenset(",.;:!?")
+
+# output kinds
+_MED, _EMAIN, _EALT, _NEG, _BREAK = range(5)
+
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum()
+
+
+def _inflection_ok(term: str, suffix: str) -> bool:
+    if suffix in INFLECTIONS:
+        return True
+    # "cut" -> "cutting": a doubled final consonant before -ing / -ed
+    return (
+        len(suffix) > 1
+        and suffix[0] == term[-1]
+        and term[-1] not in "aeiouwxy"
+        and suffix[1:] in DOUBLED_INFLECTIONS
+    )
+
+
+class ScanResult(NamedTuple):
+    medical: Set[str]  # non-negated medical keywords found
+    emergency: List[str]  # emergency main terms whose rule fired
+    negated: Set[str]  # terms found but negated
+
+
+class KeywordMatcher:
+    def __init__(
+        self,
+        medical: Iterable[str],
+        emergency: Sequence[Tuple[str, Sequence[str]]],
+        negations: Iterable[str] = NEGATION_CUES,
+        breaks: Iterable[str] = SCOPE_BREAKS,
+        window: int = NEGATION_WINDOW,
+    ) -> None:
+        self.window = window
+        self._emergency = [(m.lower(), [a.lower() for a in alts]) for m, alts in emergency]
+        # trie as parallel arrays: goto[state] = {char: state}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # out[state] = [(term, kind, rule_index, n_words, inflectable)]
+        self._out: List[List[Tuple[str, int, int, int, bool]]] = [[]]
+
+        for term in medical:
+            self._add(term.lower(), _MED, -1, True)
+        for i, (main, alts) in enumerate(self._emergency):
+            self._add(main, _EMAIN, i, True)
+            for a in alts:
+                self._add(a, _EALT, i, True)
+        for cue in negations:
+            self._add(cue.lower(), _NEG, -1, False)
+        for cue in breaks:
+            self._add(cue.lower(), _BREAK, -1, False)
+        self._build_links()
+
+    # ---- construction ----
+    def _add(self, term: str, kind: int, rule: int, inflectable: bool) -> None:
+        term = " ".join(term.split())
+        if not term:
+            return
+        s = 0
+        for ch in term:
+            nxt = self._goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[s][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            s = nxt
+        n_words = len(_WORD.findall(term))
+        self._out[s].append((term, kind, rule, n_words, inflectable))
+
+    def _build_links(self) -> None:
+        q = deque(self._goto[0].values())
+        while q:
+            s = q.popleft()
+            for ch, nxt in self._goto[s].items():
+                q.append(nxt)
+                f = self._fail[s]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                # inherit the outputs of the longest proper suffix
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    # ---- matching ----
+    def scan(self, text: str) -> ScanResult:
+        t = " ".join(text.lower().split())
+        n = len(t)
+        goto, fail, out = self._goto, self._fail, self._out
+
+        medical: Set[str] = set()
+        negated: Set[str] = set()
+        main_hit: Dict[int, bool] = {}
+        alt_hit: Set[int] = set()
+        last_neg_word: Optional[int] = None
+
+        s = 0
+        word = -1  # index of the word containing position i
+        prev_word_char = False
+        for i, ch in enumerate(t):
+            is_wc = _is_word_char(ch)
+            if is_wc and not prev_word_char:
+                word += 1
+            prev_word_char = is_wc
+            if ch in CLAUSE_BREAKS:
+                last_neg_word = None
+
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            if not out[s]:
+                continue
+
+            for term, kind, rule, n_words, inflectable in out[s]:
+                start = i - len(term) + 1
+                if start > 0 and _is_word_char(t[start - 1]):
+                    continue
+                # right edge: end of word, or an allowed inflection
+                j = i + 1
+                while j < n and j - i - 1 <= _MAX_INFLECTION and _is_word_char(t[j]):
+                    j += 1
+                if j < n and _is_word_char(t[j]):
+                    continue
+                suffix = t[i + 1 : j]
+                if not (_inflection_ok(term, suffix) if inflectable else suffix == ""):
+                    continue
+
+                if kind == _NEG:
+                    last_neg_word = word
+                    continue
+                if kind == _BREAK:
+                    last_neg_word = None
+                    continue
+
+                start_word = word - n_words + 1
+                # emergency terms only yield to a cue right in front of them
+                window = 1 if kind == _EMAIN else self.window
+                is_negated = (
+                    last_neg_word is not None
+                    and start_word - window <= last_neg_word < start_word
+                )
+                if is_negated:
+                    negated.add(term)
+                    continue
+                if kind == _MED:
+                    medical.add(term)
+                elif kind == _EMAIN:
+                    main_hit[rule] = True
+                elif kind == _EALT:
+                    alt_hit.add(rule)
+
+        emergency = [
+            self._emergency[r][0]
+            for r in main_hit
+            if not self._emergency[r][1] or r in alt_hit
+        ]
+        return ScanResult(medical, emergency, negated)
@@ -1,23 +1,35 @@
 """
-extraction_agent: classify intent and print all decisions.
-Input to process_text is a plain user string.
+extraction_agent: classify intent and log all decisions.
+Input to process_text is a plain user string plus the patient memory
+(either the string itself or an async loader that fetches it).
 """
 
-import os, json
-from typing import Optional, Dict, Any
-import httpx
+import os, json, logging
+from typing import Optional, Dict, Any, List
+from . import llm_client
+from ..log import bodies_enabled
+from .llm_client import OR_KEY
+from .cls_cache import cls_cache
+from .intent_model import FastPath, log_pair
+from .ledger import ledger
+from .keyword_matcher import KeywordMatcher
+from .pipeline import Stage, run_dag
 from .prompt_builder import build_llm_prompt
 
-OR_KEY = os.getenv("OPENROUTER_API_KEY")
-OR_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
-
 MODEL_CLS = os.getenv("MODEL_CLASSIFIER", "meta-llama/llama-3.1-70b-instruct")
 MODEL_RSP = os.getenv("MODEL_RESPONDER", "meta-llama/llama-3.1-70b-instruct")
 MODEL_SFT = os.getenv("MODEL_SAFETY", "meta-llama/llama-3.1-70b-instruct")
 
+# The draft reply only feeds the safety judge (response_agent writes the real
+# reply), so it is off by default: safety then judges the user message alone
+# and runs in parallel with the classifier.
+DRAFT_RESPONDER = os.getenv("EXTRACTION_DRAFT_RESPONDER", "0") == "1"
+
 if not OR_KEY:
     raise SystemExit("Missing OPENROUTER_API_KEY environment variable")
 
+logger = logging.getLogger(__name__)
+
 # ---- keyword gates ----
 EMERGENCY_PATTERNS = [
     (
@@ -61,6 +73,14 @@ MEDICAL_KEYWORDS = [
     "jaw",
     "left arm",
     "headache",
+    "backache",
+    "stomachache",
+    "toothache",
+    "earache",
+    "bled",
+    "breathe",
+    "dizziness",
+    "swollen",
     "weakness",
     "puffy",
     "stiffness",
@@ -69,17 +89,20 @@ MEDICAL_KEYWORDS = [
 ]
 
 
+# compiled once; one pass over the message evaluates both gates
+KEYWORD_MATCHER = KeywordMatcher(MEDICAL_KEYWORDS, EMERGENCY_PATTERNS)
+
+
 def _kw_sieve(t: str) -> bool:
-    t = t.lower()
-    return any(k in t for k in MEDICAL_KEYWORDS)
+    return bool(KEYWORD_MATCHER.scan(t).medical)
 
 
 def _emergency_hit(t: str) -> bool:
-    t = t.lower()
-    for main, alts in EMERGENCY_PATTERNS:
-        if main in t and (not alts or any(a in t for a in alts)):
-            return True
-    return False
+    return bool(KEYWORD_MATCHER.scan(t).emergency)
+
+
+# local intent model, loaded at startup; answers confident cases without the LLM
+INTENT_FAST_PATH = FastPath()
 
 
 # ---- prompts ----
@@ -95,111 +118,195 @@ SYSTEM_RESPONDER_MEDICAL = """You are a cautious health check-in assistant for o
 Never diagnose. Ask focused OLD CARTS follow-ups. Be concise (2–3 short sentences)."""
 SYSTEM_SAFETY = """You judge the reply and create a storage summary.
 Return ONLY JSON with: medically_relevant:boolean, emergency:boolean, safety_ok:boolean, db_summary:string"""
+SYSTEM_SAFETY_USER = """You judge a user message from an older adult and create a storage summary.
+Return ONLY JSON with: medically_relevant:boolean, emergency:boolean, safety_ok:boolean, db_summary:string"""
 
 
 # ---- OpenRouter helper ----
-def _or_chat(model: str, system: str, user: str, json_mode: bool = False) -> str:
-    headers = {
-        "Authorization": f"Bearer {OR_KEY}",
-        "HTTP-Referer": os.getenv("OPENROUTER_REFERER", "https://hack.local"),
-        "X-Title": os.getenv("OPENROUTER_TITLE", "HygieiAI"),
-    }
-    payload: Dict[str, Any] = {
-        "model": model,
-        "messages": [
+async def _or_chat(
+    model: str, system: str, user: str, json_mode: bool = False, stage: str = "chat"
+) -> str:
+    if bodies_enabled():
+        logger.info(
+            "llm call", extra={"model": model, "stage": stage, "system": system, "user": user}
+        )
+    out = await llm_client.chat(
+        model,
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-    }
-    if json_mode:
-        payload["response_format"] = {"type": "json_object"}
-    print(f"\n[LLM CALL] {model}\n[SYSTEM]\n{system}\n[USER]\n{user}")
-    r = httpx.post(
-        f"{OR_BASE}/chat/completions", headers=headers, json=payload, timeout=60
+        json_mode=json_mode,
+        stage=stage,
+        agent="extraction",
     )
-    r.raise_for_status()
-    out = r.json()["choices"][0]["message"]["content"]
-    print(f"[RAW]\n{out}\n")
+    if bodies_enabled():
+        logger.info("llm output", extra={"model": model, "stage": stage, "output": out})
     return out
 
 
-# ---- public entrypoint for your service ----
-def process_text(text: Optional[str], memory):
-    if text is None:
-        print("agent.process_text called with no text")
-        return
-    print("agent.process_text called with:", text)
-    print("=" * 72)
+# ---- pipeline stages ----
+def _gates(text: str) -> Dict[str, bool]:
+    hits = KEYWORD_MATCHER.scan(text)
+    force_med = bool(hits.medical)
+    emerg = bool(hits.emergency)
+    logger.debug(
+        "keyword gates",
+        extra={"keyword_sieve": force_med, "emergency_pattern": emerg, "negated": sorted(hits.negated)},
+    )
+    return {"force_med": force_med, "emerg": emerg}
 
-    force_med = _kw_sieve(text)
-    emerg = _emergency_hit(text)
-    print(f"- keyword_sieve={force_med}")
-    print(f"- emergency_pattern={emerg}")
 
-    # 1) classify
-    cls_raw = _or_chat(MODEL_CLS, SYSTEM_CLASSIFIER, text, json_mode=True)
+async def _load_memory(memory) -> Optional[str]:
+    if callable(memory):
+        return await memory()
+    return memory
+
+
+async def _classify(text: str, gates: Dict[str, bool]) -> Dict[str, Any]:
+    key = cls_cache.key(MODEL_CLS, SYSTEM_CLASSIFIER, text)
+    cached = cls_cache.get(key)
+    if cached is not None:
+        logger.debug("classifier cache hit")
+        return cached
+
+    # keyword hits need the LLM's essence/red_flags, so only unflagged
+    # messages may take the local fast path
+    if gates["force_med"] or gates["emerg"]:
+        INTENT_FAST_PATH.gated += 1
+    else:
+        local = INTENT_FAST_PATH.classify(text)
+        if local is not None:
+            logger.debug(
+                "classifier fast path",
+                extra={"intent": local["intent"], "confidence": local["confidence"]},
+            )
+            return local
+
+    cls_raw = await _or_chat(MODEL_CLS, SYSTEM_CLASSIFIER, text, json_mode=True, stage="cls")
     try:
         cls = json.loads(cls_raw)
     except json.JSONDecodeError:
-        print("[WARN] classifier JSON parse failed -> fallback smalltalk")
-        cls = {"intent": "smalltalk", "essence": "", "red_flags": [], "confidence": 0.0}
+        logger.warning("classifier JSON parse failed -> fallback smalltalk")
+        return {"intent": "smalltalk", "essence": "", "red_flags": [], "confidence": 0.0}
+    if not isinstance(cls, dict):
+        logger.warning("classifier returned non-object JSON -> fallback smalltalk")
+        return {"intent": "smalltalk", "essence": "", "red_flags": [], "confidence": 0.0}
+    cls_cache.put(key, cls)
+    # only model answers become training pairs; cache and fast-path hits would
+    # teach the local model its own predictions
+    return {**cls, "source": "llm"}
 
+
+def _final_intent(cls: Dict[str, Any], gates: Dict[str, bool]) -> str:
     intent = cls.get("intent", "smalltalk")
-    if emerg:
+    if gates["emerg"]:
         intent = "emergency_candidate"
         cls.setdefault("red_flags", []).append("emergency_pattern_hit")
-    elif force_med and intent == "smalltalk":
+    elif gates["force_med"] and intent == "smalltalk":
         intent = "medical"
+    return intent
 
-    print(f"- classifier.intent={cls.get('intent')}  -> final.intent={intent}")
-    print(f"- essence={cls.get('essence')}")
-    print(f"- red_flags={cls.get('red_flags')}")
-    print(f"- confidence={cls.get('confidence')}")
 
-    # 2) responder
+async def _draft_reply(text: str, intent: str) -> str:
     if intent in ("medical", "emergency_candidate"):
-        rsp = _or_chat(MODEL_RSP, SYSTEM_RESPONDER_MEDICAL, text, json_mode=False)
+        rsp = await _or_chat(
+            MODEL_RSP, SYSTEM_RESPONDER_MEDICAL, text, json_mode=False, stage="rsp"
+        )
     elif intent == "routine_checkin":
-        rsp = _or_chat(
+        rsp = await _or_chat(
             MODEL_RSP,
             SYSTEM_RESPONDER_SMALLTALK,
             "How are you feeling today?",
             json_mode=False,
+            stage="rsp",
         )
     else:
-        rsp = _or_chat(MODEL_RSP, SYSTEM_RESPONDER_SMALLTALK, text, json_mode=False)
-    print(f"- reply:\n{rsp}")
+        rsp = await _or_chat(
+            MODEL_RSP, SYSTEM_RESPONDER_SMALLTALK, text, json_mode=False, stage="rsp"
+        )
+    if bodies_enabled():
+        logger.info("draft reply", extra={"reply": rsp})
+    return rsp
 
-    # 3) safety + summary
-    safety_input = f"USER:\n{text}\n---\nASSISTANT:\n{rsp}"
-    s_raw = _or_chat(MODEL_SFT, SYSTEM_SAFETY, safety_input, json_mode=True)
+
+async def _safety(text: str, rsp: Optional[str] = None) -> Dict[str, Any]:
+    if rsp is None:
+        s_raw = await _or_chat(MODEL_SFT, SYSTEM_SAFETY_USER, text, json_mode=True, stage="safety")
+    else:
+        safety_input = f"USER:\n{text}\n---\nASSISTANT:\n{rsp}"
+        s_raw = await _or_chat(
+            MODEL_SFT, SYSTEM_SAFETY, safety_input, json_mode=True, stage="safety"
+        )
     try:
-        s = json.loads(s_raw)
+        return json.loads(s_raw)
     except json.JSONDecodeError:
-        print("[WARN] safety JSON parse failed -> default flags")
-        s = {
+        logger.warning("safety JSON parse failed -> default flags")
+        return {
             "medically_relevant": False,
             "emergency": False,
             "safety_ok": True,
             "db_summary": "N/A",
         }
 
+
+async def _build_stages(text: str, memory) -> List[Stage]:
+    stages = [
+        Stage("memory", lambda: _load_memory(memory)),
+        Stage("gates", lambda: _gates(text)),
+        Stage("cls", lambda gates: _classify(text, gates), deps=["gates"]),
+        Stage("intent", _final_intent, deps=["cls", "gates"]),
+    ]
+    # the draft reply is an extra LLM call; conversations over budget go without
+    if DRAFT_RESPONDER and not await ledger.over_budget():
+        stages += [
+            Stage("rsp", lambda intent: _draft_reply(text, intent), deps=["intent"]),
+            Stage("safety", lambda rsp: _safety(text, rsp), deps=["rsp"]),
+        ]
+    else:
+        stages.append(Stage("safety", lambda: _safety(text)))
+    return stages
+
+
+# ---- public entrypoint for your service ----
+async def process_text(text: Optional[str], memory):
+    if text is None:
+        logger.warning("process_text called with no text")
+        return
+
+    out = await run_dag(await _build_stages(text, memory))
+    memory = out["memory"]
+    force_med = out["gates"]["force_med"]
+    emerg = out["gates"]["emerg"]
+    cls = out["cls"]
+    intent = out["intent"]
+    s = out["safety"]
+
+    if cls.get("source") == "llm":
+        log_pair(text, intent)
+
     medically_relevant = bool(s.get("medically_relevant", False)) or (
         intent in ("medical", "emergency_candidate")
     )
     emergency_flag = bool(s.get("emergency", False)) or emerg
-    print(
-        f"- safety.medically_relevant={s.get('medically_relevant')} -> store={medically_relevant}"
-    )
-    print(
-        f"- safety.emergency={s.get('emergency')} or gate={emerg} -> emergency={emergency_flag}"
-    )
-    print(f"- safety.safety_ok={s.get('safety_ok')}")
-    print(f"- safety.db_summary={s.get('db_summary')}")
-    if medically_relevant or emergency_flag:
-        print("[STORE] would store encounter summary and reply")
-    else:
-        print("[SKIP STORE] smalltalk or non-medical")
+    # one line per turn; free-text fields only when bodies are enabled
+    fields = {
+        "classifier_intent": cls.get("intent"),
+        "intent": intent,
+        "confidence": cls.get("confidence"),
+        "keyword_sieve": force_med,
+        "emergency_pattern": emerg,
+        "medically_relevant": medically_relevant,
+        "emergency": emergency_flag,
+        "safety_ok": s.get("safety_ok"),
+    }
+    if bodies_enabled():
+        fields.update(
+            essence=cls.get("essence"),
+            red_flags=cls.get("red_flags"),
+            db_summary=s.get("db_summary"),
+        )
+    logger.info("turn classified", extra=fields)
 
     llm_prompt = build_llm_prompt(
         memory=memory,
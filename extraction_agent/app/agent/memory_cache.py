@@ -0,0 +1,112 @@
+"""
+memory_cache: local, versioned copy of the per-conversation memory that
+summary_agent owns.
+
+summary_agent pushes every new memory version to POST /memory, so a turn
+normally reads memory without a network round trip. The cache only pulls
+from summary_agent's /final-message on a miss, when a push announced a
+newer version without its body (a version gap), or once an entry is older
+than MEMORY_CACHE_MAX_AGE. That last check is a safety net for pushes that
+landed on another uvicorn worker. If a pull fails, the last known memory is
+served instead so slow summary calls don't block the turn.
+
+summary_agent is the source of truth: a pulled memory replaces the cached
+entry even when that entry claims a higher version (a bad push, or
+summary_agent's versions starting over after a store reset). Only a push
+that landed while the pull was in flight is kept over it.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "10000"))
+MEMORY_CACHE_MAX_AGE = float(os.getenv("MEMORY_CACHE_MAX_AGE", "60"))
+
+# pull(conv_id) -> (message, version)
+Puller = Callable[[str], Awaitable[Optional[Tuple[str, int]]]]
+
+
+class _Entry:
+    __slots__ = ("message", "version", "stored_at", "stale")
+
+    def __init__(self, message: Optional[str], version: int, stale: bool = False) -> None:
+        self.message = message
+        self.version = version
+        self.stored_at = time.monotonic()
+        self.stale = stale
+
+
+class MemoryCache:
+    def __init__(self, size: int = MEMORY_CACHE_SIZE, max_age: float = MEMORY_CACHE_MAX_AGE) -> None:
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._size = size
+        self._max_age = max_age
+        self.hits = 0
+        self.pulls = 0
+        self.pull_failures = 0
+        self.pushes = 0
+        self.stale_pushes = 0
+
+    def _put(self, conv_id: str, entry: _Entry) -> None:
+        self._entries[conv_id] = entry
+        self._entries.move_to_end(conv_id)
+        while len(self._entries) > self._size:
+            self._entries.popitem(last=False)
+
+    def push(self, conv_id: str, version: int, message: Optional[str] = None) -> bool:
+        """Apply a pushed update. Returns False if it is older than what we hold."""
+        cur = self._entries.get(conv_id)
+        if cur is not None and version <= cur.version:
+            self.stale_pushes += 1
+            return False
+        self.pushes += 1
+        if message is None:
+            # version-only notification: keep the old body, pull on next read
+            old = cur.message if cur is not None else None
+            self._put(conv_id, _Entry(old, version, stale=True))
+        else:
+            self._put(conv_id, _Entry(message, version))
+        return True
+
+    async def get(self, conv_id: str, pull: Puller) -> Optional[str]:
+        entry = self._entries.get(conv_id)
+        if (
+            entry is not None
+            and not entry.stale
+            and time.monotonic() - entry.stored_at < self._max_age
+        ):
+            self._entries.move_to_end(conv_id)
+            self.hits += 1
+            return entry.message
+
+        self.pulls += 1
+        pulled = await pull(conv_id)
+        if pulled is None:
+            self.pull_failures += 1
+            # serve the last known memory rather than nothing
+            return entry.message if entry is not None else None
+
+        message, version = pulled
+        cur = self._entries.get(conv_id)
+        if cur is not None and cur is not entry and cur.version > version:
+            # a newer push raced with our pull; keep the pushed entry
+            return cur.message
+        self._put(conv_id, _Entry(message, version))
+        return message
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "max_age_s": self._max_age,
+            "hits": self.hits,
+            "pulls": self.pulls,
+            "pull_failures": self.pull_failures,
+            "pushes": self.pushes,
+            "stale_pushes": self.stale_pushes,
+        }
+
+
+memory_cache = MemoryCache()
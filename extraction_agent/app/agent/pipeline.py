@@ -0,0 +1,80 @@
+"""
+pipeline: tiny dependency-graph executor for the per-turn stages.
+Each stage starts as soon as the stages it depends on have finished, so
+independent LLM calls (classifier, safety) and I/O (memory fetch) overlap.
+"""
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List
+
+from ..metrics import record
+
+
+@dataclass
+class Stage:
+    """A named unit of work; fn receives the results of deps as keyword args."""
+
+    name: str
+    fn: Callable[..., Any]
+    deps: List[str] = field(default_factory=list)
+
+
+def _check_graph(stages: List[Stage]) -> None:
+    names = {s.name for s in stages}
+    if len(names) != len(stages):
+        raise ValueError("duplicate stage names")
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"stage {s.name!r} depends on unknown {missing}")
+
+    # Kahn's algorithm: anything left over sits on a cycle
+    indeg = {s.name: len(s.deps) for s in stages}
+    ready = [n for n, d in indeg.items() if d == 0]
+    seen = 0
+    while ready:
+        n = ready.pop()
+        seen += 1
+        for s in stages:
+            if n in s.deps:
+                indeg[s.name] -= 1
+                if indeg[s.name] == 0:
+                    ready.append(s.name)
+    if seen != len(stages):
+        raise ValueError("stage graph has a cycle")
+
+
+async def run_dag(stages: List[Stage]) -> Dict[str, Any]:
+    """Run all stages concurrently, honouring deps. Returns name -> result.
+
+    If any stage raises, the remaining stages are cancelled and the first
+    exception propagates to the caller.
+    """
+    _check_graph(stages)
+    tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+    async def _run(stage: Stage) -> Any:
+        inputs = {d: await tasks[d] for d in stage.deps}
+        # time the stage itself, not the wait for its deps
+        t0 = time.perf_counter()
+        out = stage.fn(**inputs)
+        if inspect.isawaitable(out):
+            out = await out
+        record(f"stage.{stage.name}", time.perf_counter() - t0)
+        return out
+
+    # create every task before any of them runs, so deps can be looked up
+    for s in stages:
+        tasks[s.name] = asyncio.create_task(_run(s), name=f"stage:{s.name}")
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except BaseException:
+        for t in tasks.values():
+            t.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+    return {name: t.result() for name, t in tasks.items()}
@@ -1,9 +1,20 @@
-from fastapi import FastAPI
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import auth, deadline, log, metrics
+from .agent import llm_client
+from .agent.ledger import ledger
+
 # import and include routers
 from .routes.post import router as post_router
+from .routes.memory import router as memory_router
+from .routes.admin import router as admin_router
+
 
+log.setup("extraction_agent")
 
 app = FastAPI(title="extraction_agent")
 
@@ -16,10 +27,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# honour the caller's X-Request-Budget-Ms; cancel work on expiry or disconnect
+app.add_middleware(deadline.DeadlineMiddleware)
+
+# /admin/* and /usage need ADMIN_TOKEN
+app.add_middleware(auth.AdminTokenMiddleware)
+
+# memory pushes go into the control prompt; only summary_agent may send them
+app.add_middleware(auth.ServiceTokenMiddleware, paths=["/memory"])
+
+# request latency / in-flight metrics, Server-Timing and X-Request-ID
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
     app.include_router(post_router)
+    app.include_router(memory_router)
+    app.include_router(admin_router)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # release pooled OpenRouter connections
+    await llm_client.aclose()
+    metrics.mark_process_dead()
+    log.shutdown()
 
 
 @app.get("/")
@@ -36,3 +69,58 @@ async def extract():
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return metrics.render()
+
+
+@app.get("/admin/log")
+async def log_settings():
+    """Log level, sampling, queue drops and conversations in debug mode."""
+    return log.stats()
+
+
+@app.get("/admin/llm")
+async def llm_settings():
+    """Circuit breaker state, latency and hedge counts per model."""
+    return llm_client.stats()
+
+
+@app.get("/usage")
+async def usage(
+    group_by: str = "agent,stage", hours: float = 24.0, conv_id: str = "", limit: int = 100
+):
+    """LLM calls, tokens, cost and latency from the usage ledger.
+
+    group_by: comma-separated from agent, stage, conv_id, model, outcome, hour
+    """
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    try:
+        rows = await asyncio.to_thread(ledger.aggregate, groups, hours, conv_id or None, limit)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    return {"group_by": groups, "hours": hours, "rows": rows}
+
+
+@app.post("/admin/log/debug")
+async def log_debug(request: Request):
+    """Turn debug logging (incl. prompt bodies) on or off for one conversation.
+
+    Body: {"conv_id": "...", "enabled": true, "ttl": 900}
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return PlainTextResponse("invalid json", status_code=400)
+    conv_id = str(data.get("conv_id") or "")
+    if not conv_id:
+        return PlainTextResponse("missing conv_id", status_code=400)
+    active = log.debug_conversations.set(
+        conv_id,
+        bool(data.get("enabled", True)),
+        float(data.get("ttl") or log.LOG_DEBUG_TTL),
+    )
+    return {"debug_conversations": sorted(active)}
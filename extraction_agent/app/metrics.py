@@ -0,0 +1,297 @@
+"""
+metrics: Prometheus metrics, Server-Timing and request-id propagation.
+
+MetricsMiddleware times every request, counts in-flight requests and adds
+X-Request-ID plus a Server-Timing header to the response. Code that calls
+out wraps the call in llm_timer() or hop(); each call is observed in a
+histogram and listed in Server-Timing (entries recorded before the response
+headers go out). outbound_headers() forwards the request id to the next
+service, so one turn can be followed across every hop, together with the
+remaining request budget (see deadline.py).
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory so /metrics aggregates all of them.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .deadline import headers as budget_headers
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# LLM calls dominate: resolve 50ms .. 60s
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60)
+
+# a private registry keeps several services importable in one process
+REGISTRY = CollectorRegistry()
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve a request, until the response body is complete",
+    ["method", "route", "status"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being served",
+    multiprocess_mode="livesum",
+    registry=REGISTRY,
+)
+LLM_SECONDS = Histogram(
+    "llm_call_duration_seconds",
+    "Latency of one OpenRouter chat completion",
+    ["model", "stage", "outcome"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+LLM_HEDGES = Counter(
+    "llm_hedges_total",
+    "Hedged second requests sent, by which attempt answered first",
+    ["model", "winner"],
+    registry=REGISTRY,
+)
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total",
+    "LLM calls that gave up on a model and moved down the fallback chain",
+    ["model", "reason"],
+    registry=REGISTRY,
+)
+LLM_CIRCUIT_OPEN = Gauge(
+    "llm_circuit_open",
+    "1 while the circuit breaker for a model is open",
+    ["model"],
+    multiprocess_mode="livemax",
+    registry=REGISTRY,
+)
+# session stores shared by workers report the same numbers; keep the latest
+SESSIONS_STORED = Gauge(
+    "sessions_stored",
+    "Conversation sessions held by a session store",
+    ["store"],
+    multiprocess_mode="livemostrecent",
+    registry=REGISTRY,
+)
+SESSIONS_BYTES = Gauge(
+    "sessions_stored_bytes",
+    "Approximate size of the serialised session state in a session store",
+    ["store"],
+    multiprocess_mode="livemostrecent",
+    registry=REGISTRY,
+)
+SESSIONS_EVICTED = Counter(
+    "sessions_evicted_total",
+    "Sessions dropped by a session store, by reason (ttl, size)",
+    ["store", "reason"],
+    registry=REGISTRY,
+)
+SCHEDULE_RESOLVER = Counter(
+    "schedule_resolver_total",
+    "Schedule replies seen by the local slot resolver, by kind and outcome "
+    "(hit, conflict, ambiguous, miss); the rest went to the LLM",
+    ["kind", "outcome"],
+    registry=REGISTRY,
+)
+# backend /post admission control (app/admission.py)
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Turns admitted at the gateway and not yet finished",
+    multiprocess_mode="livesum",
+    registry=REGISTRY,
+)
+ADMISSION_QUEUE = Gauge(
+    "admission_queue_length",
+    "Turns waiting at the gateway for an in-flight slot",
+    multiprocess_mode="livesum",
+    registry=REGISTRY,
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds",
+    "Time a turn waited at the gateway, by outcome (admitted, rejected)",
+    ["outcome"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Turns turned away with 429, by reason (queue_full, timeout)",
+    ["reason"],
+    registry=REGISTRY,
+)
+HOP_SECONDS = Histogram(
+    "downstream_hop_duration_seconds",
+    "Latency of a call to another service",
+    ["target", "outcome"],
+    buckets=BUCKETS,
+    registry=REGISTRY,
+)
+
+_request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="")
+# (name, ms) entries for the Server-Timing header of the current request
+_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "timings", default=None
+)
+
+
+def request_id() -> str:
+    return _request_id.get()
+
+
+def outbound_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Headers for a downstream call, carrying the request id and budget."""
+    out = dict(headers or {})
+    out.update(budget_headers())
+    rid = _request_id.get()
+    if rid:
+        out[REQUEST_ID_HEADER] = rid
+    return out
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a Server-Timing entry to the current request (no-op outside one)."""
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds * 1000.0))
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    if exc is None:
+        return "ok"
+    if isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+        return "cancelled"
+    return "error"
+
+
+@asynccontextmanager
+async def llm_timer(model: str, stage: str) -> AsyncIterator[None]:
+    """Time one LLM call: llm_call_duration_seconds + Server-Timing llm.<stage>."""
+    t0 = time.perf_counter()
+    exc: Optional[BaseException] = None
+    try:
+        yield
+    except BaseException as e:
+        exc = e
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        LLM_SECONDS.labels(model, stage, _outcome(exc)).observe(dt)
+        record(f"llm.{stage}", dt)
+
+
+class Hop:
+    """Handle yielded by hop(); call .response(r) to record the status."""
+
+    def __init__(self) -> None:
+        self.status: Optional[int] = None
+
+    def response(self, r) -> None:
+        self.status = r.status_code
+
+
+@asynccontextmanager
+async def hop(target: str) -> AsyncIterator[Hop]:
+    """Time one downstream call: downstream_hop_duration_seconds + Server-Timing hop.<target>."""
+    h = Hop()
+    t0 = time.perf_counter()
+    exc: Optional[BaseException] = None
+    try:
+        yield h
+    except BaseException as e:
+        exc = e
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        outcome = _outcome(exc)
+        if outcome == "ok" and h.status is not None and h.status >= 400:
+            outcome = str(h.status)
+        HOP_SECONDS.labels(target, outcome).observe(dt)
+        record(f"hop.{target}", dt)
+
+
+def _server_timing(total_s: float, timings: List[Tuple[str, float]]) -> str:
+    parts = [f"app;dur={total_s * 1000.0:.1f}"]
+    parts += [f"{name};dur={ms:.1f}" for name, ms in timings]
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are timed to the last byte."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = ""
+        for k, v in scope.get("headers") or []:
+            if k == b"x-request-id":
+                rid = v.decode("latin-1")[:128]
+                break
+        rid = rid or uuid.uuid4().hex
+        timings: List[Tuple[str, float]] = []
+        rid_token = _request_id.set(rid)
+        timings_token = _timings.set(timings)
+        status = 500
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-request-id", rid.encode("latin-1")))
+                headers.append(
+                    (b"server-timing", _server_timing(time.perf_counter() - t0, timings).encode())
+                )
+                headers.append((b"timing-allow-origin", b"*"))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # label by route template, not raw path, to bound cardinality
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            REQUEST_SECONDS.labels(scope.get("method", ""), route, str(status)).observe(
+                time.perf_counter() - t0
+            )
+            _timings.reset(timings_token)
+            _request_id.reset(rid_token)
+
+
+def render() -> Response:
+    """Body of the /metrics scrape endpoint."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the multiprocess directory."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
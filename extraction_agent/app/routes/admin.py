@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+
+from ..agent.cls_cache import cls_cache
+from ..agent.main import INTENT_FAST_PATH
+
+router = APIRouter(prefix="/admin")
+
+
+@router.get("/classifier-cache")
+async def classifier_cache_stats():
+    return cls_cache.stats()
+
+
+@router.post("/classifier-cache/flush")
+async def classifier_cache_flush():
+    return {"flushed": cls_cache.flush()}
+
+
+@router.get("/intent-model")
+async def intent_model_stats():
+    return INTENT_FAST_PATH.stats()
+
+
+@router.post("/intent-model/reload")
+async def intent_model_reload():
+    return {"loaded": INTENT_FAST_PATH.reload()}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from ..agent.memory_cache import memory_cache
+from ..wire import MemoryPush, parse
+
+router = APIRouter()
+
+
+# ---- in-process entrypoint (monolith mode, see app/transport.py) ----
+async def apply_push(push: MemoryPush) -> bool:
+    """Apply a memory push from summary_agent; False if it was stale."""
+    return memory_cache.push(push.conv_id, push.version, push.final_message)
+
+
+@router.post("/memory")
+async def push_memory(request: Request):
+    """summary_agent pushes each new memory version here."""
+    push = parse(MemoryPush, await request.body(), request.headers.get("content-type", ""))
+    if push is None:
+        return PlainTextResponse("invalid memory push", status_code=400)
+    return JSONResponse({"applied": await apply_push(push)})
+
+
+@router.get("/memory/stats")
+async def memory_stats():
+    return memory_cache.stats()
@@ -1,78 +1,159 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import json
+import logging
+from typing import AsyncIterator, Optional, Tuple
+
 import httpx
 
 from ..agent.main import process_text
+from ..agent.memory_cache import memory_cache
+from .. import deadline, transport
+from ..log import bind, bodies_enabled
+from ..metrics import hop, outbound_headers
+from ..wire import JSON_HEADERS, Reply, Turn, encode, parse
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/post")
-async def receive_post(request: Request):
-    # read body and attempt to extract text
-    body = await request.body()
-    content_type = request.headers.get("content-type", "application/octet-stream")
-
-    received_text = None
-    try:
-        if content_type and "application/json" in content_type:
-            data = json.loads(body.decode("utf-8", errors="replace"))
-            if isinstance(data, dict):
-                received_text = data.get("text")
-        elif content_type and content_type.startswith("text/"):
-            received_text = body.decode("utf-8", errors="replace")
-    except Exception:
-        pass
+def _sse_error(message: str) -> bytes:
+    return f"event: error\ndata: {json.dumps({'error': message})}\n\n".encode()
 
-    if received_text is None:
-        return PlainTextResponse("Missing text in request", status_code=400)
 
-    # call agent
+async def _pull_final_message(conv_id: str):
+    """Fetch the conversation memory from summary_agent (cache miss path)."""
     try:
-        # fetch FINAL_MESSAGE from summary_agent and include it as context
-        final_msg = None
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
+        async with hop("summary"):
+            peer = transport.local("summary.final_message")
+            if peer is not None:
+                return await peer(conv_id)
+            async with httpx.AsyncClient(timeout=deadline.timeout(5.0)) as client:
                 resp = await client.get(
                     "http://summary_agent:8002/final-message",
+                    params={"conv_id": conv_id},
+                    headers=outbound_headers(),
+                )
+            if resp.status_code == 200:
+                data = resp.json()
+                logger.debug(
+                    "pulled memory from summary_agent", extra={"version": data.get("version")}
                 )
-                if resp.status_code == 200:
-                    try:
-                        data = resp.json()
-                        final_msg = data.get("final_message")
-                    except Exception:
-                        final_msg = None
-        except Exception as e:
-            print("Could not fetch FINAL_MESSAGE from summary_agent:", e)
-
-        if final_msg:
-            print("Fetched FINAL_MESSAGE from summary_agent:", final_msg)
-        print("HERE")
-        processed = process_text(received_text, final_msg)
-        print("PROCESSED", processed)
+                return data.get("final_message") or "", int(data.get("version") or 0)
     except Exception as e:
-        print("agent.process_text failed:", e)
-        return PlainTextResponse("agent processing failed", status_code=500)
+        logger.warning("could not fetch memory from summary_agent: %s", e)
+    return None
 
+
+async def _prepare(text: str, conv_id: str) -> Tuple[Optional[str], Optional[Tuple[int, str]]]:
+    """Run the agent pipeline; returns (control prompt, None) or (None, (status, error))."""
+    bind(conv_id)
+
+    # the memory lookup runs as one stage of the agent pipeline and only
+    # goes to summary_agent when the pushed cache can't answer
+    async def load_memory():
+        return await memory_cache.get(conv_id, _pull_final_message)
+
+    try:
+        processed = await process_text(text, load_memory)
+        if bodies_enabled():
+            logger.info("control prompt", extra={"prompt": processed})
+    except Exception:
+        logger.exception("process_text failed")
+        return None, (500, "agent processing failed")
     if not processed:
-        return PlainTextResponse("agent returned no processed text", status_code=500)
+        return None, (500, "agent returned no processed text")
+    return processed, None
 
-    # forward to response_agent
+
+async def _reply(reply: Reply) -> Tuple[int, str]:
+    """Have response_agent write the reply; returns (status, body)."""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            # include the original received_text as the 'user' field so the
-            # response agent receives both the processed output and the
-            # original user message.
-            resp = await client.post(
-                "http://response_agent:8003/post",
-                json={"text": processed, "user_message": received_text},
-                headers={"Content-Type": "application/json"},
-            )
-            return PlainTextResponse(resp.text, status_code=resp.status_code)
+        async with hop("response") as h:
+            peer = transport.local("response.reply")
+            if peer is not None:
+                return await peer(reply)
+            async with httpx.AsyncClient(timeout=deadline.timeout(30.0)) as client:
+                resp = await client.post(
+                    "http://response_agent:8003/post",
+                    content=encode(reply),
+                    headers=outbound_headers(JSON_HEADERS),
+                )
+            h.response(resp)
+            return resp.status_code, resp.text
+    except Exception as e:
+        logger.warning("failed to contact response_agent: %s", e)
+        return 502, "ERROR contacting response_agent: " + str(e)
+
 
+async def _relay_stream(reply: Reply) -> AsyncIterator[bytes]:
+    """Relay response_agent's SSE reply stream to our caller as it arrives."""
+    try:
+        async with hop("response") as h:
+            peer = transport.local("response.reply_stream")
+            if peer is not None:
+                async for chunk in peer(reply):
+                    yield chunk
+                return
+            async with httpx.AsyncClient(timeout=deadline.timeout(30.0)) as client:
+                async with client.stream(
+                    "POST",
+                    "http://response_agent:8003/post",
+                    content=encode(reply),
+                    headers=outbound_headers({**JSON_HEADERS, "Accept": "text/event-stream"}),
+                ) as resp:
+                    h.response(resp)
+                    if resp.status_code != 200:
+                        detail = (await resp.aread()).decode("utf-8", errors="replace")
+                        yield _sse_error(detail)
+                        return
+                    async for chunk in resp.aiter_raw():
+                        yield chunk
     except Exception as e:
-        print("Failed to contact response_agent:", e)
-        return PlainTextResponse(
-            "ERROR contacting response_agent: " + str(e), status_code=502
+        logger.warning("failed to stream from response_agent: %s", e)
+        yield _sse_error("ERROR contacting response_agent: " + str(e))
+
+
+# ---- in-process entrypoints (monolith mode, see app/transport.py) ----
+async def handle_turn(turn: Turn) -> Tuple[int, str]:
+    """Process one user turn; returns response_agent's (status, reply)."""
+    processed, err = await _prepare(turn.text, turn.conv_id)
+    if err is not None:
+        return err
+    return await _reply(Reply(text=processed, user_message=turn.text, conv_id=turn.conv_id))
+
+
+async def stream_turn(turn: Turn) -> AsyncIterator[bytes]:
+    """Streaming variant of handle_turn, yielding SSE frames."""
+    processed, err = await _prepare(turn.text, turn.conv_id)
+    if err is not None:
+        yield _sse_error(err[1])
+        return
+    reply = Reply(text=processed, user_message=turn.text, conv_id=turn.conv_id)
+    async for chunk in _relay_stream(reply):
+        yield chunk
+
+
+@router.post("/post")
+async def receive_post(request: Request):
+    turn = parse(Turn, await request.body(), request.headers.get("content-type", ""))
+    if turn is None:
+        return PlainTextResponse("Missing text in request", status_code=400)
+
+    processed, err = await _prepare(turn.text, turn.conv_id)
+    if err is not None:
+        return PlainTextResponse(err[1], status_code=err[0])
+    # the original user message travels with the control prompt
+    reply = Reply(text=processed, user_message=turn.text, conv_id=turn.conv_id)
+
+    # streaming mode: pass response_agent's event stream straight through
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            _relay_stream(reply),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
+
+    # forward to response_agent
+    status, body = await _reply(reply)
+    return PlainTextResponse(body, status_code=status)
@@ -0,0 +1,89 @@
+"""
+wire: typed request bodies exchanged between the services.
+
+Each hop's body is a pydantic model, decoded straight from the request
+bytes (model_validate_json) and encoded straight to bytes (encode()). Both
+run in pydantic-core's Rust JSON codec, so a turn is never turned into a
+dict or a str on the way. In monolith mode the transport registry passes
+the model objects themselves and nothing is encoded at all.
+
+    backend /post, extraction /post       Turn
+    extraction -> response /post          Reply
+    response -> summary /post             SummaryTurn
+    summary -> extraction /memory         MemoryPush
+
+Older field names are still accepted ("user" and "user_message", and
+"assistant_text"/"user_text" on summary_agent). text/* bodies are read as
+the turn's text.
+"""
+
+from typing import Optional, Type, TypeVar
+
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, ValidationError, field_validator
+from pydantic_core import to_json
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class _Body(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True, populate_by_name=True)
+
+    @field_validator("conv_id", mode="before", check_fields=False)
+    @classmethod
+    def _default_conv(cls, v: object) -> str:
+        # callers that send no conversation share "default"
+        return str(v) if v else "default"
+
+
+class Turn(_Body):
+    """One user message as the browser sends it."""
+
+    text: str
+    conv_id: str = "default"
+
+
+class Reply(_Body):
+    """extraction_agent's control prompt and the user message it answers."""
+
+    text: str
+    user_message: Optional[str] = Field(
+        None, validation_alias=AliasChoices("user_message", "user")
+    )
+    conv_id: str = "default"
+
+
+class SummaryTurn(_Body):
+    """One finished exchange for summary_agent to judge and remember."""
+
+    text: str = Field(validation_alias=AliasChoices("text", "assistant_text"))
+    user_message: Optional[str] = Field(
+        None, validation_alias=AliasChoices("user_message", "user", "user_text")
+    )
+    conv_id: str = "default"
+
+
+class MemoryPush(_Body):
+    """A new memory version from summary_agent."""
+
+    conv_id: str = "default"
+    version: int
+    final_message: Optional[str] = None
+
+
+def parse(model: Type[M], body: bytes, content_type: str) -> Optional[M]:
+    """The request model from a JSON or text/* body; None if it isn't one."""
+    try:
+        if "application/json" in content_type:
+            return model.model_validate_json(body)
+        if content_type.startswith("text/"):
+            return model.model_validate({"text": body.decode("utf-8", errors="replace")})
+    except ValidationError:
+        pass
+    return None
+
+
+def encode(body: BaseModel) -> bytes:
+    """JSON bytes for an outgoing request (None fields left out)."""
+    return to_json(body, exclude_none=True)
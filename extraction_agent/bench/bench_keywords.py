@@ -0,0 +1,74 @@
+"""
+Microbenchmark for the keyword gates.
+
+Compares the old per-keyword substring scan with the compiled
+Aho-Corasick matcher as the vocabulary grows. Run from extraction_agent/:
+
+    python -m bench.bench_keywords [--sizes 30,300,3000,30000] [--repeat 2000]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from app.agent.keyword_matcher import KeywordMatcher
+
+MESSAGES = [
+    "Good morning, I slept well and had some porridge.",
+    "My back hurts again, it's a dull ache since yesterday evening.",
+    "I'm fine thank you, just watching the birds from the window.",
+    "No chest pain today but I felt a bit dizzy after standing up.",
+    "I had chest pain and my left arm felt numb for ten minutes.",
+    "The grandchildren visited and we baked cinnamon buns together.",
+]
+
+SEED_TERMS = ["pain", "ache", "dizzy", "fall", "bleed", "chest", "numb", "fever"]
+
+
+def _vocab(n: int, rng: random.Random):
+    words = list(SEED_TERMS)
+    while len(words) < n:
+        k = rng.randint(4, 12)
+        words.append("".join(rng.choice(string.ascii_lowercase) for _ in range(k)))
+    return words[:n]
+
+
+def _naive(terms):
+    def scan(t: str) -> bool:
+        t = t.lower()
+        return any(k in t for k in terms)
+
+    return scan
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for m in MESSAGES:
+            fn(m)
+    return (time.perf_counter() - start) / (repeat * len(MESSAGES)) * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", default="30,300,3000,30000")
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'terms':>8} {'states':>9} {'build ms':>9} {'naive us':>9} {'automaton us':>13}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        terms = _vocab(n, rng)
+        t0 = time.perf_counter()
+        matcher = KeywordMatcher(terms, [("chest pain", ["left arm", "sweating"])])
+        build_ms = (time.perf_counter() - t0) * 1e3
+        # the naive scan short-circuits on the first hit; use the negative
+        # (no hit) case as its worst case, which is most small talk
+        naive_us = _time_per_call(_naive(terms[len(SEED_TERMS):] or terms), max(1, args.repeat // 10))
+        ac_us = _time_per_call(matcher.scan, args.repeat)
+        print(f"{n:>8} {matcher.states:>9} {build_ms:>9.1f} {naive_us:>9.1f} {ac_us:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the service's `app` package, as uvicorn sees it from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.agent.main refuses to import without a key; keep the ledger off disk
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+os.environ.setdefault("LEDGER_DB_PATH", ":memory:")
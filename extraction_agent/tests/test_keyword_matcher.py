@@ -0,0 +1,56 @@
+import pytest
+
+from app.agent.keyword_matcher import KeywordMatcher
+from app.agent.main import KEYWORD_MATCHER as matcher
+
+
+@pytest.mark.parametrize(
+    "text, term",
+    [
+        ("No, I have chest pain and shortness of breath", "chest pain"),
+        ("No. Slurred speech since this morning", "slurred speech"),
+        ("I have not been well, chest pain going to my left arm", "chest pain"),
+        ("I have not been well chest pain going to my left arm", "chest pain"),
+        ("never mind that; worst headache of my life", "worst headache"),
+    ],
+)
+def test_negation_does_not_hide_emergencies(text, term):
+    assert term in matcher.scan(text).emergency
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "no chest pain, just a bit breathless",
+        "I don't have slurred speech",
+        "without severe bleeding",
+    ],
+)
+def test_directly_negated_emergencies(text):
+    assert matcher.scan(text).emergency == []
+
+
+def test_negation_stops_at_clause_punctuation():
+    hits = matcher.scan("no fever. pain in my knee")
+    assert "pain" in hits.medical and "fever" in hits.negated
+    assert "pain" in matcher.scan("not dizzy! pain since yesterday").medical
+
+
+def test_negation_window_still_applies_to_medical_terms():
+    assert matcher.scan("no real fever today").medical == set()
+
+
+@pytest.mark.parametrize("text", ["I was cutting onions", "I cut my finger", "it keeps bleeding"])
+def test_inflections(text):
+    assert matcher.scan(text).medical
+
+
+@pytest.mark.parametrize("text", ["a shortcut home", "what a cute dog", "cutter"])
+def test_word_boundaries(text):
+    assert "cut" not in matcher.scan(text).medical
+
+
+def test_doubled_consonant_inflections():
+    m = KeywordMatcher(["stab"], [])
+    assert m.scan("stabbing pain").medical and m.scan("I was stabbed").medical
+    assert not m.scan("stabbity").medical
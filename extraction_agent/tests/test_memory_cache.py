@@ -0,0 +1,34 @@
+import asyncio
+
+from app.agent.memory_cache import MemoryCache
+
+
+def _puller(result):
+    async def pull(conv_id):
+        return result
+
+    return pull
+
+
+def test_pull_replaces_a_higher_cached_version():
+    cache = MemoryCache(max_age=0)
+    assert cache.push("c", 10**9, "injected")
+    # summary_agent is the source of truth, whatever version it is at
+    assert asyncio.run(cache.get("c", _puller(("real memory", 3)))) == "real memory"
+    assert cache.push("c", 4, "next")
+
+
+def test_push_during_pull_wins():
+    cache = MemoryCache(max_age=0)
+
+    async def pull(conv_id):
+        cache.push(conv_id, 5, "pushed meanwhile")
+        return ("pulled", 4)
+
+    assert asyncio.run(cache.get("c", pull)) == "pushed meanwhile"
+
+
+def test_failed_pull_serves_last_known():
+    cache = MemoryCache(max_age=0)
+    cache.push("c", 1, "known")
+    assert asyncio.run(cache.get("c", _puller(None))) == "known"
@@ -7,6 +7,51 @@ import ScheduleSidebar from '@/components/ScheduleSidebar';
 import Navbar from '@/components/Navbar';
 import ChatHistory, { ChatMessage } from '@/components/ChatHistory';
 
+// Parse a server-sent event stream, calling onEvent for each complete frame.
+async function readEvents(
+  body: ReadableStream<Uint8Array>,
+  onEvent: (event: string, data: any) => void
+) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep: number;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      let parsed: any;
+      try {
+        parsed = data ? JSON.parse(data) : {};
+      } catch {
+        parsed = { text: data };
+      }
+      onEvent(event, parsed);
+    }
+  }
+}
+
+// One conversation id per browser, so the agents keep this user's history
+// and memory apart from everyone else's.
+function conversationId(): string {
+  const KEY = 'conv_id';
+  let id = localStorage.getItem(KEY);
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem(KEY, id);
+  }
+  return id;
+}
+
 export default function Home() {
   const [text, setText] = useState<string>('');
   const [chatHistory, setChatHistory] = useState<ChatMessage[]>([]);
@@ -23,6 +68,7 @@ export default function Home() {
 
   const {
     speak,
+    enqueue: enqueueTTS,
     stop: stopTTS,
     status: ttsStatus,
     isPlaying: ttsPlaying,
@@ -51,32 +97,74 @@ export default function Home() {
     try {
       const res = await fetch(`${BACKEND_URL}/post`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text: userText }),
+        headers: {
+          'Content-Type': 'application/json',
+          // Ask for the reply as server-sent events so speech can start on
+          // the first sentence while the rest is still being generated.
+          Accept: 'text/event-stream',
+        },
+        body: JSON.stringify({ text: userText, conv_id: conversationId() }),
       });
-      const msg = await res.text();
-      setStatus('Sent: ' + msg);
-
-      // Add AI response to chat history
-      const aiMessage: ChatMessage = {
-        id: `ai-${Date.now()}`,
-        text: msg,
-        sender: 'ai',
-        timestamp: new Date(),
-      };
-      setChatHistory((prev) => [...prev, aiMessage]);
 
-      try {
-        if (msg && typeof speak === 'function') speak(msg);
-      } catch (ttsErr) {
-        setStatus((s) => s + ' • TTS Error');
-        console.error('TTS error:', ttsErr);
+      const isStream = (res.headers.get('content-type') || '').includes(
+        'text/event-stream'
+      );
+      if (!isStream || !res.body) {
+        const msg = await res.text();
+        setStatus('Sent: ' + msg);
+        addAiMessage(msg);
+        try {
+          if (msg && typeof speak === 'function') speak(msg);
+        } catch (ttsErr) {
+          setStatus((s) => s + ' • TTS Error');
+          console.error('TTS error:', ttsErr);
+        }
+        return;
       }
+
+      // Add an empty AI message and fill it in as the reply streams
+      const aiId = addAiMessage('');
+      let replyText = '';
+      await readEvents(res.body, (event, data) => {
+        if (event === 'delta') {
+          replyText += data.text ?? '';
+          setChatHistory((prev) =>
+            prev.map((m) => (m.id === aiId ? { ...m, text: replyText } : m))
+          );
+        } else if (event === 'sentence') {
+          try {
+            if (data.text) enqueueTTS(data.text);
+          } catch (ttsErr) {
+            setStatus((s) => s + ' • TTS Error');
+            console.error('TTS error:', ttsErr);
+          }
+        } else if (event === 'done') {
+          replyText = data.text ?? replyText;
+          setChatHistory((prev) =>
+            prev.map((m) => (m.id === aiId ? { ...m, text: replyText } : m))
+          );
+          setStatus('Sent: ' + replyText);
+        } else if (event === 'error') {
+          setStatus('Error: ' + (data.error ?? 'stream failed'));
+        }
+      });
     } catch (err: any) {
       setStatus('Error: ' + err.message);
     }
   };
 
+  const addAiMessage = (msg: string) => {
+    // Add AI response to chat history
+    const aiMessage: ChatMessage = {
+      id: `ai-${Date.now()}`,
+      text: msg,
+      sender: 'ai',
+      timestamp: new Date(),
+    };
+    setChatHistory((prev) => [...prev, aiMessage]);
+    return aiMessage.id;
+  };
+
   return (
     <div className="relative flex h-screen">
       {/* Left: your existing UI with navbar */}
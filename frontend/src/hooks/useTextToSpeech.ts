@@ -8,6 +8,12 @@ export default function useTextToSpeech() {
   const [error, setError] = useState<string | null>(null);
   const audioRef = useRef<HTMLAudioElement | null>(null);
   const controllerRef = useRef<AbortController | null>(null);
+  // Sentence queue for streamed replies: each entry is an in-flight audio
+  // request, so the next sentence is synthesized while the current one plays.
+  const queueRef = useRef<Promise<string | null>[]>([]);
+  const drainingRef = useRef(false);
+  // Resolves the queued clip that is currently playing (used when interrupted)
+  const finishRef = useRef<(() => void) | null>(null);
 
   const ELEVENLABS_API_KEY = process.env.NEXT_PUBLIC_ELEVENLABS_API_KEY ?? '';
   const hasApiKey = Boolean(
@@ -17,6 +23,48 @@ export default function useTextToSpeech() {
   // Default voice (you can change or make it configurable)
   const VOICE_ID = '21m00Tcm4TlvDq8ikWAM'; // Rachel (premier voice)
 
+  const requestAudio = useCallback(
+    async (text: string, voiceId: string | undefined, signal: AbortSignal) => {
+      const res = await fetch(
+        `https://api.elevenlabs.io/v1/text-to-speech/${
+          voiceId || VOICE_ID
+        }/stream`,
+        {
+          method: 'POST',
+          headers: {
+            'xi-api-key': ELEVENLABS_API_KEY,
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            text: text.trim(),
+            model_id: 'eleven_turbo_v2_5', // Fastest + high quality
+            voice_settings: {
+              stability: 0.5,
+              similarity_boost: 0.75,
+              style: 0.5,
+              use_speaker_boost: true,
+            },
+            // Optional: Add SSML
+            // pronunciation_dictionary_locators: [],
+          }),
+          signal,
+        }
+      );
+
+      if (!res.ok) {
+        const err = await res.text();
+        throw new Error(err || 'TTS request failed');
+      }
+
+      if (!res.body) throw new Error('No audio stream');
+
+      // Create blob URL from stream
+      const blob = await new Response(res.body).blob();
+      return URL.createObjectURL(blob);
+    },
+    [ELEVENLABS_API_KEY]
+  );
+
   const speak = useCallback(
     async (text: string, voiceId?: string) => {
       if (!hasApiKey) {
@@ -35,6 +83,7 @@ export default function useTextToSpeech() {
       if (controllerRef.current) {
         controllerRef.current.abort();
       }
+      queueRef.current = [];
 
       const controller = new AbortController();
       controllerRef.current = controller;
@@ -43,44 +92,10 @@ export default function useTextToSpeech() {
       setError(null);
 
       try {
-        const res = await fetch(
-          `https://api.elevenlabs.io/v1/text-to-speech/${
-            voiceId || VOICE_ID
-          }/stream`,
-          {
-            method: 'POST',
-            headers: {
-              'xi-api-key': ELEVENLABS_API_KEY,
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-              text: text.trim(),
-              model_id: 'eleven_turbo_v2_5', // Fastest + high quality
-              voice_settings: {
-                stability: 0.5,
-                similarity_boost: 0.75,
-                style: 0.5,
-                use_speaker_boost: true,
-              },
-              // Optional: Add SSML
-              // pronunciation_dictionary_locators: [],
-            }),
-            signal: controller.signal,
-          }
-        );
-
-        if (!res.ok) {
-          const err = await res.text();
-          throw new Error(err || 'TTS request failed');
-        }
-
-        if (!res.body) throw new Error('No audio stream');
-
-        // Create blob URL from stream
-        const blob = await new Response(res.body).blob();
-        const url = URL.createObjectURL(blob);
+        const url = await requestAudio(text, voiceId, controller.signal);
 
         // Cleanup old audio
+        finishRef.current?.();
         if (audioRef.current) {
           audioRef.current.pause();
           URL.revokeObjectURL(audioRef.current.src);
@@ -108,10 +123,75 @@ export default function useTextToSpeech() {
         setStatus('error');
       }
     },
-    [hasApiKey]
+    [hasApiKey, requestAudio]
+  );
+
+  const playUrl = useCallback(
+    (url: string) =>
+      new Promise<void>((resolve) => {
+        const audio = new Audio(url);
+        audioRef.current = audio;
+        const finish = () => {
+          URL.revokeObjectURL(url);
+          if (audioRef.current === audio) audioRef.current = null;
+          if (finishRef.current === finish) finishRef.current = null;
+          resolve();
+        };
+        finishRef.current = finish;
+        audio.onplay = () => setStatus('playing');
+        audio.onended = finish;
+        audio.onerror = () => {
+          setError('Audio playback failed');
+          finish();
+        };
+        audio.play().catch(finish);
+      }),
+    []
+  );
+
+  const drain = useCallback(async () => {
+    if (drainingRef.current) return;
+    drainingRef.current = true;
+    try {
+      while (queueRef.current.length) {
+        const next = queueRef.current.shift()!;
+        const url = await next;
+        if (url) await playUrl(url);
+      }
+    } finally {
+      drainingRef.current = false;
+    }
+    setStatus('done');
+    setTimeout(() => setStatus('idle'), 2000);
+  }, [playUrl]);
+
+  // Queue one sentence of a streamed reply; sentences play back in order.
+  const enqueue = useCallback(
+    (text: string, voiceId?: string) => {
+      if (!hasApiKey || !text.trim()) return;
+
+      if (!controllerRef.current || controllerRef.current.signal.aborted) {
+        controllerRef.current = new AbortController();
+      }
+      const signal = controllerRef.current.signal;
+
+      if (!drainingRef.current) setStatus('loading');
+      queueRef.current.push(
+        requestAudio(text, voiceId, signal).catch((err: any) => {
+          if (err.name !== 'AbortError') {
+            console.error('TTS Error:', err);
+            setError(err.message || 'Failed to generate speech');
+          }
+          return null;
+        })
+      );
+      void drain();
+    },
+    [hasApiKey, requestAudio, drain]
   );
 
   const stop = useCallback(() => {
+    queueRef.current = [];
     if (controllerRef.current) {
       controllerRef.current.abort();
       controllerRef.current = null;
@@ -122,6 +202,7 @@ export default function useTextToSpeech() {
       URL.revokeObjectURL(audioRef.current.src);
       audioRef.current = null;
     }
+    finishRef.current?.();
     setStatus('idle');
   }, []);
 
@@ -142,6 +223,7 @@ export default function useTextToSpeech() {
 
   return {
     speak,
+    enqueue,
     stop,
     pause,
     resume,
@@ -0,0 +1,162 @@
+"""
+monolith: run every agent in one process.
+
+The backend and schedule routes are served at the root exactly as in the
+multi-container setup, so the frontend needs no changes; extraction,
+response and summary are mounted under /extraction, /response and
+/summary for their stats and admin endpoints. Inter-agent calls go
+through the services' transport registry (app/transport.py) as direct
+function calls instead of HTTP.
+
+The helper modules every service carries its own copy of (metrics, log,
+deadline, transport, wire, auth, llm_client, ledger) are loaded once and
+shared, so there is one registry, one metrics/log pipeline, one turn
+deadline, one set of request models, one OpenRouter connection pool and one
+usage ledger.
+
+Run from the repository root:
+    uvicorn monolith.main:app --host 0.0.0.0 --port 8000
+"""
+
+import importlib
+import sys
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVICES = ["backend", "extraction_agent", "response_agent", "summary_agent", "schedule_agent"]
+
+# per-service copies that must be shared: module path inside a service -> services carrying it
+SHARED = {
+    "app.transport": SERVICES,
+    "app.metrics": SERVICES,
+    "app.log": SERVICES,
+    "app.deadline": SERVICES,
+    "app.wire": SERVICES,
+    "app.auth": SERVICES,
+    "app.agent.llm_client": SERVICES[1:],
+    "app.agent.ledger": SERVICES[1:],
+}
+
+
+def _share_copies() -> None:
+    """Point every service's copy of a shared helper at one module instance."""
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    for mod, services in SHARED.items():
+        rel = Path(*mod.split(".")).with_suffix(".py")
+        canonical = importlib.import_module(f"{services[0]}.{mod}")
+        source = (ROOT / services[0] / rel).read_bytes()
+        for svc in services[1:]:
+            if (ROOT / svc / rel).read_bytes() != source:
+                raise RuntimeError(
+                    f"{svc}/{rel} differs from {services[0]}/{rel}; keep the copies identical"
+                )
+            sys.modules[f"{svc}.{mod}"] = canonical
+
+
+_share_copies()
+
+from backend.app import admission, auth, deadline, log, metrics, transport  # noqa: E402  (after _share_copies)
+
+log.setup("monolith")
+
+from backend.app import main as backend_main  # noqa: E402
+from backend.app.routes import post as backend_post  # noqa: E402
+from extraction_agent.app import main as extraction_main  # noqa: E402
+from extraction_agent.app.routes import memory as extraction_memory  # noqa: E402
+from extraction_agent.app.routes import post as extraction_post  # noqa: E402
+from response_agent.app import main as response_main  # noqa: E402
+from response_agent.app.routes import post as response_post  # noqa: E402
+from schedule_agent.app import main as schedule_main  # noqa: E402
+from schedule_agent.app.routes import post as schedule_post  # noqa: E402
+from summary_agent.app import main as summary_main  # noqa: E402
+from summary_agent.app.routes import post as summary_post  # noqa: E402
+
+transport.register("extraction.turn", extraction_post.handle_turn)
+transport.register("extraction.turn_stream", extraction_post.stream_turn)
+transport.register("extraction.memory_push", extraction_memory.apply_push)
+transport.register("response.reply", response_post.handle_reply)
+transport.register("response.reply_stream", response_post.reply_stream)
+transport.register("summary.submit", summary_post.submit_turn)
+transport.register("summary.final_message", summary_main.read_final_message)
+
+SUB_APPS = [
+    backend_main.app,
+    extraction_main.app,
+    response_main.app,
+    summary_main.app,
+    schedule_main.app,
+]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # mounted apps don't get lifespan events; run their startup/shutdown here
+    async with AsyncExitStack() as stack:
+        for sub in SUB_APPS:
+            await stack.enter_async_context(sub.router.lifespan_context(sub))
+        yield
+
+
+app = FastAPI(title="monolith", lifespan=lifespan)
+
+# same admission control as backend:8000 (app/admission.py)
+app.add_middleware(admission.AdmissionMiddleware, paths=["/post"])
+
+# Allow any origin for development convenience
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# turn budget starts at /post; in-process hops share it through a contextvar
+app.add_middleware(
+    deadline.DeadlineMiddleware, default_ms=deadline.REQUEST_BUDGET_MS, paths=["/post"]
+)
+
+# /admin/* and /usage need ADMIN_TOKEN
+app.add_middleware(auth.AdminTokenMiddleware)
+
+# request latency / in-flight metrics, Server-Timing and X-Request-ID
+app.add_middleware(metrics.MetricsMiddleware)
+
+# public routes, same paths as backend:8000 and schedule_agent:8004
+app.include_router(backend_post.router)
+app.include_router(schedule_post.router)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "mode": "monolith", "in_process": transport.registered()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (all agents share one registry)."""
+    return metrics.render()
+
+
+@app.get("/admin/admission")
+async def admission_stats():
+    """Turns in flight and queued at /post, average turn time and rejections."""
+    return admission.gate.stats()
+
+
+@app.get("/usage")
+async def usage(
+    group_by: str = "agent,stage", hours: float = 24.0, conv_id: str = "", limit: int = 100
+):
+    """LLM usage of every agent (one shared ledger)."""
+    return await extraction_main.usage(group_by, hours, conv_id, limit)
+
+
+app.mount("/extraction", extraction_main.app)
+app.mount("/response", response_main.app)
+app.mount("/summary", summary_main.app)
@@ -0,0 +1,168 @@
+"""
+openrouter_stub: offline stand-in for OpenRouter's /chat/completions.
+
+Point the agents at it with OPENROUTER_BASE_URL=http://openrouter_stub:9000
+to benchmark the agent chain without spending API credits. Replies are
+canned but shaped like the real thing: JSON mode returns an object that
+matches the calling prompt (classifier, safety judge, scheduler), text
+mode returns a short reply, and stream=true emits SSE deltas.
+
+Behaviour is configured with env vars at startup or at runtime through
+POST /stub/config:
+    STUB_LATENCY     fixed:MS | uniform:LO,HI | normal:MU,SD | lognormal:MEDIAN,SIGMA
+    STUB_TOKEN_MS    delay between streamed tokens
+    STUB_ERROR_RATE  fraction of requests that fail (0..1)
+    STUB_ERROR_STATUS  HTTP status used for failures
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="openrouter_stub")
+
+CONFIG: Dict[str, Any] = {
+    "latency": os.getenv("STUB_LATENCY", "lognormal:600,0.35"),
+    "token_ms": float(os.getenv("STUB_TOKEN_MS", "15")),
+    "error_rate": float(os.getenv("STUB_ERROR_RATE", "0")),
+    "error_status": int(os.getenv("STUB_ERROR_STATUS", "500")),
+}
+STATS = {"requests": 0, "errors": 0, "streams": 0}
+
+REPLIES = [
+    "That sounds lovely. What did you enjoy most about it?",
+    "I'm sorry to hear that. When did it start, and how strong is it from 0 to 10?",
+    "Thank you for telling me. Is there anything else bothering you today?",
+]
+CLASSIFIER_OUTPUTS = [
+    {"intent": "smalltalk", "essence": "morning routine", "red_flags": [], "confidence": 0.92},
+    {"intent": "medical", "essence": "lower back pain", "red_flags": [], "confidence": 0.81},
+    {"intent": "routine_checkin", "essence": "daily check-in", "red_flags": [], "confidence": 0.77},
+]
+SAFETY_OUTPUT = {
+    "medically_relevant": True,
+    "emergency": False,
+    "safety_ok": True,
+    "db_summary": "Patient reports mild lower back pain, no red flags.",
+}
+
+
+def _latency_s() -> float:
+    kind, _, args = CONFIG["latency"].partition(":")
+    vals = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        ms = vals[0]
+    elif kind == "uniform":
+        ms = random.uniform(vals[0], vals[1])
+    elif kind == "normal":
+        ms = random.gauss(vals[0], vals[1])
+    elif kind == "lognormal":
+        ms = random.lognormvariate(math.log(vals[0]), vals[1])
+    else:
+        ms = 0.0
+    return max(ms, 0.0) / 1000.0
+
+
+def _canned(messages: List[Dict[str, str]], json_mode: bool) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    if not json_mode:
+        return random.choice(REPLIES)
+    if "medically_relevant" in system:
+        return json.dumps(SAFETY_OUTPUT)
+    if "scheduling assistant" in system:
+        # propose the first slot listed in the AVAILABILITY_ISO context block
+        ctx = " ".join(m.get("content", "") for m in messages if m.get("role") == "user")
+        slots = [l.strip() for l in ctx.splitlines() if len(l.strip()) == 16 and l.strip()[4] == "-"]
+        return json.dumps(
+            {
+                "reply": "Hello! Would the first available time work for you?",
+                "intent": "propose",
+                "service": "dentist",
+                "when_iso": slots[0] if slots else None,
+            }
+        )
+    return json.dumps(random.choice(CLASSIFIER_OUTPUTS))
+
+
+def _usage(messages: List[Dict[str, str]], out: str) -> Dict[str, int]:
+    prompt = sum(len(m.get("content", "")) for m in messages) // 4
+    completion = max(1, len(out) // 4)
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+@app.post("/chat/completions")
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    STATS["requests"] += 1
+    await asyncio.sleep(_latency_s())
+
+    if random.random() < CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        return JSONResponse(
+            {"error": {"message": "stub injected failure", "code": CONFIG["error_status"]}},
+            status_code=CONFIG["error_status"],
+        )
+
+    model = body.get("model", "stub")
+    messages = body.get("messages") or []
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    out = _canned(messages, json_mode)
+    cid = f"gen-{uuid.uuid4().hex[:12]}"
+
+    if body.get("stream"):
+        STATS["streams"] += 1
+
+        async def events():
+            for tok in out.split(" "):
+                chunk = {
+                    "id": cid,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": tok + " "}}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(CONFIG["token_ms"] / 1000.0)
+            final = {"id": cid, "model": model, "choices": [], "usage": _usage(messages, out)}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return {
+        "id": cid,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": out}, "finish_reason": "stop"}
+        ],
+        "usage": _usage(messages, out),
+    }
+
+
+@app.get("/stub/config")
+async def get_config():
+    return {**CONFIG, "stats": STATS}
+
+
+@app.post("/stub/config")
+async def set_config(request: Request):
+    """Change latency/error behaviour without restarting, e.g. mid-benchmark."""
+    updates = await request.json()
+    for k in CONFIG:
+        if k in updates:
+            CONFIG[k] = type(CONFIG[k])(updates[k])
+    return CONFIG
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
@@ -0,0 +1,320 @@
+"""
+history: token-budgeted chat history with a rolling summary per conversation.
+
+The prompt carries the newest turns that fit in HISTORY_TOKEN_BUDGET
+(estimated locally, no tokenizer round-trip) plus one summary block for
+everything older. Turns that fall out of the window are folded into that
+summary by a background LLM call once HISTORY_FOLD_TOKENS of them have
+piled up, so prompt size stays bounded however long the conversation runs
+and no reply waits on summarisation.
+
+Storage is two tiers. An append-only SQLite database in WAL mode
+(HISTORY_DB_PATH) holds every turn and every summary: a fold appends a new
+summary row saying which turns it covers, nothing is updated in place. In
+front of it an LRU of HISTORY_CACHE_SIZE conversations keeps the summary
+and the unfolded turns as compact (id, user, reply) records. Each window()
+first reads the rows appended since the cached ones (an indexed read), so
+uvicorn workers sharing the database see each other's turns and a restart
+loses nothing.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from . import llm_client
+from ..log import bind
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+HISTORY_MESSAGE_TOKENS = int(os.getenv("HISTORY_MESSAGE_TOKENS", "300"))
+HISTORY_FOLD_TOKENS = int(os.getenv("HISTORY_FOLD_TOKENS", "400"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "250"))
+# hard cap on unfolded messages if summarisation keeps failing
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "200"))
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "data/history.db")
+HISTORY_CACHE_SIZE = int(os.getenv("HISTORY_CACHE_SIZE", "1000"))
+MODEL_HISTORY = os.getenv("MODEL_HISTORY_SUMMARY") or os.getenv(
+    "MODEL_RESPONDER", "meta-llama/llama-3.1-70b-instruct"
+)
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_FOLD = (
+    "You maintain the running memory of a conversation between an older adult and "
+    "their companion. Merge the new exchange into the existing summary. Keep facts "
+    "about the person, their health, plans and feelings; drop small talk. Write in "
+    f"the third person, under {HISTORY_SUMMARY_TOKENS * 3 // 4} words, plain text."
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id      INTEGER PRIMARY KEY,
+    conv_id TEXT NOT NULL,
+    ts      REAL NOT NULL,
+    user    TEXT NOT NULL,
+    reply   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_conv ON turns (conv_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    conv_id TEXT NOT NULL,
+    upto_id INTEGER NOT NULL,  -- last turn id folded into this summary
+    ts      REAL NOT NULL,
+    summary TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summaries_conv ON summaries (conv_id, upto_id);
+"""
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+# (turn id, user message, assistant reply); turns the database didn't take
+# get negative ids so they never collide with stored ones
+Turn = Tuple[int, str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count: words and punctuation, or chars/4 for long words."""
+    return max(len(_WORD.findall(text)), (len(text) + 3) // 4)
+
+
+def _clip(text: str, tokens: int) -> str:
+    """Cut text to about `tokens` tokens, keeping its beginning."""
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[: tokens * 4].rsplit(" ", 1)[0] + " …"
+
+
+def _turn_tokens(turn: Turn) -> int:
+    _, user, reply = turn
+    # role/framing overhead per message
+    return (
+        estimate_tokens(_clip(user, HISTORY_MESSAGE_TOKENS))
+        + estimate_tokens(_clip(reply, HISTORY_MESSAGE_TOKENS))
+        + 8
+    )
+
+
+@dataclass
+class Conversation:
+    summary: str = ""
+    upto_id: int = 0  # last turn id covered by summary
+    # turns not yet folded into summary, oldest first
+    turns: List[Turn] = field(default_factory=list)
+    folding: Optional["asyncio.Task[None]"] = None
+
+
+class ConversationHistory:
+    def __init__(self, path: str = HISTORY_DB_PATH, cache_size: int = HISTORY_CACHE_SIZE) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._convs: "OrderedDict[str, Conversation]" = OrderedDict()
+        self.cache_size = cache_size
+        self.evictions = 0
+        self._unsaved_ids = itertools.count(-1, -1)
+
+    async def get(self, conv_id: str) -> Conversation:
+        """The conversation, brought up to date with the database."""
+        conv = self._convs.get(conv_id)
+        if conv is None:
+            conv = self._convs[conv_id] = Conversation()
+            while len(self._convs) > self.cache_size:
+                # a fold still running keeps its own reference and writes to the db
+                self._convs.popitem(last=False)
+                self.evictions += 1
+        self._convs.move_to_end(conv_id)
+        await self._sync(conv_id, conv)
+        return conv
+
+    def _read_new(self, conv_id: str, upto_id: int, last: int):
+        """Newest summary past upto_id and the turns after it (or after last)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT upto_id, summary FROM summaries WHERE conv_id = ? AND upto_id > ?"
+                " ORDER BY upto_id DESC LIMIT 1",
+                (conv_id, upto_id),
+            ).fetchone()
+            new = self._db.execute(
+                "SELECT id, user, reply FROM turns WHERE conv_id = ? AND id > ?"
+                " ORDER BY id DESC LIMIT ?",
+                (conv_id, max(last, row[0] if row else 0), HISTORY_MAX_MESSAGES // 2),
+            ).fetchall()
+        return row, new
+
+    async def _sync(self, conv_id: str, conv: Conversation) -> None:
+        """Pick up summaries and turns other workers (or a past run) appended."""
+        try:
+            row, new = await asyncio.to_thread(
+                self._read_new, conv_id, conv.upto_id, self._last_id(conv)
+            )
+        except sqlite3.Error as e:
+            logger.warning("history read failed: %s", e, extra={"conv_id": conv_id})
+            return
+        if row is not None and row[0] > conv.upto_id:
+            conv.upto_id, conv.summary = row
+            conv.turns = [t for t in conv.turns if t[0] > conv.upto_id or t[0] < 0]
+        # a concurrent sync of the same conversation may have got there first
+        last = self._last_id(conv)
+        conv.turns.extend(t for t in reversed(new) if t[0] > last)
+        self._cap(conv)
+
+    @staticmethod
+    def _last_id(conv: Conversation) -> int:
+        return max((t[0] for t in conv.turns if t[0] > 0), default=conv.upto_id)
+
+    def _cap(self, conv: Conversation) -> None:
+        excess = len(conv.turns) - HISTORY_MAX_MESSAGES // 2
+        if conv.folding is None and excess > 0:
+            del conv.turns[:excess]
+
+    async def window(self, conv_id: str, lean: bool = False) -> List[Dict[str, str]]:
+        """Summary block plus the newest turns that fit the token budget.
+
+        lean halves the budget (conversations over their LLM token budget).
+        """
+        conv = await self.get(conv_id)
+        budget = HISTORY_TOKEN_BUDGET // 2 if lean else HISTORY_TOKEN_BUDGET
+        picked: List[Turn] = []
+        used = 0
+        for turn in reversed(conv.turns):
+            cost = _turn_tokens(turn)
+            if used + cost > budget:
+                break
+            picked.append(turn)
+            used += cost
+        messages: List[Dict[str, str]] = []
+        if conv.summary:
+            messages.append(
+                {"role": "system", "content": "Earlier in this conversation: " + conv.summary}
+            )
+        for _, user, reply in reversed(picked):
+            messages.append({"role": "user", "content": _clip(user, HISTORY_MESSAGE_TOKENS)})
+            messages.append({"role": "assistant", "content": _clip(reply, HISTORY_MESSAGE_TOKENS)})
+        return messages
+
+    def _insert_turn(self, conv_id: str, user_turn: str, reply: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO turns (conv_id, ts, user, reply) VALUES (?, ?, ?, ?)",
+                (conv_id, time.time(), user_turn, reply),
+            )
+
+    async def record(self, conv_id: str, user_turn: str, reply: str) -> Conversation:
+        try:
+            await asyncio.to_thread(self._insert_turn, conv_id, user_turn, reply)
+        except sqlite3.Error as e:
+            # keep the turn in this worker at least; it just won't survive a restart
+            logger.warning("history write failed: %s", e, extra={"conv_id": conv_id})
+            conv = self._convs.get(conv_id) or await self.get(conv_id)
+            conv.turns.append((next(self._unsaved_ids), user_turn, reply))
+        else:
+            conv = await self.get(conv_id)
+        self._maybe_fold(conv_id, conv)
+        return conv
+
+    def _overflow(self, conv: Conversation) -> int:
+        """How many of the oldest turns no longer fit the window."""
+        used = 0
+        for i in range(len(conv.turns) - 1, -1, -1):
+            used += _turn_tokens(conv.turns[i])
+            if used > HISTORY_TOKEN_BUDGET:
+                return i + 1
+        return 0
+
+    def _maybe_fold(self, conv_id: str, conv: Conversation) -> None:
+        if conv.folding is not None:
+            return
+        n = self._overflow(conv)
+        if n <= 0:
+            return
+        tokens = sum(estimate_tokens(u) + estimate_tokens(r) for _, u, r in conv.turns[:n])
+        if tokens < HISTORY_FOLD_TOKENS:
+            return
+        # run outside the request's context so its deadline doesn't apply
+        conv.folding = asyncio.get_running_loop().create_task(
+            self._fold(conv_id, conv, n), context=contextvars.Context()
+        )
+
+    async def _fold(self, conv_id: str, conv: Conversation, n: int) -> None:
+        # the task starts with an empty context; charge its tokens to this conversation
+        bind(conv_id)
+        older = conv.turns[:n]
+        transcript = "\n".join(
+            f"Person: {_clip(user, HISTORY_MESSAGE_TOKENS)}\n"
+            f"Companion: {_clip(reply, HISTORY_MESSAGE_TOKENS)}"
+            for _, user, reply in older
+        )
+        try:
+            summary = await llm_client.chat(
+                MODEL_HISTORY,
+                [
+                    {"role": "system", "content": SYSTEM_FOLD},
+                    {
+                        "role": "user",
+                        "content": f"Summary so far:\n{conv.summary or '(none)'}\n\n"
+                        f"New exchange:\n{transcript}",
+                    },
+                ],
+                stage="history",
+                agent="response",
+            )
+            upto = max((t[0] for t in older if t[0] > 0), default=conv.upto_id)
+            if upto >= conv.upto_id:  # another worker may have folded further meanwhile
+                folded = {t[0] for t in older}
+                conv.summary = _clip(summary.strip(), HISTORY_SUMMARY_TOKENS)
+                conv.upto_id = upto
+                conv.turns = [
+                    t for t in conv.turns if t[0] not in folded and (t[0] > upto or t[0] < 0)
+                ]
+                await asyncio.to_thread(self._insert_summary, conv_id, upto, conv.summary)
+            logger.debug(
+                "history folded",
+                extra={"conv_id": conv_id, "folded": n, "kept": len(conv.turns)},
+            )
+        except Exception as e:
+            # keep the turns; the next record() retries the fold
+            logger.warning("history fold failed: %s", e, extra={"conv_id": conv_id})
+        finally:
+            conv.folding = None
+            self._cap(conv)
+
+    def _insert_summary(self, conv_id: str, upto: int, summary: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO summaries VALUES (?, ?, ?, ?)",
+                (conv_id, upto, time.time(), summary),
+            )
+
+    def _count_stored(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT conv_id) FROM turns"
+            ).fetchone()
+
+    async def stats(self) -> Dict[str, int]:
+        stored, stored_convs = await asyncio.to_thread(self._count_stored)
+        return {
+            "conversations": len(self._convs),
+            "cache_size": self.cache_size,
+            "evictions": self.evictions,
+            "turns": sum(len(c.turns) for c in self._convs.values()),
+            "summarised": sum(1 for c in self._convs.values() if c.summary),
+            "folding": sum(1 for c in self._convs.values() if c.folding is not None),
+            "stored_turns": stored,
+            "stored_conversations": stored_convs,
+        }
+
+
+conversations = ConversationHistory()
@@ -1,20 +1,24 @@
 """
 response_agent: generate the assistant reply with rolling chat history.
-Payload from routes: {"text": "<control/context prompt>", "user": "<original user msg>", "conv_id":"optional"}
+Input is a wire.Reply: the control/context prompt, the original user message and conv_id.
+History is a token-budgeted window plus a rolling summary (see history.py).
 """
 
-import os, json, httpx
-from typing import Optional, Dict, Any, List
+import os, logging
+from typing import Dict, List, AsyncIterator, Tuple
+from . import llm_client
+from .history import conversations
+from .ledger import ledger
+from ..log import bind, bodies_enabled
+from ..wire import Reply
+from .llm_client import OR_KEY
 
-OR_KEY = os.getenv("OPENROUTER_API_KEY")
-OR_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 MODEL_RSP = os.getenv("MODEL_RESPONDER", "meta-llama/llama-3.1-70b-instruct")
 
 if not OR_KEY:
     raise SystemExit("Missing OPENROUTER_API_KEY environment variable")
 
-# in-memory chat history: conv_id -> list[{"role":"user"|"assistant","content":str}]
-HISTORY: Dict[str, List[Dict[str, str]]] = {}
+logger = logging.getLogger(__name__)
 
 SYSTEM_BASE = (
     "You are a cautious, concise companion for older adults. "
@@ -22,51 +26,55 @@ SYSTEM_BASE = (
     "Be warm, brief, and safe. Never diagnose. Prefer short follow-ups."
 )
 
-def _or_chat_with_history(
-    model: str,
+def _messages(
     system_base: str,
     control_context: str,
     history: List[Dict[str, str]],
     new_user_msg: str,
-) -> str:
-    headers = {
-        "Authorization": f"Bearer {OR_KEY}",
-        "HTTP-Referer": os.getenv("OPENROUTER_REFERER", "https://hack.local"),
-        "X-Title": os.getenv("OPENROUTER_TITLE", "HygieiAI"),
-    }
-    # keep prompt short but consistent
-    prior = history[-16:] if len(history) > 16 else history
-    messages: List[Dict[str, str]] = (
+) -> List[Dict[str, str]]:
+    # history is already cut to the token budget by conversations.window()
+    return (
         [{"role": "system", "content": system_base}]
         + [{"role": "system", "content": control_context}]  # classifier-built prompt
-        + prior
+        + history
         + [{"role": "user", "content": new_user_msg}]
     )
-    payload: Dict[str, Any] = {"model": model, "messages": messages}
-    r = httpx.post(f"{OR_BASE}/chat/completions", headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    out = r.json()["choices"][0]["message"]["content"]
-    return out
 
-def process_text(payload: Optional[str]) -> str:
-    if not payload:
-        print("agent.process_text called with no payload"); return ""
-    print("agent.process_text called with payload:", payload)
 
-    try:
-        p = json.loads(payload)
-    except json.JSONDecodeError:
-        # assume raw text is the context; no user turn provided
-        p = {"text": payload}
+async def _or_chat_with_history(
+    model: str,
+    system_base: str,
+    control_context: str,
+    history: List[Dict[str, str]],
+    new_user_msg: str,
+) -> str:
+    messages = _messages(system_base, control_context, history, new_user_msg)
+    return await llm_client.chat(model, messages, stage="respond", agent="response")
+
+
+def _unpack(req: Reply) -> Tuple[str, str, str]:
+    bind(req.conv_id)
+    if bodies_enabled():
+        logger.info("payload", extra={"payload": req.model_dump()})
+    # prefer the real human utterance
+    return req.text, req.user_message or "", req.conv_id
 
-    control_context = p.get("text", "") or ""
-    user_msg = p.get("user") or p.get("user_message") or ""  # prefer real human utterance
-    conv_id = str(p.get("conv_id") or "default")
 
-    hist = HISTORY.setdefault(conv_id, [])
+async def _record_turn(conv_id: str, user_turn: str, reply: str) -> None:
+    # update history with the new pair; older turns get folded into the summary
+    conv = await conversations.record(conv_id, user_turn, reply)
+
+    logger.debug("history updated", extra={"turns": len(conv.turns)})
+    if bodies_enabled():
+        logger.info("reply", extra={"reply": reply})
+
+
+async def process_text(req: Reply) -> str:
+    control_context, user_msg, conv_id = _unpack(req)
+    hist = await conversations.window(conv_id, lean=await ledger.over_budget())
 
     # call LLM with prior history + this user turn
-    reply = _or_chat_with_history(
+    reply = await _or_chat_with_history(
         MODEL_RSP,
         SYSTEM_BASE,
         control_context,
@@ -74,12 +82,25 @@ def process_text(payload: Optional[str]) -> str:
         user_msg or control_context,  # fallback if no explicit user text
     )
 
-    # update history with the new pair
-    hist.append({"role": "user", "content": user_msg or control_context})
-    hist.append({"role": "assistant", "content": reply})
-    if len(hist) > 24:
-        HISTORY[conv_id] = hist[-24:]
-
-    print(f"[HISTORY conv={conv_id}] now {len(HISTORY[conv_id])} turns")
-    print(f"- reply:\n{reply}")
+    await _record_turn(conv_id, user_msg or control_context, reply)
     return reply
+
+
+async def stream_text(req: Reply) -> AsyncIterator[str]:
+    """Streaming variant of process_text: yields reply deltas as they arrive.
+
+    History is only updated once the full reply has been generated, so an
+    aborted stream leaves the conversation unchanged.
+    """
+    control_context, user_msg, conv_id = _unpack(req)
+    hist = await conversations.window(conv_id, lean=await ledger.over_budget())
+    messages = _messages(SYSTEM_BASE, control_context, hist, user_msg or control_context)
+
+    parts: List[str] = []
+    async for delta in llm_client.chat_stream(
+        MODEL_RSP, messages, stage="respond", agent="response"
+    ):
+        parts.append(delta)
+        yield delta
+
+    await _record_turn(conv_id, user_msg or control_context, "".join(parts))
@@ -0,0 +1,48 @@
+"""
+streaming: sentence chunking and SSE framing for streamed replies.
+
+Event stream emitted by /post when the caller sends Accept: text/event-stream:
+    event: delta     data: {"text": "<token text>"}
+    event: sentence  data: {"text": "<complete sentence>"}
+    event: done      data: {"text": "<full reply>"}
+    event: error     data: {"error": "<message>"}
+"""
+
+import json
+import re
+from typing import List
+
+# end of sentence: terminal punctuation (plus closing quotes/brackets) then whitespace
+_SENTENCE_END = re.compile(r"[.!?…]+[\"')\]]*\s+")
+# don't speak fragments shorter than this; merge them into the next sentence
+MIN_SENTENCE_CHARS = 12
+
+
+class SentenceBuffer:
+    """Accumulates streamed deltas and releases whole sentences."""
+
+    def __init__(self) -> None:
+        self._buf = ""
+
+    def feed(self, delta: str) -> List[str]:
+        self._buf += delta
+        out: List[str] = []
+        start = 0
+        for m in _SENTENCE_END.finditer(self._buf):
+            candidate = self._buf[start : m.end()].strip()
+            if len(candidate) < MIN_SENTENCE_CHARS:
+                continue
+            out.append(candidate)
+            start = m.end()
+        self._buf = self._buf[start:]
+        return out
+
+    def flush(self) -> List[str]:
+        rest = self._buf.strip()
+        self._buf = ""
+        return [rest] if rest else []
+
+
+def sse(event: str, **data) -> bytes:
+    """Frame one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
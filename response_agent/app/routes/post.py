@@ -1,67 +1,93 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import logging
+from typing import AsyncIterator, Tuple
 
-import json
 import httpx
 
 # import agent functions
-from ..agent.main import process_text
+from ..agent.main import process_text, stream_text
+from ..agent.streaming import SentenceBuffer, sse
+from .. import deadline, transport
+from ..metrics import hop, outbound_headers
+from ..wire import JSON_HEADERS, Reply, SummaryTurn, encode, parse
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/post")
-async def receive_post(request: Request):
-    body = await request.body()
-    content_type = request.headers.get("content-type", "application/octet-stream")
-
-    received_text = None
-    parsed_json = None
+async def _forward_to_summary(response: str, req: Reply) -> None:
+    """Forward the generated reply to the summary_agent /post endpoint."""
+    turn = SummaryTurn(
+        text=response, user_message=req.user_message or req.text, conv_id=req.conv_id
+    )
     try:
-        if content_type and "application/json" in content_type:
-            try:
-                data = json.loads(body.decode("utf-8", errors="replace"))
-                if isinstance(data, dict):
-                    parsed_json = data
-                    # prefer the processed text field if provided
-                    received_text = data.get("text")
-            except Exception:
-                received_text = None
-        elif content_type and content_type.startswith("text/"):
-            received_text = body.decode("utf-8", errors="replace")
-    except Exception:
-        received_text = None
-
-    if received_text is not None:
-        # Build a JSON payload combining the processed text and the original
-        # user message (if provided). The agent expects a JSON string like
-        # {"text": "...", "intent": "..."} but extra fields are fine.
-        user_msg = None
-        if parsed_json is not None:
-            # extraction_agent forwards original message as 'user' or 'user_message'
-            user_msg = parsed_json.get("user") or parsed_json.get("user_message")
-
-        payload_obj = {"text": received_text}
-        if user_msg:
-            payload_obj["user"] = user_msg
-
-        payload_json = json.dumps(payload_obj)
-
-        # pass JSON string to process_text so the agent can parse intent/etc.
-        response = process_text(payload_json)
-        # after generating response, forward it to the summary_agent /post endpoint
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
+        async with hop("summary") as h:
+            peer = transport.local("summary.submit")
+            if peer is not None:
+                await peer(turn)
+                return
+            async with httpx.AsyncClient(timeout=deadline.timeout(5.0)) as client:
+                resp = await client.post(
                     "http://summary_agent:8002/post",
-                    json={"text": response, "user_message": user_msg or received_text},
-                    headers={"Content-Type": "application/json"},
+                    content=encode(turn),
+                    headers=outbound_headers(JSON_HEADERS),
                 )
-        except Exception as e:
-            # log but keep the main response flow unaffected
-            print("Failed to forward generated response to summary_agent:", e)
-    else:
-        print("response_agent received non-text payload (len=", len(body), ")")
+            h.response(resp)
+    except Exception as e:
+        # log but keep the main response flow unaffected
+        logger.warning("failed to forward reply to summary_agent: %s", e)
+
+
+async def _events(req: Reply) -> AsyncIterator[bytes]:
+    buf = SentenceBuffer()
+    parts = []
+    try:
+        async for delta in stream_text(req):
+            parts.append(delta)
+            yield sse("delta", text=delta)
+            for sentence in buf.feed(delta):
+                yield sse("sentence", text=sentence)
+    except Exception as e:
+        logger.warning("reply stream failed: %s", e)
+        yield sse("error", error=str(e))
+        return
+    for sentence in buf.flush():
+        yield sse("sentence", text=sentence)
+    response = "".join(parts)
+    yield sse("done", text=response)
+    await _forward_to_summary(response, req)
+
+
+# ---- in-process entrypoints (monolith mode, see app/transport.py) ----
+async def handle_reply(req: Reply) -> Tuple[int, str]:
+    """Write the reply for one turn and forward it to summary_agent."""
+    response = await process_text(req)
+    await _forward_to_summary(response, req)
+    return 200, response
+
+
+def reply_stream(req: Reply) -> AsyncIterator[bytes]:
+    """Streaming variant of handle_reply, yielding SSE frames."""
+    return _events(req)
+
+
+@router.post("/post")
+async def receive_post(request: Request):
+    req = parse(Reply, await request.body(), request.headers.get("content-type", ""))
+    if req is None:
+        logger.warning("received non-text payload")
         return PlainTextResponse("Missing text in request", status_code=400)
 
-    return PlainTextResponse(response)
+    # streaming mode: re-emit tokens as SSE with sentence markers
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            reply_stream(req),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # generate the reply, then forward it to the summary_agent /post endpoint
+    status, response = await handle_reply(req)
+    return PlainTextResponse(response, status_code=status)
@@ -0,0 +1,215 @@
+"""
+ledger: append-only record of every LLM call's token usage, latency and cost.
+
+llm_client writes one row per attempt (hedges and fallbacks included) from
+the OpenRouter `usage` block: agent, stage, conversation, model, prompt and
+completion tokens, cost and latency. aggregate() backs the /usage endpoint,
+grouped by any of agent, stage, conv_id, model and hour.
+
+The ledger is a SQLite database in WAL mode (LEDGER_DB_PATH); point every
+agent at the same file (a shared volume, or the monolith) for one view of
+the whole chain. With LLM_CONV_TOKEN_BUDGET set, over_budget() tells the
+agents to switch a conversation to cheaper behaviour once its recorded
+tokens pass the budget.
+
+record() never touches the database on the event loop: rows are buffered
+and a background task writes them in batches from a worker thread.
+over_budget() keeps a running total per conversation in memory, seeded
+from the database (so other agents' calls count too) and re-read at most
+every _TOTAL_REFRESH_S seconds.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..log import conv_id as current_conv_id
+
+LEDGER_DB_PATH = os.getenv("LEDGER_DB_PATH", "data/llm_ledger.db")
+LLM_CONV_TOKEN_BUDGET = int(os.getenv("LLM_CONV_TOKEN_BUDGET", "0"))
+
+# how stale a conversation's total may get before it is re-read from the db
+_TOTAL_REFRESH_S = 30.0
+# conversations whose totals are kept in memory
+_TOTALS_MAX = 10000
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    ts                REAL NOT NULL,
+    agent             TEXT NOT NULL,
+    stage             TEXT NOT NULL,
+    conv_id           TEXT NOT NULL,
+    model             TEXT NOT NULL,
+    outcome           TEXT NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost              REAL,
+    latency_ms        REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_usage_conv ON llm_usage (conv_id);
+CREATE INDEX IF NOT EXISTS llm_usage_ts ON llm_usage (ts);
+"""
+
+# group_by name -> SQL expression
+GROUPS = {
+    "agent": "agent",
+    "stage": "stage",
+    "conv_id": "conv_id",
+    "model": "model",
+    "outcome": "outcome",
+    "hour": "strftime('%Y-%m-%dT%H:00Z', ts, 'unixepoch')",
+}
+
+
+class Ledger:
+    def __init__(self, path: str = LEDGER_DB_PATH, budget: int = LLM_CONV_TOKEN_BUDGET) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self.budget = budget
+        self._pending: List[Tuple[Any, ...]] = []
+        self._writer: Optional["asyncio.Task[None]"] = None
+        # conv_id -> [tokens, monotonic time they were read from the db]
+        self._totals: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def record(
+        self,
+        agent: str,
+        stage: str,
+        model: str,
+        usage: Optional[Dict[str, Any]],
+        seconds: float,
+        outcome: str,
+    ) -> None:
+        """Append one call; usage is the response's `usage` block, if any."""
+        usage = usage or {}
+        cost = usage.get("cost")
+        conv = current_conv_id()
+        prompt = int(usage.get("prompt_tokens") or 0)
+        completion = int(usage.get("completion_tokens") or 0)
+        self._pending.append(
+            (
+                time.time(),
+                agent,
+                stage,
+                conv,
+                model,
+                outcome,
+                prompt,
+                completion,
+                float(cost) if cost is not None else None,
+                seconds * 1000.0,
+            )
+        )
+        total = self._totals.get(conv)
+        if total is not None:
+            total[0] += prompt + completion
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._take())
+            return
+        if self._writer is None:
+            self._writer = loop.create_task(self._drain())
+
+    def _take(self) -> List[Tuple[Any, ...]]:
+        rows, self._pending = self._pending, []
+        return rows
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        try:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT INTO llm_usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+        except sqlite3.Error as e:
+            # accounting must never fail the call it accounts for
+            logger.warning("ledger write failed: %s (%d rows)", e, len(rows))
+
+    async def _drain(self) -> None:
+        try:
+            while self._pending:
+                await asyncio.to_thread(self._write, self._take())
+        finally:
+            self._writer = None
+
+    async def flush(self) -> None:
+        """Wait until every recorded call is in the database."""
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+        await self._drain()
+
+    def conversation_tokens(self, conv_id: str) -> int:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)"
+                " FROM llm_usage WHERE conv_id = ?",
+                (conv_id,),
+            ).fetchone()
+        return int(row[0])
+
+    async def over_budget(self, conv_id: Optional[str] = None) -> bool:
+        """True once the conversation (default: the current one) used up its budget."""
+        conv = current_conv_id() if conv_id is None else conv_id
+        # "default" is every caller that sent no conv_id; it has no budget
+        if self.budget <= 0 or not conv or conv == "default":
+            return False
+        total = self._totals.get(conv)
+        if total is None or time.monotonic() - total[1] > _TOTAL_REFRESH_S:
+            tokens = await asyncio.to_thread(self.conversation_tokens, conv)
+            # rows still waiting for the writer aren't in the db yet
+            tokens += sum(r[6] + r[7] for r in self._pending if r[3] == conv)
+            total = self._totals[conv] = [tokens, time.monotonic()]
+            while len(self._totals) > _TOTALS_MAX:
+                self._totals.popitem(last=False)
+        self._totals.move_to_end(conv)
+        return total[0] >= self.budget
+
+    def aggregate(
+        self,
+        group_by: List[str],
+        hours: float = 24.0,
+        conv_id: Optional[str] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Calls, tokens, cost and latency per group over the last `hours`."""
+        unknown = [g for g in group_by if g not in GROUPS]
+        if unknown:
+            raise ValueError(f"unknown group_by {unknown}; use {sorted(GROUPS)}")
+        select = [f"{GROUPS[g]} AS {g}" for g in group_by] + [
+            "COUNT(*) AS calls",
+            "SUM(prompt_tokens) AS prompt_tokens",
+            "SUM(completion_tokens) AS completion_tokens",
+            "SUM(prompt_tokens + completion_tokens) AS total_tokens",
+            "SUM(cost) AS cost",
+            "ROUND(AVG(latency_ms), 1) AS avg_latency_ms",
+            "ROUND(MAX(latency_ms), 1) AS max_latency_ms",
+        ]
+        where = "ts >= ?"
+        params: List[Any] = [time.time() - hours * 3600.0]
+        if conv_id:
+            where += " AND conv_id = ?"
+            params.append(conv_id)
+        sql = f"SELECT {', '.join(select)} FROM llm_usage WHERE {where}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)}"
+        sql += " ORDER BY total_tokens DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            cur = self._db.execute(sql, params)
+            names = [d[0] for d in cur.description]
+            return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+ledger = Ledger()
@@ -2,7 +2,11 @@
 schedule_agent: LLM-driven appointment scheduler.
 - Initiates conversation
 - Uses OpenRouter to steer dialog
-- Only books exact ISO slots from AVAILABILITY
+- Only books exact ISO slots from AVAILABILITY (a sorted index per service, see slots.py)
+- Holds a proposed slot and books it through the reservation store (reservations.py)
+- Keeps conversations in a TTL/size-bounded session store (sessions.py)
+- Settles plain replies ("yes", "the second one", "Tuesday at 10") locally (resolver.py)
+- Greets from a pool of pre-generated openers per service (openers.py)
 - Returns plain JSON to the frontend
 """
 
@@ -10,15 +14,23 @@ from __future__ import annotations
 import os, uuid, json
 from typing import Dict, List, Optional
 from datetime import datetime
-import httpx
-
-OR_KEY = os.getenv("OPENROUTER_API_KEY")
-OR_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+from .. import metrics
+from . import llm_client
+from .llm_client import OR_KEY
+from .openers import openers
+from .reservations import reservations
+from .resolver import resolve
+from .sessions import sessions
+from .slots import SCHEDULE_AVAILABILITY_PATH, Availability, iso, parse
 
 MODEL = os.getenv("MODEL_SCHEDULER", "meta-llama/llama-3.1-70b-instruct")
+# free slots listed to the model per turn (calendars can hold thousands)
+CONTEXT_SLOTS = int(os.getenv("SCHEDULE_CONTEXT_SLOTS", "20"))
+# try the local slot resolver before asking the model
+SCHEDULE_RESOLVER = os.getenv("SCHEDULE_RESOLVER", "1") == "1"
 
 # ---- demo data (local ISO "YYYY-MM-DDTHH:MM") ----
-AVAILABILITY: Dict[str, List[str]] = {
+DEMO_AVAILABILITY: Dict[str, List[str]] = {
     "dentist": [
         "2025-11-09T10:00",
         "2025-11-09T14:30",
@@ -40,7 +52,9 @@ AVAILABILITY: Dict[str, List[str]] = {
     ],
 }
 
-SESSIONS: Dict[str, Dict] = {}  # in-memory state
+AVAILABILITY = Availability(DEMO_AVAILABILITY)
+if SCHEDULE_AVAILABILITY_PATH:
+    AVAILABILITY.load(SCHEDULE_AVAILABILITY_PATH)
 
 ALLOWED_SERVICES = {"dentist", "physio", "checkup"}
 
@@ -87,122 +101,226 @@ Rules:
 """
 
 
-def _fmt(dt: str) -> str:
-    return datetime.fromisoformat(dt).strftime("%a %d %b %H:%M")
+def _fmt(dt: datetime) -> str:
+    return dt.strftime("%a %d %b %H:%M")
+
+
+async def _free(
+    service: str, session_id: str, k: int, near: Optional[str] = None
+) -> List[datetime]:
+    """k free slots nobody else has held or booked: the earliest, or the closest to `near`."""
+    index = AVAILABILITY[service]
+    taken = await reservations.taken(service, session_id)
+    target = parse(near) if near else None
+    if target is None:
+        return [dt for dt in index.first(k + len(taken)) if dt not in taken][:k]
+    found = [dt for dt in index.nearest(target, k + len(taken)) if dt not in taken]
+    return sorted(sorted(found, key=lambda dt: abs(dt - target))[:k])
 
 
-def _context(service: str) -> str:
-    slots = "\n".join(AVAILABILITY.get(service, []))
+def _context(service: str, free: List[datetime]) -> str:
+    slots = "\n".join(iso(dt) for dt in free)
     return f"SERVICE: {service}\nAVAILABILITY_ISO:\n{slots or '(none)'}"
 
 
-def _or_chat_json(system: str, user: str) -> Optional[dict]:
+async def _options(
+    state: Dict, service: str, session_id: str, near: Optional[str] = None
+) -> str:
+    """The next few free slots, or the ones closest to a requested time.
+
+    Remembered as the session's offered slots, so "the second one" resolves.
+    """
+    slots = await _free(service, session_id, 3, near)
+    state["offered"] = [iso(dt) for dt in slots]
+    return ", ".join(_fmt(dt) for dt in slots)
+
+
+async def _or_chat_json(system: str, user: str) -> Optional[dict]:
     if not OR_KEY:
         return None
-    headers = {
-        "Authorization": f"Bearer {OR_KEY}",
-        "HTTP-Referer": os.getenv("OPENROUTER_REFERER", "http://local.scheduling"),
-        "X-Title": os.getenv("OPENROUTER_TITLE", "Schedule Agent"),
-    }
-    payload = {
-        "model": MODEL,
-        "messages": [
+    raw = await llm_client.chat(
+        MODEL,
+        [
             {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
-        "response_format": {"type": "json_object"},
-    }
-    r = httpx.post(
-        f"{OR_BASE}/chat/completions", headers=headers, json=payload, timeout=60
+        json_mode=True,
+        referer="http://local.scheduling",
+        title="Schedule Agent",
+        stage="schedule",
+        agent="schedule",
     )
-    r.raise_for_status()
-    raw = r.json()["choices"][0]["message"]["content"]
     try:
         return json.loads(raw)
     except Exception:
         return None
 
 
-def _consume_slot(service: str, iso: str) -> None:
-    if iso in AVAILABILITY.get(service, []):
-        AVAILABILITY[service].remove(iso)
+async def _book(service: str, when_iso: str, session_id: str) -> Optional[datetime]:
+    """Commit the slot for this session; None if it isn't ours to book."""
+    slot = parse(when_iso)
+    if slot is None or slot not in AVAILABILITY[service]:
+        return None
+    if not await reservations.commit(service, slot, session_id):
+        return None
+    AVAILABILITY[service].remove(slot)
+    # the free slots changed; rebuild this service's greetings
+    warm_openers([service])
+    return slot
+
+
+async def _hold(service: str, when_iso: str, session_id: str) -> bool:
+    slot = parse(when_iso)
+    if slot is None or slot not in AVAILABILITY[service]:
+        return False
+    return await reservations.hold(service, slot, session_id)
 
 
-def _or_chat_json_ctx_history(
-    system: str, context: str, history: list[dict]
+async def _or_chat_json_ctx_history(
+    system: str, context: str, history: list[dict], stage: str = "schedule"
 ) -> Optional[dict]:
     if not OR_KEY:
         return None
-    headers = {
-        "Authorization": f"Bearer {OR_KEY}",
-        "HTTP-Referer": os.getenv("OPENROUTER_REFERER", "http://local.scheduling"),
-        "X-Title": os.getenv("OPENROUTER_TITLE", "Schedule Agent"),
-    }
     # Cap history to avoid long prompts
     hist = history[-16:] if len(history) > 16 else history
-    payload = {
-        "model": MODEL,
-        "messages": (
+    raw = await llm_client.chat(
+        MODEL,
+        (
             [{"role": "system", "content": system}]
             + [{"role": "user", "content": context}]
             + hist
         ),
-        "response_format": {"type": "json_object"},
-    }
-    r = httpx.post(
-        f"{OR_BASE}/chat/completions", headers=headers, json=payload, timeout=60
+        json_mode=True,
+        referer="http://local.scheduling",
+        title="Schedule Agent",
+        stage=stage,
+        agent="schedule",
     )
-    r.raise_for_status()
-    raw = r.json()["choices"][0]["message"]["content"]
     try:
         return json.loads(raw)
     except Exception:
         return None
 
 
+async def _generate_opener(svc: str) -> Optional[str]:
+    """Ask the model to open a conversation (no session holds anything yet)."""
+    ctx = _context(svc, await _free(svc, "", CONTEXT_SLOTS))
+    resp = await _or_chat_json_ctx_history(
+        SYSTEM, ctx, [{"role": "user", "content": "BEGIN OUTREACH"}], stage="opener"  # seed turn
+    )
+    if not resp:
+        return None
+    return (resp.get("reply") or "").strip() or f"Hello, let’s pick a {svc} time."
+
+
+def warm_openers(services=ALLOWED_SERVICES) -> None:
+    """Pre-generate greetings for the services' current availability."""
+    if not OR_KEY:
+        return
+    for svc in services:
+        openers.warm(svc, lambda svc=svc: AVAILABILITY[svc].version, _generate_opener)
+
+
 # --- replace start_session() ---
-def start_session(service: Optional[str] = None) -> Dict:
+async def start_session(service: Optional[str] = None) -> Dict:
     svc = _normalize_service(service)
     if svc not in ALLOWED_SERVICES:
         svc = "dentist"
     sid = uuid.uuid4().hex[:8]
-    SESSIONS[sid] = {"service": svc, "history": []}
+    state = {"service": svc, "history": []}
 
-    ctx = _context(svc)
-    # Ask the model to open the conversation
-    resp = _or_chat_json_ctx_history(
-        SYSTEM, ctx, [{"role": "user", "content": "BEGIN OUTREACH"}]  # seed turn
-    )
+    version = AVAILABILITY[svc].version
+    reply = openers.get(svc, version)
+    if reply is None:
+        # no greetings for this availability yet: ask the model now, fill the pool meanwhile
+        reply = await _generate_opener(svc)
+        if reply:
+            openers.add(svc, version, reply)
+        warm_openers([svc])
 
-    if not resp:
-        opts = [_fmt(s) for s in AVAILABILITY[svc][:3]]
-        reply = f"Hello, it’s time to schedule your {svc} appointment. Next times: {', '.join(opts)}. Which works for you?"
-    else:
-        reply = (resp.get("reply") or "").strip() or f"Hello, let’s pick a {svc} time."
+    if not reply:
+        reply = f"Hello, it’s time to schedule your {svc} appointment. Next times: {await _options(state, svc, sid)}. Which works for you?"
 
     # record assistant turn
-    SESSIONS[sid]["history"].append({"role": "assistant", "content": reply})
+    state["history"].append({"role": "assistant", "content": reply})
+    await sessions.put(sid, state)
     return {"session_id": sid, "reply": reply, "status": "ongoing", "service": svc}
 
 
+def _confirmed(session_id: str, hist: list, svc: str, slot: datetime) -> Dict:
+    final = f"Okay, your appointment has been made for {svc} on {_fmt(slot)}. This demo will now reset."
+    hist.append({"role": "assistant", "content": final})
+    return {
+        "session_id": session_id,
+        "reply": final,
+        "status": "confirmed",
+        "service": svc,
+    }
+
+
+async def _resolve_locally(
+    state: Dict, session_id: str, svc: str, text: str, free: List[datetime]
+) -> Optional[Dict]:
+    """Book a slot the reply names without doubt; None to ask the model."""
+    mentioned = _detect_service(text)
+    res = None
+    if mentioned is None or mentioned == svc:
+        offered = [dt for dt in map(parse, state.get("offered") or []) if dt is not None]
+        res = resolve(text, offered, parse(state.get("pending") or ""), free)
+    if res is None:
+        metrics.SCHEDULE_RESOLVER.labels("none", "miss").inc()
+        return None
+    if res.ambiguous:
+        metrics.SCHEDULE_RESOLVER.labels(res.kind, "ambiguous").inc()
+        return None
+    if res.kind == "decline":
+        # give the held slot back; the model asks what would suit instead
+        await reservations.release(session_id)
+        state["pending"] = None
+        metrics.SCHEDULE_RESOLVER.labels(res.kind, "hit").inc()
+        return None
+
+    hist: list = state["history"]
+    slot = await _book(svc, iso(res.slot), session_id)
+    if slot is not None:
+        metrics.SCHEDULE_RESOLVER.labels(res.kind, "hit").inc()
+        await sessions.delete(session_id)
+        return _confirmed(session_id, hist, svc, slot)
+    metrics.SCHEDULE_RESOLVER.labels(res.kind, "conflict").inc()
+    state["pending"] = None
+    reply = f"Sorry, that time was just taken. Closest {svc} slots: {await _options(state, svc, session_id, iso(res.slot))}. Which should I book?"
+    hist.append({"role": "assistant", "content": reply})
+    await sessions.put(session_id, state)
+    return {"session_id": session_id, "reply": reply, "status": "ongoing", "service": svc}
+
+
 # --- replace handle_user() ---
-def handle_user(session_id: str, text: str) -> Dict:
-    if not session_id or session_id not in SESSIONS:
+async def handle_user(session_id: str, text: str) -> Dict:
+    state = await sessions.get(session_id) if session_id else None
+    if state is None:
         return {"error": "invalid_session"}
 
-    svc = SESSIONS[session_id].get("service") or "dentist"
-    hist: list[dict] = SESSIONS[session_id].setdefault("history", [])
+    svc = state.get("service") or "dentist"
+    hist: list[dict] = state.setdefault("history", [])
 
     # append user turn
     hist.append({"role": "user", "content": text})
-    ctx = _context(svc)
-
-    resp = _or_chat_json_ctx_history(SYSTEM, ctx, hist)
+    free = await _free(svc, session_id, CONTEXT_SLOTS)
+    if SCHEDULE_RESOLVER:
+        out = await _resolve_locally(state, session_id, svc, text, free)
+        if out is not None:
+            return out
+    # the model's reply decides what is offered or proposed from here
+    state["offered"] = []
+    state["pending"] = None
+    ctx = _context(svc, free)
+
+    resp = await _or_chat_json_ctx_history(SYSTEM, ctx, hist)
     if not resp:
         # fallback: propose next few
-        opts = [_fmt(s) for s in AVAILABILITY[svc][:3]]
-        reply = f"I couldn’t check that time. Available {svc} slots: {', '.join(opts)}. Which should I book?"
+        reply = f"I couldn’t check that time. Available {svc} slots: {await _options(state, svc, session_id)}. Which should I book?"
         hist.append({"role": "assistant", "content": reply})
+        await sessions.put(session_id, state)
         return {
             "session_id": session_id,
             "reply": reply,
@@ -214,36 +332,33 @@ def handle_user(session_id: str, text: str) -> Dict:
     llm_service = resp.get("service")
     if llm_service in ALLOWED_SERVICES and llm_service != svc:
         svc = llm_service
-        SESSIONS[session_id]["service"] = svc
-        ctx = _context(svc)  # regenerated next call
+        state["service"] = svc
 
     intent = str(resp.get("intent", "ask"))
     when_iso = resp.get("when_iso")
     reply = (resp.get("reply") or "Which time works for you?").strip()
 
-    # finalize only if exact ISO slot exists
+    # finalize only if exact ISO slot exists and the booking commits
     if intent in ("confirm", "finalize") and isinstance(when_iso, str):
-        if when_iso in AVAILABILITY.get(svc, []):
-            _consume_slot(svc, when_iso)
-            when_text = _fmt(when_iso)
-            final = f"Okay, your appointment has been made for {svc} on {when_text}. This demo will now reset."
-            hist.append({"role": "assistant", "content": final})
-            SESSIONS.pop(session_id, None)
-            return {
-                "session_id": session_id,
-                "reply": final,
-                "status": "confirmed",
-                "service": svc,
-            }
+        slot = await _book(svc, when_iso, session_id)
+        if slot is not None:
+            await sessions.delete(session_id)
+            return _confirmed(session_id, hist, svc, slot)
+        else:
+            reply = f"That time isn’t available. Closest {svc} slots: {await _options(state, svc, session_id, when_iso)}. Which should I book?"
+    # hold a proposed slot so no other session books it meanwhile
+    elif intent == "propose" and isinstance(when_iso, str):
+        if await _hold(svc, when_iso, session_id):
+            state["pending"] = iso(parse(when_iso))
         else:
-            opts = [_fmt(s) for s in AVAILABILITY[svc][:3]]
-            reply = f"That time isn’t available. Next {svc} slots: {', '.join(opts)}. Which should I book?"
+            reply = f"Sorry, that time is no longer free. Closest {svc} slots: {await _options(state, svc, session_id, when_iso)}. Which should I book?"
 
     # keep going
     hist.append({"role": "assistant", "content": reply})
     # trim history to protect context length
     if len(hist) > 24:
-        SESSIONS[session_id]["history"] = hist[-24:]
+        state["history"] = hist[-24:]
+    await sessions.put(session_id, state)
     return {
         "session_id": session_id,
         "reply": reply,
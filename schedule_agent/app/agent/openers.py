@@ -0,0 +1,94 @@
+"""
+openers: pre-generated greetings for /schedule/start.
+
+The opening line only depends on the service and its free slots, so it is
+generated ahead of time: a pool of SCHEDULE_OPENER_VARIANTS greetings per
+service, keyed by the calendar's availability version (slots.SlotIndex),
+and handed out in rotation so consecutive patients don't all hear the same
+words. When availability changes (a booking, a reload) the pool is stale:
+start_session then asks the model itself, as before, while warm() builds
+the new pool in the background.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+SCHEDULE_OPENER_VARIANTS = int(os.getenv("SCHEDULE_OPENER_VARIANTS", "3"))
+
+logger = logging.getLogger(__name__)
+
+# generate(service) -> one greeting, or None if the model gave nothing usable
+Generator = Callable[[str], Awaitable[Optional[str]]]
+
+
+class OpenerCache:
+    def __init__(self, variants: int = SCHEDULE_OPENER_VARIANTS) -> None:
+        # service -> (availability version, greetings)
+        self._pools: Dict[str, Tuple[int, List[str]]] = {}
+        self._turn: Dict[str, int] = {}
+        self._warming: Dict[str, "asyncio.Task[None]"] = {}
+        self.variants = max(1, variants)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, service: str, version: int) -> Optional[str]:
+        """The next greeting in rotation, or None if the pool is stale or empty."""
+        pool = self._pools.get(service)
+        if pool is None or pool[0] != version or not pool[1]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        turn = self._turn.get(service, 0)
+        self._turn[service] = turn + 1
+        return pool[1][turn % len(pool[1])]
+
+    def add(self, service: str, version: int, text: str) -> None:
+        pool = self._pools.get(service)
+        if pool is None or pool[0] != version:
+            pool = self._pools[service] = (version, [])
+        if text not in pool[1] and len(pool[1]) < self.variants:
+            pool[1].append(text)
+
+    def warm(self, service: str, version: Callable[[], int], generate: Generator) -> None:
+        """Fill the pool for the current version in the background (once at a time)."""
+        if service in self._warming:
+            return
+        # run outside the request's context so its deadline doesn't apply
+        task = asyncio.get_running_loop().create_task(
+            self._fill(service, version, generate), context=contextvars.Context()
+        )
+        self._warming[service] = task
+
+    async def _fill(self, service: str, version: Callable[[], int], generate: Generator) -> None:
+        try:
+            # availability can move on while we generate; chase the latest version.
+            # at most `variants` calls, even if the model keeps repeating itself
+            attempts = 0
+            while attempts < self.variants:
+                v = version()
+                pool = self._pools.get(service)
+                if pool is not None and pool[0] == v and len(pool[1]) >= self.variants:
+                    break
+                attempts += 1
+                text = await generate(service)
+                if text:
+                    self.add(service, v, text)
+        except Exception as e:
+            logger.warning("opener warm-up failed: %s", e, extra={"service": service})
+        finally:
+            self._warming.pop(service, None)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "variants": self.variants,
+            "hits": self.hits,
+            "misses": self.misses,
+            "pools": {s: {"version": v, "greetings": len(t)} for s, (v, t) in self._pools.items()},
+            "warming": sorted(self._warming),
+        }
+
+
+openers = OpenerCache()
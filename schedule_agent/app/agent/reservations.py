@@ -0,0 +1,177 @@
+"""
+reservations: conflict-free slot booking shared by every worker.
+
+A slot the assistant proposes gets a short hold (RESERVATION_HOLD_TTL) for
+that session; finalizing commits it as booked. Holds lapse on their own
+when a session is abandoned, and a session holds at most one slot: a new
+hold or a booking drops its others. Every claim is a row keyed by
+(calendar, slot) in a SQLite database (WAL, RESERVATIONS_DB_PATH), written
+inside BEGIN IMMEDIATE, so two workers can never book the same slot.
+
+Store calls run in a worker thread so waiting on SQLite's write lock never
+blocks the event loop. Calls for one calendar are serialised by one of
+RESERVATION_LOCK_STRIPES locks, so different calendars proceed in
+parallel and the same calendar doesn't queue on SQLite's busy handler.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Set, TypeVar
+
+from .slots import iso, parse
+
+RESERVATIONS_DB_PATH = os.getenv("RESERVATIONS_DB_PATH", "data/reservations.db")
+RESERVATION_HOLD_TTL = float(os.getenv("RESERVATION_HOLD_TTL", "300"))
+RESERVATION_LOCK_STRIPES = int(os.getenv("RESERVATION_LOCK_STRIPES", "16"))
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    calendar   TEXT NOT NULL,
+    slot       TEXT NOT NULL,
+    state      TEXT NOT NULL,  -- held | booked
+    session_id TEXT NOT NULL,
+    expires_at REAL,           -- holds only
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (calendar, slot)
+);
+CREATE INDEX IF NOT EXISTS reservations_session ON reservations (session_id);
+"""
+
+
+class ReservationBook:
+    def __init__(
+        self,
+        path: str = RESERVATIONS_DB_PATH,
+        hold_ttl: float = RESERVATION_HOLD_TTL,
+        stripes: int = RESERVATION_LOCK_STRIPES,
+    ) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.hold_ttl = hold_ttl
+        self._stripes = [threading.Lock() for _ in range(max(1, stripes))]
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+        self.conflicts = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite3 connections aren't shared safely
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _stripe(self, calendar: str) -> threading.Lock:
+        return self._stripes[zlib.crc32(calendar.encode()) % len(self._stripes)]
+
+    async def _run(self, calendar: str, fn: Callable[..., T], *args: Any) -> T:
+        def locked() -> T:
+            with self._stripe(calendar):
+                return fn(*args)
+
+        return await asyncio.to_thread(locked)
+
+    # ---- store operations (worker thread, stripe held) ----
+    def _claim(self, calendar: str, slot: str, session_id: str, booked: bool) -> bool:
+        db = self._conn()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT state, session_id, expires_at FROM reservations"
+                " WHERE calendar = ? AND slot = ?",
+                (calendar, slot),
+            ).fetchone()
+            if row is not None:
+                state, owner, expires_at = row
+                if state == "booked":
+                    db.execute("ROLLBACK")
+                    return booked and owner == session_id
+                if owner != session_id and expires_at > now:
+                    db.execute("ROLLBACK")
+                    self.conflicts += 1
+                    return False
+            # one claim in flight per session: drop its other holds
+            db.execute(
+                "DELETE FROM reservations WHERE session_id = ? AND state = 'held'"
+                " AND NOT (calendar = ? AND slot = ?)",
+                (session_id, calendar, slot),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO reservations VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    calendar,
+                    slot,
+                    "booked" if booked else "held",
+                    session_id,
+                    None if booked else now + self.hold_ttl,
+                    now,
+                ),
+            )
+            db.execute("COMMIT")
+            return True
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _release(self, session_id: str) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM reservations WHERE session_id = ? AND state = 'held'", (session_id,)
+        )
+        return cur.rowcount
+
+    def _taken(self, calendar: str, session_id: str) -> Set[datetime]:
+        rows = self._conn().execute(
+            "SELECT slot FROM reservations WHERE calendar = ?"
+            " AND (state = 'booked' OR expires_at > ?) AND session_id != ?",
+            (calendar, time.time(), session_id),
+        ).fetchall()
+        return {dt for dt in (parse(r[0]) for r in rows) if dt is not None}
+
+    def _sweep(self) -> int:
+        cur = self._conn().execute(
+            "DELETE FROM reservations WHERE state = 'held' AND expires_at <= ?", (time.time(),)
+        )
+        return cur.rowcount
+
+    # ---- async API ----
+    async def hold(self, calendar: str, slot: datetime, session_id: str) -> bool:
+        """Hold a slot for a session; False if another session holds or booked it."""
+        return await self._run(calendar, self._claim, calendar, iso(slot), session_id, False)
+
+    async def commit(self, calendar: str, slot: datetime, session_id: str) -> bool:
+        """Book a slot atomically; False if another session holds or booked it."""
+        ok = await self._run(calendar, self._claim, calendar, iso(slot), session_id, True)
+        if not ok:
+            logger.info("booking conflict", extra={"calendar": calendar, "slot": iso(slot)})
+        return ok
+
+    async def release(self, session_id: str) -> int:
+        """Drop a session's holds (booked slots stay booked)."""
+        return await asyncio.to_thread(self._release, session_id)
+
+    async def taken(self, calendar: str, session_id: str = "") -> Set[datetime]:
+        """Slots booked or held by other sessions."""
+        return await self._run(calendar, self._taken, calendar, session_id)
+
+    async def sweep(self) -> int:
+        """Delete lapsed holds (queries already ignore them)."""
+        return await asyncio.to_thread(self._sweep)
+
+
+reservations = ReservationBook()
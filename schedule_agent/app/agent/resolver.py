@@ -0,0 +1,219 @@
+"""
+resolver: answer the common scheduling replies locally, before the LLM.
+
+Handles short replies that name one slot without doubt:
+- an ordinal pointing into the slots the last reply listed ("the second one")
+- "earliest" / "first available"
+- an explicit time, optionally with a weekday or date ("Tuesday at 10",
+  "9 am on the 10th", "10 Nov 13:00"), matched against the free slots
+- a yes to the slot that was proposed and held, or to a single listed slot
+- a no to the held slot (the hold is released, the LLM takes it from there)
+
+A choice only counts when it is essentially the whole reply: besides the
+ordinal, time or yes it may only carry filler ("please", "I'll take", "that
+works"). Anything else (questions, refusals, "first I need to ask", several
+or no matching slots, another service) returns None or an "ambiguous"
+result and goes to the LLM as before.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+# replies longer than this are left to the LLM
+MAX_WORDS = 12
+
+
+@dataclass
+class Resolution:
+    kind: str  # ordinal | earliest | time | confirm | decline
+    slot: Optional[datetime] = None
+    ambiguous: bool = False
+
+
+_WEEKDAYS = {d: i for i, d in enumerate(["mon", "tue", "wed", "thu", "fri", "sat", "sun"])}
+_MONTHS = {
+    m: i + 1
+    for i, m in enumerate(
+        ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+    )
+}
+_ORDINALS = {"first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2, "last": -1}
+
+# wording that changes, refuses or questions the request rather than picking a slot
+_HEDGE = re.compile(
+    r"\?|n't\b|\b(not|instead|other|another|different|later|earlier|after|before|"
+    r"but|change|cancel|reschedule|what|which|when|how|cannot|cant|wont|busy|unable|"
+    r"impossible|wait|hold|maybe|perhaps|if|unless|except|ask|check)\b"
+)
+# words a choice may come wrapped in; any other word leaves the reply to the LLM
+_FILLER = frozenset(
+    "the a at on of for is it that that's this one option slot please thanks thank "
+    "you ok okay yes yeah yep sure then fine great perfect good works me i'll i'd "
+    "take book like let's go with would be".split()
+)
+_DECLINE = re.compile(r"^(no|nope|neither|none)\b")
+_CONFIRM = re.compile(
+    r"^(yes|yeah|yep|yup|ok|okay|sure|fine|great|perfect|sounds good|that works|"
+    r"that's fine|book it|please do|go ahead|confirm)\b"
+)
+_EARLIEST = re.compile(r"\b(earliest|soonest|first (available|free|possible))\b")
+_ORDINAL = re.compile(r"\b(?:the )?(first|1st|second|2nd|third|3rd|last)(?: one| option| slot)?\b")
+_NUMBERED = re.compile(r"^(?:(?:option|number|#) ?)?([1-9])(?: please)?$")
+
+_WEEKDAY = re.compile(r"\b(mon|tue|wed|thu|fri|sat|sun)[a-z]*\b")
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*"
+_DAY_MONTH = re.compile(rf"\b(\d{{1,2}})(?:st|nd|rd|th)?(?: of)? {_MONTH}\b")
+_MONTH_DAY = re.compile(rf"\b{_MONTH} (\d{{1,2}})(?:st|nd|rd|th)?\b")
+_DAY = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)\b")
+_CLOCK = re.compile(r"\b(\d{1,2})[:.](\d{2}) ?(am|pm)?\b")
+_HOUR = re.compile(r"\b(\d{1,2}) ?(am|pm|o'?clock)\b|\bat (\d{1,2})\b")
+_NOON = re.compile(r"\bnoon\b|\bmidday\b")
+
+
+def _normalize(text: str) -> str:
+    t = text.lower().replace("’", "'")
+    t = re.sub(r"[^\w:'.?# ]+", " ", t)
+    return re.sub(r"\s+", " ", t).strip(" .")
+
+
+def _only(t: str, *spans: Tuple[int, int]) -> bool:
+    """Whether t is just the matched spans plus filler words."""
+    rest = t
+    for start, end in sorted(spans, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    return all(w.strip(".#") in _FILLER for w in rest.split() if w.strip(".#"))
+
+
+def _hours(hour: int, ampm: Optional[str]) -> List[int]:
+    """24h hours a spoken hour can mean ("10" is 10:00 or 22:00)."""
+    if ampm == "am":
+        return [0 if hour == 12 else hour]
+    if ampm == "pm":
+        return [hour if hour == 12 else hour + 12]
+    return [hour] if hour >= 12 else [hour, hour + 12]
+
+
+def _cut(text: str, m: "re.Match[str]") -> str:
+    return text[: m.start()] + " " + text[m.end() :]
+
+
+def _time_filter(t: str):
+    """(hours, minute, weekday, day, month, rest) named in t; hours None if no time.
+
+    rest is t without the time and date it names.
+    """
+    hours: Optional[List[int]] = None
+    minute = 0
+    text = t
+    m = _CLOCK.search(t)
+    if m:
+        hours, minute = _hours(int(m.group(1)), m.group(3)), int(m.group(2))
+    else:
+        m = _NOON.search(t)
+        if m:
+            hours = [12]
+        else:
+            m = _HOUR.search(t)
+            if m:
+                hour = int(m.group(1) or m.group(3))
+                ampm = m.group(2) if m.group(2) in ("am", "pm") else None
+                hours = _hours(hour, ampm)
+    if m:
+        text = _cut(text, m)
+
+    weekday = day = month = None
+    m = _WEEKDAY.search(text)
+    if m:
+        weekday = _WEEKDAYS[m.group(1)]
+        text = _cut(text, m)
+    m = _DAY_MONTH.search(text)
+    if m:
+        day, month = int(m.group(1)), _MONTHS[m.group(2)]
+    else:
+        m = _MONTH_DAY.search(text)
+        if m:
+            month, day = _MONTHS[m.group(1)], int(m.group(2))
+        else:
+            m = _DAY.search(text)
+            if m:
+                day = int(m.group(1))
+    if m:
+        text = _cut(text, m)
+    return hours, minute, weekday, day, month, text
+
+
+def _match_time(t: str, free: Sequence[datetime]) -> Optional[Resolution]:
+    hours, minute, weekday, day, month, rest = _time_filter(t)
+    if hours is None or any(h > 23 for h in hours) or minute > 59:
+        return None
+    # "I work at 10", "at 10 I have physio": a time, but not a choice
+    if not _only(rest):
+        return None
+    found = [
+        dt
+        for dt in free
+        if dt.hour in hours
+        and dt.minute == minute
+        and (weekday is None or dt.weekday() == weekday)
+        and (day is None or dt.day == day)
+        and (month is None or dt.month == month)
+    ]
+    if len(found) == 1:
+        return Resolution("time", found[0])
+    return Resolution("time", ambiguous=True)
+
+
+def _pick(offered: Sequence[datetime], i: int) -> Resolution:
+    if not offered or i >= len(offered):
+        return Resolution("ordinal", ambiguous=True)
+    return Resolution("ordinal", offered[i])
+
+
+def resolve(
+    text: str,
+    offered: Sequence[datetime],
+    pending: Optional[datetime],
+    free: Sequence[datetime],
+) -> Optional[Resolution]:
+    """The slot a reply settles on, or None when it is for the LLM to read.
+
+    offered: slots listed in the last reply, in the order listed.
+    pending: the slot proposed (and held) for this session, if any.
+    free: bookable slots, earliest first.
+    """
+    t = _normalize(text)
+    if not t or len(t.split()) > MAX_WORDS:
+        return None
+
+    if _DECLINE.match(t):
+        return Resolution("decline", pending) if pending is not None else None
+    if _HEDGE.search(t):
+        return None
+
+    m = _NUMBERED.match(t)
+    if m and offered:
+        return _pick(offered, int(m.group(1)) - 1)
+    m = _EARLIEST.search(t)
+    if m and _only(t, m.span()):
+        return Resolution("earliest", free[0]) if free else None
+    # a named time wins over ordinals ("9 am on the 1st")
+    res = _match_time(t, free)
+    if res is not None:
+        return res
+    m = _ORDINAL.search(t)
+    if m and _only(t, m.span()):
+        i = _ORDINALS[m.group(1)]
+        return _pick(offered, i if i >= 0 else len(offered) - 1)
+
+    m = _CONFIRM.match(t)
+    if m and _only(t, m.span()):
+        if pending is not None:
+            return Resolution("confirm", pending)
+        if len(offered) == 1:
+            return Resolution("confirm", offered[0])
+        return Resolution("confirm", ambiguous=True)
+    return None
@@ -0,0 +1,225 @@
+"""
+sessions: bounded store for schedule conversations (service + chat history).
+
+A session is dropped once it has been idle for SESSION_TTL seconds or, when
+more than SESSION_MAX_ENTRIES are stored, least recently used first, so
+abandoned outreach conversations don't pile up. sweep() runs from a
+background task in main.py; it removes idle sessions, updates the session
+metrics and returns every id dropped since the last sweep so their slot
+holds can be released.
+
+SESSION_STORE picks the implementation:
+- memory: a dict in this process (one uvicorn worker only)
+- sqlite: rows of JSON state in SESSION_DB_PATH (WAL), shared by every
+  worker on the host; the entry cap is enforced at each sweep
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from .. import metrics
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/schedule_sessions.db")
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "10000"))
+
+State = Dict[str, Any]
+
+
+class MemorySessionStore:
+    name = "memory"
+
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES) -> None:
+        # session id -> (state, last used), least recently used first
+        self._entries: "OrderedDict[str, tuple[State, float]]" = OrderedDict()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # ids for the next sweep to hand back; beyond this their holds just lapse
+        self._dropped: "deque[str]" = deque(maxlen=max(1, max_entries))
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        self._entries.pop(session_id, None)
+        self._dropped.append(session_id)
+        metrics.SESSIONS_EVICTED.labels(self.name, reason).inc()
+
+    async def get(self, session_id: str) -> Optional[State]:
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        state, used = entry
+        now = time.monotonic()
+        if now - used > self.ttl:
+            self._evict(session_id, "ttl")
+            return None
+        self._entries[session_id] = (state, now)
+        self._entries.move_to_end(session_id)
+        return state
+
+    async def put(self, session_id: str, state: State) -> None:
+        self._entries[session_id] = (state, time.monotonic())
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), "size")
+
+    async def delete(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+
+    async def sweep(self) -> List[str]:
+        """Drop idle sessions; ids dropped since the last sweep."""
+        cutoff = time.monotonic() - self.ttl
+        # oldest first, so stop at the first one still in use
+        for session_id, (_, used) in list(self._entries.items()):
+            if used > cutoff:
+                break
+            self._evict(session_id, "ttl")
+        dropped = list(self._dropped)
+        self._dropped.clear()
+        stats = self.stats()
+        metrics.SESSIONS_STORED.labels(self.name).set(stats["sessions"])
+        metrics.SESSIONS_BYTES.labels(self.name).set(stats["bytes"])
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.name,
+            "sessions": len(self._entries),
+            "bytes": sum(len(json.dumps(s)) for s, _ in self._entries.values()),
+            "ttl_s": self.ttl,
+            "max_entries": self.max_entries,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    state      TEXT NOT NULL,  -- JSON
+    used_at    REAL NOT NULL   -- wall clock, shared by workers
+);
+CREATE INDEX IF NOT EXISTS sessions_used ON sessions (used_at);
+"""
+
+
+class SQLiteSessionStore:
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        ttl: float = SESSION_TTL,
+        max_entries: int = SESSION_MAX_ENTRIES,
+    ) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite3 connections aren't shared safely
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _get(self, session_id: str) -> Optional[State]:
+        row = self._conn().execute(
+            "SELECT state FROM sessions WHERE session_id = ? AND used_at > ?",
+            (session_id, time.time() - self.ttl),
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def _put(self, session_id: str, state: State) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+            (session_id, json.dumps(state, ensure_ascii=False), time.time()),
+        )
+
+    def _delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _sweep(self) -> List[str]:
+        db = self._conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            idle = [
+                r[0]
+                for r in db.execute(
+                    "SELECT session_id FROM sessions WHERE used_at <= ?",
+                    (time.time() - self.ttl,),
+                )
+            ]
+            db.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in idle])
+            over = [
+                r[0]
+                for r in db.execute(
+                    "SELECT session_id FROM sessions ORDER BY used_at DESC LIMIT -1 OFFSET ?",
+                    (self.max_entries,),
+                )
+            ]
+            db.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in over])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        if idle:
+            metrics.SESSIONS_EVICTED.labels(self.name, "ttl").inc(len(idle))
+        if over:
+            metrics.SESSIONS_EVICTED.labels(self.name, "size").inc(len(over))
+        stats = self._stats()
+        metrics.SESSIONS_STORED.labels(self.name).set(stats["sessions"])
+        metrics.SESSIONS_BYTES.labels(self.name).set(stats["bytes"])
+        return idle + over
+
+    def _stats(self) -> Dict[str, Any]:
+        count, size = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM sessions"
+        ).fetchone()
+        return {
+            "store": self.name,
+            "sessions": count,
+            "bytes": size,
+            "ttl_s": self.ttl,
+            "max_entries": self.max_entries,
+        }
+
+    # store calls run in a worker thread so a busy write lock never blocks the loop
+    async def get(self, session_id: str) -> Optional[State]:
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def put(self, session_id: str, state: State) -> None:
+        await asyncio.to_thread(self._put, session_id, state)
+
+    async def delete(self, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, session_id)
+
+    async def sweep(self) -> List[str]:
+        """Drop idle and over-cap sessions; the ids dropped."""
+        return await asyncio.to_thread(self._sweep)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._stats()
+
+
+def make_store(kind: str = SESSION_STORE):
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind != "memory":
+        raise ValueError(f"unknown SESSION_STORE {kind!r}; use memory or sqlite")
+    return MemorySessionStore()
+
+
+sessions = make_store()
@@ -0,0 +1,145 @@
+"""
+slots: sorted index of free appointment slots, one per calendar.
+
+A calendar is keyed by service today ("dentist"); provider or location can
+be added to the key later ("dentist/dr-smith") without changing the index.
+Slots are naive local datetimes kept in a sorted list with a set beside it:
+membership is O(1), lookups and booking are a bisect (the list shift on
+insert/remove is a memmove, cheap even at tens of thousands of slots).
+
+Calendars can be loaded from SCHEDULE_AVAILABILITY_PATH, a JSON object
+{"<calendar>": ["YYYY-MM-DDTHH:MM", ...]}.
+
+Every change to an index gives it a new `version` (unique across indexes,
+so a reloaded calendar never repeats one); caches of anything derived from
+a calendar key on it.
+"""
+
+from __future__ import annotations
+
+import bisect
+import itertools
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+SCHEDULE_AVAILABILITY_PATH = os.getenv("SCHEDULE_AVAILABILITY_PATH", "")
+
+When = Union[str, datetime]
+
+_versions = itertools.count(1)
+
+
+def parse(when: When) -> Optional[datetime]:
+    """A slot time from an ISO string or datetime (seconds dropped), else None."""
+    if isinstance(when, datetime):
+        dt = when
+    else:
+        try:
+            dt = datetime.fromisoformat(str(when).strip())
+        except ValueError:
+            return None
+    return dt.replace(second=0, microsecond=0, tzinfo=None)
+
+
+def iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M")
+
+
+class SlotIndex:
+    """Free slots of one calendar, sorted by time."""
+
+    def __init__(self, slots: Iterable[When] = ()) -> None:
+        parsed = {dt for dt in (parse(s) for s in slots) if dt is not None}
+        self._times: List[datetime] = sorted(parsed)
+        self._set = parsed
+        self.version = next(_versions)
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __iter__(self) -> Iterator[datetime]:
+        return iter(self._times)
+
+    def __contains__(self, when: object) -> bool:
+        dt = parse(when) if isinstance(when, (str, datetime)) else None
+        return dt is not None and dt in self._set
+
+    def add(self, when: When) -> bool:
+        """Make a slot free again; False if it already was (or isn't a time)."""
+        dt = parse(when)
+        if dt is None or dt in self._set:
+            return False
+        bisect.insort(self._times, dt)
+        self._set.add(dt)
+        self.version = next(_versions)
+        return True
+
+    def remove(self, when: When) -> bool:
+        """Take a slot out of the free list (book it); False if it wasn't free."""
+        dt = parse(when)
+        if dt is None or dt not in self._set:
+            return False
+        del self._times[bisect.bisect_left(self._times, dt)]
+        self._set.discard(dt)
+        self.version = next(_versions)
+        return True
+
+    def first(self, k: int = 3, after: Optional[datetime] = None) -> List[datetime]:
+        """The k earliest free slots, optionally at or after `after`."""
+        i = 0 if after is None else bisect.bisect_left(self._times, after)
+        return self._times[i : i + k]
+
+    def between(self, start: datetime, end: datetime) -> List[datetime]:
+        """Free slots in [start, end)."""
+        lo = bisect.bisect_left(self._times, start)
+        hi = bisect.bisect_left(self._times, end)
+        return self._times[lo:hi]
+
+    def nearest(self, when: When, k: int = 3) -> List[datetime]:
+        """The k free slots closest to `when`, in time order."""
+        dt = parse(when)
+        if dt is None:
+            return self.first(k)
+        times = self._times
+        hi = bisect.bisect_left(times, dt)
+        lo = hi - 1
+        out: List[datetime] = []
+        while len(out) < k and (lo >= 0 or hi < len(times)):
+            # take from whichever side is closer; ties go to the later slot
+            if hi < len(times) and (lo < 0 or times[hi] - dt <= dt - times[lo]):
+                out.append(times[hi])
+                hi += 1
+            else:
+                out.append(times[lo])
+                lo -= 1
+        return sorted(out)
+
+
+class Availability:
+    """Calendar key -> SlotIndex."""
+
+    def __init__(self, calendars: Optional[Dict[str, Iterable[When]]] = None) -> None:
+        self._calendars: Dict[str, SlotIndex] = {}
+        for key, slots in (calendars or {}).items():
+            self._calendars[key] = SlotIndex(slots)
+
+    def __getitem__(self, key: str) -> SlotIndex:
+        index = self._calendars.get(key)
+        if index is None:
+            index = self._calendars[key] = SlotIndex()
+        return index
+
+    def keys(self) -> List[str]:
+        return list(self._calendars)
+
+    def load(self, path: str) -> None:
+        """Replace calendars with those in a JSON file {"<calendar>": [iso, ...]}."""
+        with open(path, encoding="utf-8") as fh:
+            data = json.load(fh)
+        for key, slots in data.items():
+            self._calendars[str(key)] = SlotIndex(slots)
+
+    def stats(self) -> Dict[str, int]:
+        return {key: len(index) for key, index in self._calendars.items()}
@@ -0,0 +1,99 @@
+"""
+auth: keep the operational and service-to-service endpoints behind tokens.
+
+/admin/* and /usage expose per-conversation usage and service state, and
+POST /admin/log/debug turns on logging of prompts and patient messages, so
+they need "Authorization: Bearer <ADMIN_TOKEN>". With ADMIN_TOKEN unset
+they are switched off (403). The turn endpoints, /health and /metrics are
+not affected. Caddy additionally refuses /api/admin/* and /api/usage.
+
+Endpoints only other services may call (extraction_agent's POST /memory)
+need "Authorization: Bearer <SERVICE_TOKEN>" instead, which the calling
+service sends via service_headers(). Unset, they are switched off too.
+"""
+
+import hmac
+import logging
+import os
+from typing import Dict, Iterable, Optional
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+SERVICE_TOKEN = os.getenv("SERVICE_TOKEN", "")
+
+logger = logging.getLogger(__name__)
+
+
+def protected(path: str) -> bool:
+    return path == "/usage" or path == "/admin" or path.startswith("/admin/")
+
+
+def service_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """headers plus the service token for a call to another service."""
+    out = dict(headers or {})
+    if SERVICE_TOKEN:
+        out["Authorization"] = f"Bearer {SERVICE_TOKEN}"
+    return out
+
+
+def _route_path(scope) -> str:
+    # mounted apps (monolith) see the full path plus their mount as root_path
+    path, root = scope.get("path", ""), scope.get("root_path", "")
+    return path[len(root) :] if root and path.startswith(root) else path
+
+
+def _authorized(scope, token: str) -> bool:
+    for k, v in scope.get("headers") or []:
+        if k == b"authorization":
+            scheme, _, given = v.decode("latin-1").partition(" ")
+            return scheme.lower() == "bearer" and hmac.compare_digest(
+                given.strip().encode(), token.encode()
+            )
+    return False
+
+
+async def _refuse(scope, send, token: str, env: str) -> None:
+    if token:
+        status, body = 401, b"token required"
+    else:
+        status, body = 403, f"endpoint disabled; set {env}".encode()
+    logger.warning("request refused", extra={"path": scope.get("path"), "status": status})
+    headers = [(b"content-type", b"text/plain; charset=utf-8")]
+    if status == 401:
+        headers.append((b"www-authenticate", b"Bearer"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdminTokenMiddleware:
+    """Pure ASGI middleware answering 401/403 on protected paths without the token."""
+
+    def __init__(self, app, token: str = ADMIN_TOKEN) -> None:
+        self.app = app
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not protected(_route_path(scope)):
+            await self.app(scope, receive, send)
+            return
+        if self.token and _authorized(scope, self.token):
+            await self.app(scope, receive, send)
+            return
+        await _refuse(scope, send, self.token, "ADMIN_TOKEN")
+
+
+class ServiceTokenMiddleware:
+    """Pure ASGI middleware: requests to paths need the shared service token."""
+
+    def __init__(self, app, paths: Iterable[str] = (), token: str = SERVICE_TOKEN) -> None:
+        self.app = app
+        self.paths = set(paths)
+        self.token = token
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _route_path(scope) not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        if self.token and _authorized(scope, self.token):
+            await self.app(scope, receive, send)
+            return
+        await _refuse(scope, send, self.token, "SERVICE_TOKEN")
@@ -1,9 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+from . import auth, deadline, log, metrics
+from .agent import llm_client
+from .agent.ledger import ledger
+from .agent.main import warm_openers
+from .agent.openers import openers
+from .agent.reservations import reservations
+from .agent.sessions import sessions
+
 # import and include routers
 from .routes.post import router as post_router
 
+log.setup("schedule_agent")
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="schedule_agent")
 
 # Allow any origin for development convenience
@@ -15,9 +30,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# honour the caller's X-Request-Budget-Ms; cancel work on expiry or disconnect
+app.add_middleware(deadline.DeadlineMiddleware)
+
+# /admin/* and /usage need ADMIN_TOKEN
+app.add_middleware(auth.AdminTokenMiddleware)
+
+# request latency / in-flight metrics, Server-Timing and X-Request-ID
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include router immediately (not in startup event)
 app.include_router(post_router)
 
+# how often idle sessions and lapsed slot holds are deleted
+SWEEP_INTERVAL = 60.0
+_sweeper: "asyncio.Task[None] | None" = None
+
+
+async def _sweep() -> None:
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        try:
+            # an abandoned session gives its held slot back straight away
+            for session_id in await sessions.sweep():
+                await reservations.release(session_id)
+            await reservations.sweep()
+        except Exception as e:
+            logger.warning("session/reservation sweep failed: %s", e)
+
+
+@app.on_event("startup")
+async def startup_event():
+    global _sweeper
+    _sweeper = asyncio.create_task(_sweep())
+    # greetings ready before the first /schedule/start
+    warm_openers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _sweeper is not None:
+        _sweeper.cancel()
+    # release pooled OpenRouter connections
+    await llm_client.aclose()
+    metrics.mark_process_dead()
+    log.shutdown()
+
 
 @app.get("/")
 async def root():
@@ -27,3 +85,70 @@ async def root():
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return metrics.render()
+
+
+@app.get("/admin/log")
+async def log_settings():
+    """Log level, sampling, queue drops and conversations in debug mode."""
+    return log.stats()
+
+
+@app.get("/admin/llm")
+async def llm_settings():
+    """Circuit breaker state, latency and hedge counts per model."""
+    return llm_client.stats()
+
+
+@app.get("/admin/openers")
+async def opener_stats():
+    """Pre-generated greeting pools and how often /schedule/start used them."""
+    return openers.stats()
+
+
+@app.get("/admin/sessions")
+async def session_stats():
+    """Stored schedule sessions, their approximate size and eviction limits."""
+    return sessions.stats()
+
+
+@app.get("/usage")
+async def usage(
+    group_by: str = "agent,stage", hours: float = 24.0, conv_id: str = "", limit: int = 100
+):
+    """LLM calls, tokens, cost and latency from the usage ledger.
+
+    group_by: comma-separated from agent, stage, conv_id, model, outcome, hour
+    """
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    try:
+        rows = await asyncio.to_thread(ledger.aggregate, groups, hours, conv_id or None, limit)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    return {"group_by": groups, "hours": hours, "rows": rows}
+
+
+@app.post("/admin/log/debug")
+async def log_debug(request: Request):
+    """Turn debug logging (incl. prompt bodies) on or off for one conversation.
+
+    Body: {"conv_id": "...", "enabled": true, "ttl": 900}
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return PlainTextResponse("invalid json", status_code=400)
+    conv_id = str(data.get("conv_id") or "")
+    if not conv_id:
+        return PlainTextResponse("missing conv_id", status_code=400)
+    active = log.debug_conversations.set(
+        conv_id,
+        bool(data.get("enabled", True)),
+        float(data.get("ttl") or log.LOG_DEBUG_TTL),
+    )
+    return {"debug_conversations": sorted(active)}
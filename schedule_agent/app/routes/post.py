@@ -1,12 +1,46 @@
 from fastapi import APIRouter, Request, Query
 from fastapi.responses import JSONResponse, PlainTextResponse
-from ..agent.main import start_session, handle_user
+from ..agent.main import ALLOWED_SERVICES, AVAILABILITY, start_session, handle_user
+from ..agent.reservations import reservations
+from ..agent.slots import iso, parse
 
 router = APIRouter()
 
 @router.get("/schedule/start")
 async def start(service: str | None = Query(default=None)):
-    return JSONResponse(start_session(service))
+    return JSONResponse(await start_session(service))
+
+@router.get("/schedule/slots")
+async def slots(
+    service: str = Query(default="dentist"),
+    near: str | None = Query(default=None),
+    start: str | None = Query(default=None),
+    end: str | None = Query(default=None),
+    k: int = Query(default=5, ge=1, le=100),
+):
+    """Free slots: the k closest to `near`, those in [start, end), or the next k.
+
+    Slots another session holds or has booked are left out.
+    """
+    if service not in ALLOWED_SERVICES:
+        return PlainTextResponse("unknown service", status_code=400)
+    index = AVAILABILITY[service]
+    taken = await reservations.taken(service)
+    # over-fetch by the reserved slots so k free ones remain after filtering
+    want = k + len(taken)
+    target = parse(near) if near else None
+    if start or end:
+        lo, hi = parse(start or "0001-01-01"), parse(end or "9999-12-31")
+        if lo is None or hi is None:
+            return PlainTextResponse("invalid start/end", status_code=400)
+        found = [dt for dt in index.between(lo, hi) if dt not in taken][:k]
+    elif target is not None:
+        found = [dt for dt in index.nearest(target, want) if dt not in taken]
+        found = sorted(sorted(found, key=lambda dt: abs(dt - target))[:k])
+    else:
+        found = [dt for dt in index.first(want) if dt not in taken][:k]
+    free = len(index) - sum(1 for dt in taken if dt in index)
+    return JSONResponse({"service": service, "free": free, "slots": [iso(dt) for dt in found]})
 
 @router.post("/schedule/post")
 async def post_root(request: Request):
@@ -14,7 +48,7 @@ async def post_root(request: Request):
         data = await request.json()
     except Exception:
         return PlainTextResponse("invalid json", status_code=400)
-    out = handle_user(data.get("session_id"), data.get("text") or "")
+    out = await handle_user(data.get("session_id"), data.get("text") or "")
     if "error" in out:
         return PlainTextResponse(out["error"], status_code=400)
     return JSONResponse(out)
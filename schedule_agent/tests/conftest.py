@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the service's `app` package, as uvicorn sees it from the service directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
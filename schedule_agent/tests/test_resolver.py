@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from app.agent.resolver import resolve
+
+OFFERED = [datetime(2025, 11, 9, 10, 0), datetime(2025, 11, 9, 14, 30), datetime(2025, 11, 10, 9, 0)]
+FREE = OFFERED + [datetime(2025, 11, 11, 11, 0)]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "hold on a second",
+        "wait a second please",
+        "the last time I went it hurt",
+        "first I need to ask my daughter",
+        "I am busy at 10",
+        "I cannot come at 9 am",
+        "I can't come at 9 am",
+        "I won't make it at 10",
+        "I'm unable to do the second one",
+        "at 10 I have physio",
+        "ok first I need to check",
+    ],
+)
+def test_non_choices_go_to_the_llm(text):
+    res = resolve(text, OFFERED, None, FREE)
+    assert res is None or res.ambiguous
+
+
+def test_non_choices_keep_a_held_slot():
+    assert resolve("hold on a second", OFFERED, OFFERED[1], FREE) is None
+
+
+@pytest.mark.parametrize(
+    "text, slot",
+    [
+        ("the second one", OFFERED[1]),
+        ("second", OFFERED[1]),
+        ("the last one please", OFFERED[2]),
+        ("I'll take the first", OFFERED[0]),
+        ("2", OFFERED[1]),
+        ("option 3", OFFERED[2]),
+        ("at 14:30", OFFERED[1]),
+        ("10 Nov 9 am", OFFERED[2]),
+        ("9 am on the 10th please", OFFERED[2]),
+        ("the earliest please", OFFERED[0]),
+    ],
+)
+def test_choices_resolve(text, slot):
+    res = resolve(text, OFFERED, None, FREE)
+    assert res is not None and not res.ambiguous
+    assert res.slot == slot
+
+
+def test_confirm_needs_a_plain_yes():
+    assert resolve("yes please", OFFERED, OFFERED[1], FREE).slot == OFFERED[1]
+    assert resolve("ok first I need to ask", OFFERED, OFFERED[1], FREE) is None
+
+
+def test_decline_releases_the_held_slot():
+    res = resolve("no", OFFERED, OFFERED[1], FREE)
+    assert res.kind == "decline" and res.slot == OFFERED[1]
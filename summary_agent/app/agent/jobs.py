@@ -0,0 +1,128 @@
+"""
+jobs: bounded background queue for summarisation work.
+
+/post enqueues a job and returns 202 immediately; a pool of worker tasks
+drains the queue. Jobs are coalesced per conversation: while a job for a
+conversation is still waiting, a newer turn replaces its payload instead of
+adding another entry, so under load only the latest turn is summarised.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+QUEUE_MAXSIZE = int(os.getenv("SUMMARY_QUEUE_MAXSIZE", "1000"))
+WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+
+logger = logging.getLogger(__name__)
+
+# handler(conv_id, payload)
+Handler = Callable[[str, Any], Awaitable[None]]
+
+
+class _Job:
+    __slots__ = ("payload", "enqueued_at")
+
+    def __init__(self, payload: Any) -> None:
+        self.payload = payload
+        self.enqueued_at = time.monotonic()
+
+
+class SummaryQueue:
+    def __init__(self, maxsize: int = QUEUE_MAXSIZE, workers: int = WORKERS) -> None:
+        self.maxsize = maxsize
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, _Job] = {}
+        # conv_id -> [lock, number of workers holding or waiting on it]
+        self._locks: Dict[str, list] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._handler: Optional[Handler] = None
+        # counters
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_lag_s = 0.0
+
+    async def start(self, handler: Handler) -> None:
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"summary-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, conv_id: str, payload: Any) -> bool:
+        """Queue a job; returns False if the queue is full."""
+        if self._queue is None:
+            raise RuntimeError("summary queue not started")
+        job = self._pending.get(conv_id)
+        if job is not None:
+            # keep the original enqueue time so lag reflects the oldest wait
+            job.payload = payload
+            self.coalesced += 1
+            self.submitted += 1
+            return True
+        try:
+            self._queue.put_nowait(conv_id)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self._pending[conv_id] = _Job(payload)
+        self.submitted += 1
+        return True
+
+    async def _worker(self) -> None:
+        assert self._queue is not None and self._handler is not None
+        while True:
+            conv_id = await self._queue.get()
+            try:
+                job = self._pending.pop(conv_id, None)
+                if job is None:
+                    continue
+                self.last_lag_s = time.monotonic() - job.enqueued_at
+                # serialise per conversation so an older turn can't finish last
+                entry = self._locks.setdefault(conv_id, [asyncio.Lock(), 0])
+                entry[1] += 1
+                try:
+                    async with entry[0]:
+                        await self._handler(conv_id, job.payload)
+                    self.processed += 1
+                except Exception:
+                    self.failed += 1
+                    logger.exception("summary job failed", extra={"conv_id": conv_id})
+                finally:
+                    entry[1] -= 1
+                    if entry[1] == 0:
+                        self._locks.pop(conv_id, None)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest = min((j.enqueued_at for j in self._pending.values()), default=None)
+        return {
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "processed": self.processed,
+            "failed": self.failed,
+            "oldest_pending_age_s": round(now - oldest, 3) if oldest is not None else 0.0,
+            "last_lag_s": round(self.last_lag_s, 3),
+        }
+
+
+summary_queue = SummaryQueue()
@@ -0,0 +1,462 @@
+"""
+llm_client: shared async OpenRouter client.
+One long-lived, pooled httpx.AsyncClient per worker process; every agent
+calls chat() instead of opening its own blocking connection per request.
+
+model may be a comma-separated fallback chain ("primary,backup,..."), as
+MODEL_CLASSIFIER / MODEL_RESPONDER / MODEL_SAFETY / MODEL_SCHEDULER are.
+Each model has a circuit breaker: after LLM_BREAKER_FAILURES consecutive
+failures (timeouts, transport errors, 429/5xx) it is skipped for
+LLM_BREAKER_COOLDOWN seconds, then a single trial call decides whether it
+closes again. If every model in the chain is open the first one is tried
+anyway rather than failing the turn outright.
+
+chat() hedges: once a model has LLM_HEDGE_MIN_SAMPLES latencies, a call
+still running after their LLM_HEDGE_PERCENTILE gets a second, identical
+request and whichever answers first wins; the other is cancelled.
+LLM_HEDGE_MAX_RATIO caps hedges as a share of calls so a globally slow
+model cannot double the load. chat_stream() falls back only until the
+first delta has been yielded and is not hedged.
+
+Per-attempt timeouts are capped by the request budget (app/deadline.py);
+a timeout caused by the budget rather than the model does not count
+against the model's breaker, and no fallback starts once it is spent.
+
+Every attempt is written to the usage ledger (ledger.py). Once a
+conversation is over its token budget, calls switch to LLM_BUDGET_MODEL
+(if set), cap the reply at LLM_BUDGET_MAX_TOKENS and stop hedging.
+"""
+
+import asyncio, logging, os, json, time
+from collections import deque
+from typing import Optional, Dict, Any, List, AsyncIterator, Deque, Iterator, Tuple
+import httpx
+
+from .. import deadline
+from .ledger import ledger
+from ..metrics import LLM_CIRCUIT_OPEN, LLM_FALLBACKS, LLM_HEDGES, llm_timer
+
+logger = logging.getLogger(__name__)
+
+OR_KEY = os.getenv("OPENROUTER_API_KEY")
+OR_BASE = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+
+# ---- pool / timeout configuration ----
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+USE_HTTP2 = os.getenv("LLM_HTTP2", "1") == "1"
+
+# ---- hedging / circuit breaker configuration ----
+HEDGE_ENABLED = os.getenv("LLM_HEDGE", "1") == "1"
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+# ---- cheaper behaviour for conversations over their token budget ----
+BUDGET_MODEL = os.getenv("LLM_BUDGET_MODEL", "")
+BUDGET_MAX_TOKENS = int(os.getenv("LLM_BUDGET_MAX_TOKENS", "0"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (installed via httpx[http2])
+    except ImportError:
+        return False
+    return True
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=OR_BASE,
+            http2=USE_HTTP2 and _http2_available(),
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT, connect=CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def aclose() -> None:
+    """Close the pooled client and flush the ledger (called from the app's shutdown hook)."""
+    global _client
+    await ledger.flush()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _headers(referer: Optional[str], title: Optional[str]) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {OR_KEY}",
+        "HTTP-Referer": os.getenv("OPENROUTER_REFERER", referer or "https://hack.local"),
+        "X-Title": os.getenv("OPENROUTER_TITLE", title or "HygieiAI"),
+    }
+
+
+def models(spec: str) -> List[str]:
+    """Split a comma-separated model chain into its entries."""
+    return [m.strip() for m in spec.split(",") if m.strip()]
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half-open trial -> closed."""
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < BREAKER_COOLDOWN:
+                return False
+            self.state = "half_open"
+        if self.trial:
+            return False
+        self.trial = True
+        return True
+
+    def success(self) -> None:
+        if self.state != "closed":
+            logger.info("llm circuit closed", extra={"model": self.model})
+            LLM_CIRCUIT_OPEN.labels(self.model).set(0)
+        self.state, self.failures, self.trial = "closed", 0, False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self.trial = False
+        if self.state == "half_open" or self.failures >= BREAKER_FAILURES:
+            if self.state != "open":
+                logger.warning(
+                    "llm circuit open", extra={"model": self.model, "failures": self.failures}
+                )
+            self.state, self.opened_at = "open", time.monotonic()
+            LLM_CIRCUIT_OPEN.labels(self.model).set(1)
+
+    def release(self) -> None:
+        """An attempt ended without a verdict (cancelled, or a request error)."""
+        self.trial = False
+
+
+class _Latency:
+    """Recent successful call latencies of one model."""
+
+    def __init__(self, size: int = 200) -> None:
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def percentile(self, p: float) -> float:
+        s = sorted(self.samples)
+        return s[min(len(s) - 1, int(p / 100.0 * len(s)))]
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_latency: Dict[str, _Latency] = {}
+_calls = 0
+_hedges = 0
+
+
+def _breaker(model: str) -> CircuitBreaker:
+    b = _breakers.get(model)
+    if b is None:
+        b = _breakers[model] = CircuitBreaker(model)
+    return b
+
+
+def _attempt_timeout(timeout: Optional[float]) -> Tuple[httpx.Timeout, bool]:
+    """Timeout for one attempt, and whether the request budget cut it short."""
+    base = timeout if timeout is not None else DEFAULT_TIMEOUT
+    t = deadline.timeout(base)
+    return httpx.Timeout(t, connect=min(CONNECT_TIMEOUT, t)), t < base
+
+
+def _is_model_failure(exc: BaseException, cut: bool = False) -> bool:
+    # a spent request budget and other 4xx say nothing about the model's health
+    if isinstance(exc, deadline.DeadlineExceeded):
+        return False
+    if cut and isinstance(exc, httpx.TimeoutException):
+        return False
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code == 429 or code >= 500
+    return True
+
+
+def _reason(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return str(exc.response.status_code)
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "transport"
+    if isinstance(exc, CircuitOpen):
+        return "circuit_open"
+    return "error"
+
+
+def _chain(spec: str) -> Iterator[str]:
+    """Models to try, in order: those whose breaker admits a call, else the first.
+
+    Lazy, so a half-open breaker is only claimed when its model is reached.
+    """
+    chain = models(spec)
+    tried = False
+    for m in chain:
+        if _breaker(m).allow():
+            tried = True
+            yield m
+    if not tried and chain:
+        yield chain[0]
+
+
+def _hedge_delay(model: str) -> Optional[float]:
+    global _calls
+    _calls += 1
+    lat = _latency.get(model)
+    if not HEDGE_ENABLED or lat is None or len(lat.samples) < max(1, HEDGE_MIN_SAMPLES):
+        return None
+    if _hedges >= HEDGE_MAX_RATIO * _calls:
+        return None
+    return max(HEDGE_MIN_DELAY, lat.percentile(HEDGE_PERCENTILE))
+
+
+class _Call:
+    """What every attempt of one chat()/chat_stream() call shares."""
+
+    def __init__(
+        self,
+        payload: Dict[str, Any],
+        headers: Dict[str, str],
+        timeout: Optional[float],
+        stage: str,
+        agent: str,
+    ) -> None:
+        self.payload = payload
+        self.headers = headers
+        self.timeout = timeout
+        self.stage = stage
+        self.agent = agent
+
+
+async def _complete(model: str, call: _Call) -> str:
+    """One attempt against one model, feeding its breaker, latency window and the ledger."""
+    breaker = _breaker(model)
+    t0 = time.perf_counter()
+    cut = False
+    usage: Optional[Dict[str, Any]] = None
+    outcome = "error"
+    try:
+        attempt_timeout, cut = _attempt_timeout(call.timeout)
+        async with llm_timer(model, call.stage):
+            r = await get_client().post(
+                "/chat/completions",
+                headers=call.headers,
+                json={**call.payload, "model": model},
+                timeout=attempt_timeout,
+            )
+            r.raise_for_status()
+            data = r.json()
+            usage = data.get("usage")
+            out = data["choices"][0]["message"]["content"]
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        breaker.release()
+        raise
+    except Exception as e:
+        if _is_model_failure(e, cut):
+            breaker.failure()
+        else:
+            breaker.release()
+        raise
+    finally:
+        ledger.record(call.agent, call.stage, model, usage, time.perf_counter() - t0, outcome)
+    breaker.success()
+    _latency.setdefault(model, _Latency()).samples.append(time.perf_counter() - t0)
+    return out
+
+
+async def _hedged(model: str, call: _Call, hedge: bool = True) -> str:
+    global _hedges
+    delay = _hedge_delay(model) if hedge else None
+    if delay is None:
+        return await _complete(model, call)
+
+    primary = asyncio.ensure_future(_complete(model, call))
+    pending = {primary}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return primary.result()
+        _hedges += 1
+        second = asyncio.ensure_future(_complete(model, call))
+        pending.add(second)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    LLM_HEDGES.labels(model, "hedge" if t is second else "primary").inc()
+                    return t.result()
+                error = t.exception()
+        LLM_HEDGES.labels(model, "none").inc()
+        raise error  # type: ignore[misc]
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+async def chat(
+    model: str,
+    messages: List[Dict[str, str]],
+    json_mode: bool = False,
+    timeout: Optional[float] = None,
+    referer: Optional[str] = None,
+    title: Optional[str] = None,
+    stage: str = "chat",
+    agent: str = "",
+) -> str:
+    """Run one chat completion and return the assistant message content.
+
+    model is a model id or a comma-separated fallback chain; stage labels
+    the call in llm_call_duration_seconds and Server-Timing, agent and
+    stage label it in the usage ledger.
+    """
+    payload: Dict[str, Any] = {"messages": messages, "usage": {"include": True}}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    cheap = await ledger.over_budget()
+    if cheap:
+        model = BUDGET_MODEL or model
+        if BUDGET_MAX_TOKENS > 0:
+            payload["max_tokens"] = BUDGET_MAX_TOKENS
+    call = _Call(payload, _headers(referer, title), timeout, stage, agent)
+    error: Optional[Exception] = None
+    for m in _chain(model):
+        if error is not None:
+            logger.warning("llm fallback", extra={"model": m, "stage": stage, "error": repr(error)})
+        try:
+            return await _hedged(m, call, hedge=not cheap)
+        except deadline.DeadlineExceeded:
+            raise
+        except Exception as e:
+            LLM_FALLBACKS.labels(m, _reason(e)).inc()
+            error = e
+    raise error or CircuitOpen(model)
+
+
+async def chat_stream(
+    model: str,
+    messages: List[Dict[str, str]],
+    timeout: Optional[float] = None,
+    referer: Optional[str] = None,
+    title: Optional[str] = None,
+    stage: str = "chat",
+    agent: str = "",
+) -> AsyncIterator[str]:
+    """Run a streaming chat completion, yielding content deltas as they arrive.
+
+    Moves down the fallback chain only while nothing has been yielded yet.
+    """
+    payload: Dict[str, Any] = {"messages": messages, "stream": True, "usage": {"include": True}}
+    if await ledger.over_budget():
+        model = BUDGET_MODEL or model
+        if BUDGET_MAX_TOKENS > 0:
+            payload["max_tokens"] = BUDGET_MAX_TOKENS
+    headers = _headers(referer, title)
+    error: Optional[Exception] = None
+    for m in _chain(model):
+        breaker = _breaker(m)
+        started = cut = False
+        usage: Optional[Dict[str, Any]] = None
+        outcome = "error"
+        t0 = time.perf_counter()
+        if error is not None:
+            logger.warning("llm fallback", extra={"model": m, "stage": stage, "error": repr(error)})
+        try:
+            attempt_timeout, cut = _attempt_timeout(timeout)
+            async with llm_timer(m, stage), get_client().stream(
+                "POST",
+                "/chat/completions",
+                headers=headers,
+                json={**payload, "model": m},
+                timeout=attempt_timeout,
+            ) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    # SSE: "data: {...}" frames; ": OPENROUTER PROCESSING" comments are keep-alives
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    # the final chunk carries the usage block
+                    usage = chunk.get("usage") or usage
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        started = True
+                        yield delta
+            outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            breaker.release()
+            raise
+        except Exception as e:
+            if _is_model_failure(e, cut):
+                breaker.failure()
+            else:
+                breaker.release()
+            if started or isinstance(e, deadline.DeadlineExceeded):
+                raise
+            LLM_FALLBACKS.labels(m, _reason(e)).inc()
+            error = e
+            continue
+        finally:
+            ledger.record(agent, stage, m, usage, time.perf_counter() - t0, outcome)
+        breaker.success()
+        return
+    raise error or CircuitOpen(model)
+
+
+def stats() -> Dict[str, Any]:
+    """Breaker state and recent latency per model, for /admin/llm."""
+    out: Dict[str, Any] = {}
+    for m, b in _breakers.items():
+        lat = _latency.get(m)
+        have = lat is not None and len(lat.samples) > 0
+        out[m] = {
+            "circuit": b.state,
+            "consecutive_failures": b.failures,
+            "samples": len(lat.samples) if lat is not None else 0,
+            "p50_ms": round(lat.percentile(50) * 1000.0, 1) if have else None,
+            "hedge_after_ms": round(lat.percentile(HEDGE_PERCENTILE) * 1000.0, 1) if have else None,
+        }
+    return {"calls": _calls, "hedges": _hedges, "models": out}
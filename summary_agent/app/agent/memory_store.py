@@ -0,0 +1,132 @@
+"""
+memory_store: per-conversation memory (the summary fed back as context).
+
+Two tiers:
+- a bounded in-process LRU (hot tier) for O(1) lookups of active patients
+- a SQLite database in WAL mode (cold tier) that survives restarts and is
+  shared by every uvicorn worker in the container
+
+Every write bumps a per-conversation version. Each hot entry remembers the
+SQLite data_version it was last checked at; once another worker has
+committed, the next read of an entry compares its version with the stored
+one and reloads only that conversation if it moved.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+MEMORY_DB_PATH = os.getenv("MEMORY_DB_PATH", "data/memory.db")
+MEMORY_HOT_SIZE = int(os.getenv("MEMORY_HOT_SIZE", "5000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory (
+    conv_id    TEXT PRIMARY KEY,
+    message    TEXT NOT NULL,
+    version    INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class MemoryStore:
+    def __init__(self, path: str = MEMORY_DB_PATH, hot_size: int = MEMORY_HOT_SIZE) -> None:
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(_SCHEMA)
+        self._lock = threading.Lock()
+        # conv_id -> ((message, version), data_version it was last checked at)
+        self._hot: "OrderedDict[str, Tuple[Tuple[str, int], int]]" = OrderedDict()
+        self._hot_size = hot_size
+        self._data_version = self._read_data_version()
+        self.hits = 0
+        self.misses = 0
+
+    def _read_data_version(self) -> int:
+        # changes only when *another* connection commits
+        return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def _remember(self, conv_id: str, value: Tuple[str, int]) -> None:
+        self._hot[conv_id] = (value, self._data_version)
+        self._hot.move_to_end(conv_id)
+        while len(self._hot) > self._hot_size:
+            self._hot.popitem(last=False)
+
+    def _stored_version(self, conv_id: str) -> Optional[int]:
+        row = self._db.execute(
+            "SELECT version FROM memory WHERE conv_id = ?", (conv_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _get(self, conv_id: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            self._data_version = self._read_data_version()
+            entry = self._hot.get(conv_id)
+            if entry is not None:
+                value, checked_at = entry
+                # someone else committed since; still fresh if this key didn't move
+                if checked_at == self._data_version or self._stored_version(conv_id) == value[1]:
+                    self._hot[conv_id] = (value, self._data_version)
+                    self._hot.move_to_end(conv_id)
+                    self.hits += 1
+                    return value
+                del self._hot[conv_id]
+            self.misses += 1
+            row = self._db.execute(
+                "SELECT message, version FROM memory WHERE conv_id = ?", (conv_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            value = (row[0], row[1])
+            self._remember(conv_id, value)
+            return value
+
+    def _set(self, conv_id: str, message: str) -> int:
+        with self._lock:
+            version = self._db.execute(
+                """
+                INSERT INTO memory (conv_id, message, version, updated_at)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT(conv_id) DO UPDATE SET
+                    message = excluded.message,
+                    version = memory.version + 1,
+                    updated_at = excluded.updated_at
+                RETURNING version
+                """,
+                (conv_id, message, time.time()),
+            ).fetchone()[0]
+            self._remember(conv_id, (message, version))
+            return version
+
+    def _stats(self) -> dict:
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+            return {
+                "hot_entries": len(self._hot),
+                "hot_size": self._hot_size,
+                "stored_conversations": count,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    # store calls run in a worker thread so a busy write lock never blocks the loop
+    async def get(self, conv_id: str) -> Optional[Tuple[str, int]]:
+        """Return (message, version) for a conversation, or None."""
+        return await asyncio.to_thread(self._get, conv_id)
+
+    async def set(self, conv_id: str, message: str) -> int:
+        """Store the latest memory for a conversation; returns its new version."""
+        return await asyncio.to_thread(self._set, conv_id, message)
+
+    async def stats(self) -> dict:
+        return await asyncio.to_thread(self._stats)
+
+
+memory_store = MemoryStore()
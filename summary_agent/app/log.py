@@ -0,0 +1,244 @@
+"""
+log: structured JSON logging that stays off the request path.
+
+setup() installs one QueueHandler on the root logger; a QueueListener
+thread formats records as JSON lines and writes them to stdout, so a log
+call only costs a sampling check and a queue put. When the queue is full
+records are dropped and counted rather than blocking the event loop.
+
+Records below LOG_LEVEL are discarded and the rest are sampled per level
+(LOG_SAMPLE_RATES="debug:0.1,info:1"). Prompt and reply bodies are only
+logged when bodies_enabled(): LOG_PROMPTS=1, or the current conversation
+has debug turned on via POST /admin/log/debug. Debug conversations bypass
+level and sampling; the set is kept in LOG_DEBUG_PATH so every worker
+picks it up, and each entry expires after a TTL.
+"""
+
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Optional
+
+from .metrics import request_id
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_PROMPTS = os.getenv("LOG_PROMPTS", "0") == "1"
+LOG_DEBUG_PATH = os.getenv("LOG_DEBUG_PATH", "data/log_debug.json")
+LOG_DEBUG_TTL = float(os.getenv("LOG_DEBUG_TTL", "900"))
+
+_conv_id: contextvars.ContextVar[str] = contextvars.ContextVar("conv_id", default="")
+
+# LogRecord attributes that are not user-supplied fields
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "service"}
+
+
+def _parse_rates(spec: str) -> Dict[int, float]:
+    rates: Dict[int, float] = {}
+    for part in spec.split(","):
+        name, _, value = part.partition(":")
+        level = logging.getLevelName(name.strip().upper())
+        if isinstance(level, int) and value.strip():
+            rates[level] = max(0.0, min(1.0, float(value)))
+    return rates
+
+
+def bind(conv_id: Optional[str]) -> None:
+    """Tag log records of the current request with a conversation id."""
+    _conv_id.set(str(conv_id or ""))
+
+
+def conv_id() -> str:
+    return _conv_id.get()
+
+
+# ---- per-conversation debug, shared across workers through a small file ----
+class DebugConversations:
+    CHECK_EVERY = 1.0  # seconds between mtime checks
+
+    def __init__(self, path: str = LOG_DEBUG_PATH) -> None:
+        self.path = path
+        self._expires: Dict[str, float] = {}
+        self._mtime = 0.0
+        self._checked = 0.0
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < self.CHECK_EVERY:
+            return
+        self._checked = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = 0.0
+            self._expires = {}
+        if mtime and mtime != self._mtime:
+            try:
+                with open(self.path, encoding="utf-8") as fh:
+                    self._expires = {str(k): float(v) for k, v in json.load(fh).items()}
+            except (OSError, ValueError):
+                pass
+        self._mtime = mtime
+        _apply_level(bool(self.active()))
+
+    def active(self) -> Dict[str, float]:
+        now = time.time()
+        return {c: exp for c, exp in self._expires.items() if exp > now}
+
+    def enabled(self, conv: str) -> bool:
+        if not conv:
+            return False
+        self._refresh()
+        return self._expires.get(conv, 0.0) > time.time()
+
+    def set(self, conv: str, enabled: bool, ttl: float = LOG_DEBUG_TTL) -> Dict[str, float]:
+        self._checked = 0.0
+        self._refresh()
+        expires = self.active()
+        if enabled:
+            expires[conv] = time.time() + ttl
+        else:
+            expires.pop(conv, None)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(expires, fh)
+        os.replace(tmp, self.path)
+        self._checked = 0.0
+        self._refresh()
+        return self.active()
+
+
+debug_conversations = DebugConversations()
+
+
+def bodies_enabled() -> bool:
+    """True if prompt/reply bodies may be logged for the current request."""
+    return LOG_PROMPTS or debug_conversations.enabled(_conv_id.get())
+
+
+# ---- handler pipeline ----
+class _SamplingFilter(logging.Filter):
+    def __init__(self, level: int, rates: Dict[int, float]) -> None:
+        super().__init__()
+        self.level = level
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # stamp context here, in the calling task, before the record is queued
+        if not getattr(record, "request_id", ""):
+            record.request_id = request_id()
+        if not getattr(record, "conv_id", ""):
+            record.conv_id = _conv_id.get()
+        if debug_conversations.enabled(record.conv_id):
+            return True
+        if record.levelno < self.level:
+            return False
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # defer formatting to the listener thread; only freeze the message
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, service: str) -> None:
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED and not k.startswith("_") and v not in ("", None):
+                out[k] = v
+        if record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_base_level = logging.INFO
+
+
+def _apply_level(debug_active: bool) -> None:
+    # only create DEBUG records while some conversation is being debugged
+    logging.getLogger().setLevel(logging.DEBUG if debug_active else _base_level)
+
+
+def setup(service: str) -> None:
+    """Install the queue handler on the root logger (idempotent)."""
+    global _handler, _listener, _base_level
+    if _handler is not None:
+        return
+    level = logging.getLevelName(LOG_LEVEL)
+    _base_level = level if isinstance(level, int) else logging.INFO
+
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _DroppingQueueHandler(q)
+    _handler.addFilter(_SamplingFilter(_base_level, _parse_rates(LOG_SAMPLE_RATES)))
+    out = logging.StreamHandler(sys.stdout)
+    out.setFormatter(JsonFormatter(service))
+    _listener = logging.handlers.QueueListener(q, out, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    # httpx logs every request at INFO; keep only its warnings
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    _apply_level(bool(debug_conversations.active()))
+
+
+def shutdown() -> None:
+    """Flush queued records (called from the app's shutdown hook)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "level": logging.getLevelName(_base_level),
+        "sample_rates": {
+            logging.getLevelName(k): v for k, v in _parse_rates(LOG_SAMPLE_RATES).items()
+        },
+        "log_prompts": LOG_PROMPTS,
+        "queued": _handler.queue.qsize() if _handler is not None else 0,
+        "dropped": _handler.dropped if _handler is not None else 0,
+        "debug_conversations": {
+            c: round(exp - time.time()) for c, exp in debug_conversations.active().items()
+        },
+    }
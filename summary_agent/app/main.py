@@ -1,11 +1,36 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
+import asyncio
+import logging
+import os
+
+import httpx
+
+from . import auth, deadline, log, metrics, transport
+from .agent import llm_client
+from .agent.ledger import ledger
+from .agent.jobs import summary_queue
+from .agent.main import process_text
+from .agent.memory_store import memory_store
+from .wire import JSON_HEADERS, MemoryPush, SummaryTurn, encode
+
 # import and include routers
 from .routes.post import router as post_router
 
+log.setup("summary_agent")
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="summary_agent")
 
+# services that keep a pushed copy of the conversation memory (comma separated)
+MEMORY_PUSH_URLS = [
+    u.strip()
+    for u in os.getenv("MEMORY_PUSH_URLS", "http://extraction_agent:8001/memory").split(",")
+    if u.strip()
+]
+
 # Allow any origin for development convenience
 app.add_middleware(
     CORSMiddleware,
@@ -15,18 +40,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-FINAL_MESSAGE = ""
+# honour the caller's X-Request-Budget-Ms; cancel work on expiry or disconnect
+app.add_middleware(deadline.DeadlineMiddleware)
+
+# /admin/* and /usage need ADMIN_TOKEN
+app.add_middleware(auth.AdminTokenMiddleware)
+
+# request latency / in-flight metrics, Server-Timing and X-Request-ID
+app.add_middleware(metrics.MetricsMiddleware)
+
 
+async def setFinalMessage(summary, conv_id="default"):
+    """Store the latest memory for a conversation; returns its version."""
+    version = await memory_store.set(conv_id, summary or "")
+    logger.info("memory stored", extra={"conv_id": conv_id, "version": version})
+    if log.bodies_enabled():
+        logger.info("memory body", extra={"conv_id": conv_id, "memory": summary})
+    return version
 
-def setFinalMessage(summary):
-    global FINAL_MESSAGE
-    print("SETTING SUMMARY", summary)
-    FINAL_MESSAGE = summary
+
+async def _push_memory(conv_id, version, message):
+    """Push the new memory version to subscribers so they skip the pull."""
+    push = MemoryPush(conv_id=conv_id, version=version, final_message=message)
+    peer = transport.local("extraction.memory_push")
+    if peer is not None:
+        async with metrics.hop("memory_push"):
+            await peer(push)
+        return
+    if not auth.SERVICE_TOKEN:
+        # subscribers refuse pushes without the service token; they pull instead
+        return
+    body = encode(push)
+    headers = auth.service_headers(metrics.outbound_headers(JSON_HEADERS))
+    try:
+        async with httpx.AsyncClient(timeout=deadline.timeout(2.0)) as client:
+            for url in MEMORY_PUSH_URLS:
+                try:
+                    async with metrics.hop("memory_push") as h:
+                        h.response(await client.post(url, content=body, headers=headers))
+                except Exception as e:
+                    # the subscriber falls back to pulling /final-message
+                    logger.warning("memory push failed: %s %s", url, e)
+    except Exception as e:
+        logger.warning("memory push failed: %s", e)
+
+
+async def _run_summary(conv_id: str, turn: SummaryTurn):
+    """Queue worker: summarise one turn and store it as the conversation's memory."""
+    log.bind(conv_id)
+    summary = await process_text(turn)
+    version = await setFinalMessage(summary=summary, conv_id=conv_id)
+    await _push_memory(conv_id, version, summary or "")
 
 
 @app.on_event("startup")
 async def startup_event():
     app.include_router(post_router)
+    await summary_queue.start(_run_summary)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await summary_queue.stop()
+    # release pooled OpenRouter connections
+    await llm_client.aclose()
+    metrics.mark_process_dead()
+    log.shutdown()
 
 
 @app.get("/")
@@ -39,7 +118,81 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return metrics.render()
+
+
+@app.get("/admin/log")
+async def log_settings():
+    """Log level, sampling, queue drops and conversations in debug mode."""
+    return log.stats()
+
+
+@app.get("/admin/llm")
+async def llm_settings():
+    """Circuit breaker state, latency and hedge counts per model."""
+    return llm_client.stats()
+
+
+@app.get("/usage")
+async def usage(
+    group_by: str = "agent,stage", hours: float = 24.0, conv_id: str = "", limit: int = 100
+):
+    """LLM calls, tokens, cost and latency from the usage ledger.
+
+    group_by: comma-separated from agent, stage, conv_id, model, outcome, hour
+    """
+    groups = [g.strip() for g in group_by.split(",") if g.strip()]
+    try:
+        rows = await asyncio.to_thread(ledger.aggregate, groups, hours, conv_id or None, limit)
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    return {"group_by": groups, "hours": hours, "rows": rows}
+
+
+@app.post("/admin/log/debug")
+async def log_debug(request: Request):
+    """Turn debug logging (incl. prompt bodies) on or off for one conversation.
+
+    Body: {"conv_id": "...", "enabled": true, "ttl": 900}
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return PlainTextResponse("invalid json", status_code=400)
+    conv_id = str(data.get("conv_id") or "")
+    if not conv_id:
+        return PlainTextResponse("missing conv_id", status_code=400)
+    active = log.debug_conversations.set(
+        conv_id,
+        bool(data.get("enabled", True)),
+        float(data.get("ttl") or log.LOG_DEBUG_TTL),
+    )
+    return {"debug_conversations": sorted(active)}
+
+
+async def read_final_message(conv_id: str):
+    """(message, version) of one conversation's memory; ("", 0) if none yet."""
+    found = await memory_store.get(conv_id)
+    return found if found is not None else ("", 0)
+
+
 @app.get("/final-message")
-async def final_message():
-    """Return the FINAL_MESSAGE variable for quick access."""
-    return {"final_message": FINAL_MESSAGE}
+async def final_message(conv_id: str = Query(default="default")):
+    """Return the stored memory for one conversation."""
+    message, version = await read_final_message(conv_id)
+    return {"conv_id": conv_id, "final_message": message, "version": version}
+
+
+@app.get("/memory/stats")
+async def memory_stats():
+    """Hot-tier occupancy and hit/miss counters of the memory store."""
+    return await memory_store.stats()
+
+
+@app.get("/queue/stats")
+async def queue_stats():
+    """Summary queue depth, lag and throughput counters."""
+    return summary_queue.stats()
@@ -1,64 +1,29 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import PlainTextResponse
-from ..agent.main import process_text
-import json
+from ..agent.jobs import summary_queue
+from ..wire import SummaryTurn, parse
+import logging
+from typing import Tuple
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/post")
-async def receive_post(request: Request):
-    from ..main import setFinalMessage
-
-    body = await request.body()
-    content_type = request.headers.get("content-type", "application/octet-stream")
-
-    received_text = None
-    try:
-        if content_type and "application/json" in content_type:
-            try:
-                data = json.loads(body.decode("utf-8", errors="replace"))
-                if isinstance(data, dict):
-                    received_text = data.get("text")
-            except Exception:
-                received_text = None
-        elif content_type and content_type.startswith("text/"):
-            received_text = body.decode("utf-8", errors="replace")
-    except Exception:
-        received_text = None
+# ---- in-process entrypoint (monolith mode, see app/transport.py) ----
+async def submit_turn(turn: SummaryTurn) -> Tuple[int, str]:
+    """Queue one reply (and the user message it answers) for summarisation."""
+    # summarise in the background; the caller only waits for the enqueue
+    if not summary_queue.submit(turn.conv_id, turn):
+        return 503, "summary queue full"
+    return 202, "QUEUED"
 
-    if received_text is not None:
-        # print("summary_agent received text:", received_text[:200])
-        # Build JSON payload expected by summary_agent.process_text
-        user_msg = None
-        assistant_text = None
-        try:
-            # if the request was JSON we may have access to the parsed `data`
-            if "data" in locals() and isinstance(data, dict):
-                assistant_text = (
-                    data.get("text") or data.get("assistant_text") or received_text
-                )
-                user_msg = (
-                    data.get("user")
-                    or data.get("user_message")
-                    or data.get("user_text")
-                )
-        except Exception:
-            assistant_text = received_text
 
-        payload_obj = {
-            "user_text": user_msg or "",
-            "assistant_text": assistant_text or received_text,
-            "emergency_gate_hit": False,
-        }
-
-        try:
-            summary = process_text(json.dumps(payload_obj))
-            setFinalMessage(summary=summary)
-        except Exception as e:
-            print("summary_agent.process_text failed:", e)
-            summary = None
-    else:
-        print("summary_agent received non-text payload (len=", len(body), ")")
-
-    return PlainTextResponse("RECEIVED POST")
+@router.post("/post")
+async def receive_post(request: Request):
+    turn = parse(SummaryTurn, await request.body(), request.headers.get("content-type", ""))
+    if turn is None:
+        logger.warning("received non-text payload")
+        return PlainTextResponse("RECEIVED POST")
+    status, message = await submit_turn(turn)
+    headers = {"Retry-After": "1"} if status == 503 else None
+    return PlainTextResponse(message, status_code=status, headers=headers)
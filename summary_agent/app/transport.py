@@ -0,0 +1,36 @@
+"""
+transport: how this service reaches the other agents.
+
+Normally every inter-agent call is an HTTP request to the peer container.
+In monolith mode (monolith/main.py) all agents run in one process and the
+peers' entrypoints are registered here as plain async functions; call
+sites check local() first and then skip JSON encoding, sockets and the
+per-call httpx client. They take the same wire.py models the HTTP bodies
+carry.
+
+Registered names and signatures:
+    extraction.turn(Turn) -> (status, body)
+    extraction.turn_stream(Turn) -> async iterator of SSE bytes
+    extraction.memory_push(MemoryPush) -> bool
+    response.reply(Reply) -> (status, body)
+    response.reply_stream(Reply) -> async iterator of SSE bytes
+    summary.submit(SummaryTurn) -> (status, body)
+    summary.final_message(conv_id) -> (message, version)
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+
+_local: Dict[str, Callable[..., Any]] = {}
+
+
+def register(name: str, fn: Callable[..., Any]) -> None:
+    _local[name] = fn
+
+
+def local(name: str) -> Optional[Callable[..., Any]]:
+    """The in-process implementation of a peer call, or None to use HTTP."""
+    return _local.get(name)
+
+
+def registered() -> List[str]:
+    return sorted(_local)